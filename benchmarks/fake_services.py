@@ -0,0 +1,175 @@
+"""
+Local stand-ins for football-data.org, fbref and the Twitter API, served over HTTP from a
+background thread.
+
+football-data.org endpoints are answered from recorded responses, with each match's status
+moved on by a clock so a replayed season sees fixtures being played, and finished matches
+given a made up score. fbref competition
+pages are answered with a recorded page, and tweets are accepted and counted. Every request
+is counted by service, so callers can report how many calls a run made.
+"""
+import datetime
+import json
+import re
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import tweepy
+from requests.adapters import HTTPAdapter
+
+# a match is reported as in play from kickoff until this long after
+MATCH_LENGTH = datetime.timedelta(hours=2)
+_TIMESTAMP = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class FakeServices:
+    """
+    HTTP server standing in for football-data.org under /v4, fbref under /en and the
+    Twitter API under /2.
+    Args:
+        recorded: football-data.org responses keyed by endpoint, i.e. 'teams/328'.
+        fbref_page: body of the fbref competition page.
+        clock: function returning the unix time matches are played by.
+    """
+
+    def __init__(self, recorded: dict, fbref_page: bytes, clock: Callable[[], float]):
+        self.recorded = recorded
+        self.fbref_page = fbref_page
+        self.clock = clock
+        self.requests = Counter()
+        self.tweets = []
+        self._lock = threading.Lock()
+        self._matches = {}
+        for body in recorded.values():
+            for match in body.get("matches", []):
+                kickoff = datetime.datetime.strptime(
+                    match["utcDate"], _TIMESTAMP
+                ).replace(tzinfo=datetime.timezone.utc)
+                self._matches[match["id"]] = (match, kickoff)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeServices":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, service: str):
+        with self._lock:
+            self.requests[service] += 1
+
+    def _played(self, match: dict) -> dict:
+        """Return match with its status as of the clock."""
+        kickoff = self._matches[match["id"]][1]
+        now = datetime.datetime.fromtimestamp(self.clock(), datetime.timezone.utc)
+        if now < kickoff:
+            return match
+        finished = now >= kickoff + MATCH_LENGTH
+        played = dict(
+            match,
+            status="FINISHED" if finished else "IN_PLAY",
+            lastUpdated=(kickoff + MATCH_LENGTH if finished else kickoff).strftime(
+                _TIMESTAMP
+            ),
+        )
+        if finished:
+            # a made up but repeatable result
+            full_time = {"home": match["id"] % 4, "away": match["id"] // 4 % 3}
+            played["score"] = dict(match.get("score") or {}, fullTime=full_time)
+        return played
+
+    def football_data(self, endpoint: str):
+        """Return the status and body of a football-data.org endpoint."""
+        team_matches = re.fullmatch(r"teams/(\d+)/matches", endpoint)
+        if endpoint in self.recorded and team_matches is None:
+            body = self.recorded[endpoint]
+        elif team_matches is not None:
+            team_id = int(team_matches.group(1))
+            body = {
+                "matches": [
+                    match
+                    for match, _ in self._matches.values()
+                    if team_id in (match["homeTeam"]["id"], match["awayTeam"]["id"])
+                ]
+            }
+        else:
+            return 404, {"message": f"{endpoint} not recorded"}
+        if "matches" in body:
+            body = dict(body, matches=[self._played(m) for m in body["matches"]])
+        return 200, body
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                path = self.path.split("?")[0]
+                if path.startswith("/v4/"):
+                    services.count("football-data")
+                    status, body = services.football_data(path[len("/v4/") :])
+                    self._send(status, json.dumps(body).encode(), "application/json")
+                elif path.startswith("/en/comps/"):
+                    services.count("fbref")
+                    self._send(200, services.fbref_page, "text/html; charset=utf-8")
+                else:
+                    services.count("unknown")
+                    self._send(404, b"", "text/plain")
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                if self.path.split("?")[0] != "/2/tweets":
+                    services.count("unknown")
+                    self._send(404, b"", "text/plain")
+                    return
+                services.count("twitter")
+                length = int(self.headers.get("Content-Length", 0))
+                text = json.loads(self.rfile.read(length))["text"]
+                with services._lock:  # pylint: disable=protected-access
+                    services.tweets.append(text)
+                    tweet_id = str(len(services.tweets))
+                body = json.dumps({"data": {"id": tweet_id, "text": text}}).encode()
+                self._send(201, body, "application/json")
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Sends requests for api.twitter.com to the stand-in instead."""
+
+    def __init__(self, target: str):
+        super().__init__()
+        self.target = target
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        request.url = request.url.replace("https://api.twitter.com", self.target)
+        return super().send(request, **kwargs)
+
+
+def twitter_client(url: str) -> tweepy.Client:
+    """Return a tweepy.Client that posts to the stand-in at url."""
+    client = tweepy.Client(
+        consumer_key="replay",
+        consumer_secret="replay",
+        access_token="replay",
+        access_token_secret="replay",
+    )
+    client.session.mount("https://", RedirectAdapter(url))
+    return client
@@ -0,0 +1,232 @@
+"""
+Replays a season of recorded fixtures through twitter_bot_graph to size a deployment.
+
+Nothing touches the network. football-data.org, fbref and the Twitter API are answered by
+the local stand-ins in ``fake_services.py``, which the bot reaches through its overridable
+base URLs, and the bot's clock is moved through the season a day at a time. Each day, at
+the time the schedule runs, the graph is run once for each of N teams of the recorded
+competition and the tweets it queued are posted. The report gives graph runs per second,
+calls to each service per team-day and the p50/p99 latency of every op::
+
+    python benchmarks/season_replay.py --teams 4
+    python benchmarks/season_replay.py --teams 24 --days 60 --output replay.json
+"""
+import argparse
+import atexit
+import contextlib
+import datetime
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import pytz
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "twitter_bot"), str(ROOT / "benchmarks")]
+
+# pylint: disable=wrong-import-position,import-error
+from fake_services import FakeServices, twitter_client  # noqa: E402
+
+FBREF_PAGE = ROOT / "tests" / "data" / "fbref_championship.html"
+FOOTBALL_DATA = ROOT / "tests" / "data" / "football_data.json"
+COMPETITION_ID = 2016
+FIRST_TEAM_ID = 328
+
+
+def season_days(recorded: dict, days: int = None) -> list:
+    """Return the dates from the week before the first match to the day of the last."""
+    kickoffs = sorted(
+        match["utcDate"][:10]
+        for match in recorded[f"competitions/{COMPETITION_ID}/matches"]["matches"]
+    )
+    first = datetime.date.fromisoformat(kickoffs[0]) - datetime.timedelta(days=7)
+    last = datetime.date.fromisoformat(kickoffs[-1])
+    count = (last - first).days + 1 if days is None else days
+    return [first + datetime.timedelta(days=i) for i in range(count)]
+
+
+def pick_teams(recorded: dict, count: int) -> list:
+    """Return count team IDs of the recorded competition, Burnley first."""
+    matches = recorded[f"competitions/{COMPETITION_ID}/matches"]["matches"]
+    team_ids = {m[side]["id"] for m in matches for side in ("homeTeam", "awayTeam")}
+    ordered = [FIRST_TEAM_ID] + sorted(team_ids - {FIRST_TEAM_ID})
+    return ordered[:count]
+
+
+def run_time(day: datetime.date, cron_schedule: str) -> datetime.datetime:
+    """Return when a daily cron schedule, in UK time, runs on day."""
+    minute, hour = (int(field) for field in cron_schedule.split()[:2])
+    local = pytz.timezone("Europe/London").localize(
+        datetime.datetime.combine(day, datetime.time(hour, minute))
+    )
+    return local.astimezone(datetime.timezone.utc)
+
+
+def percentile(values: list, q: float) -> float:
+    """Return the q-th percentile of values by the nearest-rank method."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))]
+
+
+def replay(teams: int, days: int = None, rate_limit: float = None) -> dict:
+    """
+    Replay the season for `teams` teams.
+    Args:
+        teams: number of teams the graph is run for each day.
+        days: number of days replayed, defaults to the whole season.
+        rate_limit: football-data.org requests allowed a minute of wall time, defaults
+            to no limit so the replay measures the bot rather than the quota.
+
+    Returns:
+        dict of the replay's counts, throughput and op latencies.
+    """
+    recorded = json.loads(FOOTBALL_DATA.read_text(encoding="utf-8"))
+    replay_days = season_days(recorded, days)
+    team_ids = pick_teams(recorded, teams)
+
+    state = Path(tempfile.mkdtemp(prefix="twitter_bot_replay_"))
+    atexit.register(shutil.rmtree, state, ignore_errors=True)
+
+    # pylint: disable=import-outside-toplevel
+    from clock import FakeClock, set_clock
+
+    fake_clock = FakeClock(
+        datetime.datetime.combine(
+            replay_days[0], datetime.time(), tzinfo=datetime.timezone.utc
+        )
+    )
+    services = FakeServices(recorded, FBREF_PAGE.read_bytes(), fake_clock).start()
+    os.environ.update(
+        {
+            "TWITTER_BOT_STATE_DIR": str(state / "state"),
+            "TWITTER_BOT_CACHE_DIR": str(state / "cache"),
+            "TWITTER_BOT_FOOTBALL_DATA_URL": f"{services.url}/v4",
+            "TWITTER_BOT_FBREF_URL": services.url,
+            "PYFOOTBALL_API_KEY": "replay",
+        }
+    )
+    # the configs read the environment when first imported
+    import football_data
+    import main as twitter_bot_main
+    from configs.fbref import cron_schedule
+    from tweet_queue import QueueDrainer, get_tweet_queue
+
+    set_clock(fake_clock)
+    football_data._default_client = (  # pylint: disable=protected-access
+        football_data.FootballDataClient(
+            limiter=football_data.TokenBucket(rate_limit or 10**9)
+        )
+    )
+    twitter = twitter_client(services.url)
+    drainer = QueueDrainer(get_tweet_queue(), client_factory=lambda account: twitter)
+
+    op_latencies = defaultdict(list)
+    run_latencies = []
+    failures = 0
+    started = time.perf_counter()
+    try:
+        for day in replay_days:
+            fake_clock.set(run_time(day, cron_schedule))
+            for team_id in team_ids:
+                run_started = time.perf_counter()
+                # the ops print their progress, which would drown the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = twitter_bot_main.twitter_bot_graph.execute_in_process(
+                        run_config={
+                            "ops": {
+                                "get_next_fixture_obj": {"config": {"team_id": team_id}}
+                            },
+                            "loggers": {
+                                "console": {"config": {"log_level": "WARNING"}}
+                            },
+                        },
+                        raise_on_error=False,
+                    )
+                run_latencies.append(time.perf_counter() - run_started)
+                failures += not result.success
+                for event in result.all_events:
+                    if event.is_step_success:
+                        op_latencies[event.step_key].append(
+                            event.event_specific_data.duration_ms / 1000
+                        )
+            drainer.drain(max_wait=0)
+    finally:
+        elapsed = time.perf_counter() - started
+        set_clock(None)
+        services.stop()
+
+    team_days = len(team_ids) * len(replay_days)
+    return {
+        "teams": len(team_ids),
+        "days": len(replay_days),
+        "runs": len(run_latencies),
+        "failed_runs": failures,
+        "seconds": elapsed,
+        "runs_per_second": len(run_latencies) / elapsed,
+        "requests": dict(services.requests),
+        "calls_per_team_day": {
+            service: count / team_days for service, count in services.requests.items()
+        },
+        "tweets_posted": len(services.tweets),
+        "run_latency": {
+            "p50": percentile(run_latencies, 50),
+            "p99": percentile(run_latencies, 99),
+        },
+        "op_latency": {
+            op: {
+                "p50": percentile(values, 50),
+                "p99": percentile(values, 99),
+                "count": len(values),
+            }
+            for op, values in sorted(op_latencies.items())
+        },
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"{report['runs']} runs ({report['failed_runs']} failed) of "
+        f"{report['teams']} teams over {report['days']} days in "
+        f"{report['seconds']:.1f} s, {report['runs_per_second']:.2f} runs/s"
+    )
+    for service, calls in sorted(report["calls_per_team_day"].items()):
+        print(f"{service:15} {calls:8.3f} calls per team-day")
+    print(f"{report['tweets_posted']} tweets posted\n")
+    print(f"{'':35} {'p50 ms':>10} {'p99 ms':>10} {'runs':>6}")
+    print(
+        f"{'twitter_bot_graph':35} {report['run_latency']['p50'] * 1000:10.1f} "
+        f"{report['run_latency']['p99'] * 1000:10.1f}"
+    )
+    for op, latency in report["op_latency"].items():
+        print(
+            f"{op:35} {latency['p50'] * 1000:10.1f} {latency['p99'] * 1000:10.1f} "
+            f"{latency['count']:6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--teams", type=int, default=2, help="teams run each day")
+    parser.add_argument("--days", type=int, help="days replayed, default whole season")
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        help="football-data.org requests a minute, default unlimited",
+    )
+    parser.add_argument("--output", type=Path, help="write the report to this file")
+    args = parser.parse_args()
+
+    report = replay(args.teams, args.days, args.rate_limit)
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
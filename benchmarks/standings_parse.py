@@ -0,0 +1,59 @@
+"""
+Benchmark of fbref standings parsing against a saved competition page.
+
+Compares the original row-by-row parser (html.parser, ``df.loc[len(df)] = row``)
+with `standings.parse_standings_table`. Run from the repository root::
+
+    python benchmarks/standings_parse.py --repeat 20
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "twitter_bot")]
+
+from twitter_bot.standings import (  # noqa: E402 pylint: disable=wrong-import-position
+    HTML_PARSER,
+    OVERALL_TABLE_ID,
+    parse_standings_table,
+)
+
+DEFAULT_PAGE = ROOT / "tests" / "data" / "fbref_championship.html"
+
+
+def legacy_parse(html: str) -> pd.DataFrame:
+    """The parser `Tables.get_overall_standings_table` used before it was vectorised."""
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find("table", {"id": OVERALL_TABLE_ID})
+    headers = [i.text for i in table.find_all("th", {"scope": "col"})]
+    df = pd.DataFrame(columns=headers)
+    for row in table.find_all("tr")[1:]:
+        length = len(df)
+        df.loc[len(df)] = [str(length + 1)] + [i.text for i in row.find_all("td")]
+    df["Squad"] = df["Squad"].str.strip()
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page", type=Path, default=DEFAULT_PAGE)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    html = args.page.read_text(encoding="utf-8")
+    print(
+        f"page: {args.page.name} ({len(html) / 1024:.0f} KiB), backend: {HTML_PARSER}"
+    )
+    for name, func in (("legacy", legacy_parse), ("vectorised", parse_standings_table)):
+        best = min(timeit.repeat(lambda: func(html), number=1, repeat=args.repeat))
+        print(f"{name:>10}: {best * 1000:8.2f} ms (best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Offline benchmark suite for the standings, tweet and graph hot paths.
+
+Nothing touches the network. fbref is answered with the page in
+``tests/data/fbref_championship.html`` and api.football-data.org with the responses in
+``tests/data/football_data.json``, keyed by endpoint, through a requests adapter mounted on
+the shared response cache and football-data client. Fixture dates are shifted so the
+tracked team's next match kicks off just after the suite starts, taking the graph down its
+matchday path, and queued tweets are posted by a stub tweepy client.
+
+Results are written as JSON so runs of different versions can be compared::
+
+    python benchmarks/suite.py --repeat 20 --output before.json
+    python benchmarks/suite.py --repeat 20 --output after.json --compare before.json
+
+``--record`` replaces the recorded responses with live ones, which needs network access
+and a football-data.org API key.
+"""
+import argparse
+import atexit
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import requests
+from requests.adapters import BaseAdapter
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "twitter_bot")]
+
+# state and caches go to a throwaway directory, set before the configs are imported
+_STATE = Path(tempfile.mkdtemp(prefix="twitter_bot_bench_"))
+os.environ["TWITTER_BOT_STATE_DIR"] = str(_STATE / "state")
+os.environ["TWITTER_BOT_CACHE_DIR"] = str(_STATE / "cache")
+atexit.register(shutil.rmtree, _STATE, ignore_errors=True)
+
+# pylint: disable=wrong-import-position,import-error
+import tweepy  # noqa: E402
+
+import football_data  # noqa: E402
+import http_cache  # noqa: E402
+import main as twitter_bot_main  # noqa: E402
+from configs.fbref import league_urls  # noqa: E402
+from configs.football_data import base_url  # noqa: E402
+from charts import league_charts  # noqa: E402
+from fixture_store import FixtureStore, get_fixture_store  # noqa: E402
+from helpers import get_next_fixture  # noqa: E402
+from league_stats import league_stats  # noqa: E402
+from standings import FbrefPage, Tables  # noqa: E402
+from tweet_queue import QueueDrainer, get_tweet_queue  # noqa: E402
+from tweet_templates import render_batch  # noqa: E402
+from tweets import next_fixture_date_tweet, opp_stats  # noqa: E402
+
+# pylint: enable=wrong-import-position,import-error
+
+FBREF_PAGE = ROOT / "tests" / "data" / "fbref_championship.html"
+FOOTBALL_DATA = ROOT / "tests" / "data" / "football_data.json"
+TEAM_ID = 328
+COMPETITION_ID = 2016
+
+
+class RecordedAdapter(BaseAdapter):
+    """Answers requests from recorded response bodies keyed by URL."""
+
+    def __init__(self, pages: dict):
+        super().__init__()
+        self.pages = pages
+        self.requests = 0
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        self.requests += 1
+        body, content_type = self.pages.get(request.url, (b"", "text/plain"))
+        response = requests.Response()
+        response.status_code = 200 if body else 404
+        response.headers["Content-Type"] = content_type
+        response._content = body  # pylint: disable=protected-access
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class StubClient:
+    """Stands in for tweepy.Client, accepting every tweet."""
+
+    def __init__(self):
+        self.posted = 0
+
+    def create_tweet(self, text: str) -> tweepy.Response:
+        self.posted += 1
+        return tweepy.Response({"id": str(self.posted), "text": text}, {}, [], {})
+
+
+def shift_fixtures(recorded: dict, now: datetime.datetime) -> dict:
+    """
+    Move every recorded match by the same amount, so the tracked team's first match
+    kicks off five minutes after now.
+    """
+    fmt = "%Y-%m-%dT%H:%M:%SZ"
+    first = min(
+        datetime.datetime.strptime(match["utcDate"], fmt)
+        for match in recorded[f"teams/{TEAM_ID}/matches"]["matches"]
+    )
+    shift = now.replace(second=0, microsecond=0) + datetime.timedelta(minutes=5) - first
+    for body in recorded.values():
+        for match in body.get("matches", []):
+            kickoff = datetime.datetime.strptime(match["utcDate"], fmt) + shift
+            match["utcDate"] = kickoff.strftime(fmt)
+    return recorded
+
+
+def install_offline() -> RecordedAdapter:
+    """Route the shared response cache and football-data client to recorded responses."""
+    recorded = shift_fixtures(
+        json.loads(FOOTBALL_DATA.read_text(encoding="utf-8")),
+        datetime.datetime.utcnow(),
+    )
+    pages = {
+        f"{base_url.rstrip('/')}/{endpoint}": (
+            json.dumps(body).encode(),
+            "application/json",
+        )
+        for endpoint, body in recorded.items()
+    }
+    pages[league_urls[COMPETITION_ID]] = (FBREF_PAGE.read_bytes(), "text/html")
+    adapter = RecordedAdapter(pages)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    http_cache._default_cache = http_cache.ResponseCache(  # pylint: disable=W0212
+        _STATE / "cache" / "responses.sqlite", session=session
+    )
+    client = football_data.FootballDataClient(
+        token="offline", limiter=football_data.TokenBucket(10**9)
+    )
+    client.session.mount("https://", adapter)
+    client.session.mount("http://", adapter)
+    football_data._default_client = client  # pylint: disable=protected-access
+    return adapter
+
+
+def record():
+    """Save live fbref and football-data.org responses as the recorded ones."""
+    recorded = json.loads(FOOTBALL_DATA.read_text(encoding="utf-8"))
+    client = football_data.FootballDataClient()
+    FOOTBALL_DATA.write_text(
+        json.dumps(
+            {endpoint: client.get_json(endpoint) for endpoint in recorded},
+            separators=(",", ":"),
+        ),
+        encoding="utf-8",
+    )
+    r = requests.get(league_urls[COMPETITION_ID], timeout=30)
+    r.raise_for_status()
+    FBREF_PAGE.write_text(r.text, encoding="utf-8")
+
+
+def _graph_run_config() -> dict:
+    return {
+        "ops": {"get_next_fixture_obj": {"config": {"team_id": TEAM_ID}}},
+        "loggers": {"console": {"config": {"log_level": "WARNING"}}},
+    }
+
+
+def benchmarks() -> dict:
+    """Return the benchmarks to run, by name, each a function of no arguments."""
+    url = league_urls[COMPETITION_ID]
+    tables = Tables(url)
+    names = list(tables.overall_standings_table["Squad"]) + [
+        "Blackburn Rovers FC",
+        "Queens Park Rangers FC",
+        "West Bromwich Albion FC",
+    ]
+    fix = get_next_fixture(TEAM_ID)
+    opponents = [
+        dict(
+            tables.collect_stats(name),
+            opposition=name,
+            position="1st",
+            competition="Championship",
+        )
+        for name in tables.overall_standings_table["Squad"]
+    ]
+    matches = json.loads(FOOTBALL_DATA.read_text(encoding="utf-8"))[
+        f"competitions/{COMPETITION_ID}/matches"
+    ]["matches"]
+    store = get_fixture_store()
+    queue = get_tweet_queue()
+    drainer = QueueDrainer(queue, client_factory=lambda account: StubClient())
+
+    def drain_queue():
+        for i in range(50):
+            queue.enqueue(f"tweet {i}")
+        drainer.drain()
+
+    def sync_competition():
+        path = Path(tempfile.mkdtemp(dir=_STATE)) / "fixtures.sqlite"
+        FixtureStore(path).sync_matches(matches)
+
+    charts_dir = Path(tempfile.mkdtemp(dir=_STATE))
+    league_charts(tables, directory=charts_dir)
+
+    def graph_announcement():
+        store.clear_announced(TEAM_ID)
+        assert twitter_bot_main.twitter_bot_graph.execute_in_process(
+            run_config=_graph_run_config()
+        ).success
+
+    def graph_matchday():
+        assert twitter_bot_main.twitter_bot_graph.execute_in_process(
+            run_config=_graph_run_config()
+        ).success
+
+    return {
+        "standings.FbrefPage[index]": lambda: FbrefPage(tables.page.html),
+        "standings.FbrefPage.table[overall]": lambda: FbrefPage(tables.page.html).table(
+            "overall"
+        ),
+        "standings.Tables": lambda: Tables(url),
+        "standings.find_team[league]": lambda: [tables.find_team(n) for n in names],
+        "standings.collect_stats[league]": lambda: [
+            tables.collect_stats(n) for n in tables.overall_standings_table["Squad"]
+        ],
+        "league_stats.league_stats": lambda: league_stats(
+            tables.overall_standings_table, COMPETITION_ID
+        ),
+        "tweets.opp_stats": lambda: opp_stats(fix, TEAM_ID, tables),
+        "tweets.next_fixture_date_tweet": lambda: next_fixture_date_tweet(fix, TEAM_ID),
+        "tweets.render_batch[league]": lambda: render_batch("opp_stats", opponents),
+        "charts.league_charts[cached]": lambda: league_charts(
+            tables, directory=charts_dir
+        ),
+        "fixture_store.sync_matches[season]": sync_competition,
+        "graph.twitter_bot_graph[announcement]": graph_announcement,
+        "graph.twitter_bot_graph[matchday]": graph_matchday,
+        "tweet_queue.drain[50]": drain_queue,
+    }
+
+
+def run(repeat: int, number: int, only: str = None) -> dict:
+    results = {}
+    for name, func in benchmarks().items():
+        if only and only not in name:
+            continue
+        # graph runs take long enough to time singly
+        calls = 1 if name.startswith("graph.") else number
+        times = [
+            t / calls for t in timeit.Timer(func).repeat(repeat=repeat, number=calls)
+        ]
+        results[name] = {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "repeat": repeat,
+            "number": calls,
+        }
+        print(f"{name:45} {results[name]['median'] * 1000:10.3f} ms")
+    return results
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: dict, previous: dict):
+    print(f"\n{'':45} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in results.items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        change = result["median"] / before["median"] - 1
+        print(
+            f"{name:45} {before['median'] * 1000:10.3f} "
+            f"{result['median'] * 1000:10.3f} {change:+8.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--number", type=int, default=10, help="calls per timing")
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--output", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="results of a previous run")
+    parser.add_argument("--record", action="store_true")
+    args = parser.parse_args()
+
+    if args.record:
+        record()
+        return
+    adapter = install_offline()
+    results = run(args.repeat, args.number, args.only)
+    print(f"\n{adapter.requests} recorded responses served")
+    output = {"meta": metadata(), "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(output, indent=2), encoding="utf-8")
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark of resolving every team in a league and collecting its stats.
+
+Compares the original per-getter `str.contains` scans with the `TeamNameIndex` row
+lookup now used by `Tables.collect_stats`. Run from the repository root::
+
+    python benchmarks/team_lookup.py --repeat 20
+"""
+import argparse
+import csv
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "twitter_bot")]
+
+import standings  # noqa: E402 pylint: disable=wrong-import-position,import-error
+
+DEFAULT_PAGE = ROOT / "tests" / "data" / "fbref_championship.html"
+TEAMS = ROOT / "data" / "team_ids_2016.csv"
+LEGACY_STATS = ["Rk", "W", "D", "L", "GF", "GA", "Last 5", "Top Team Scorer"]
+
+
+def legacy_find_team(tbl, team_name):
+    """The name search `Tables.find_team` used before the index was added."""
+    search_name = ""
+    for sub_name in team_name.split():
+        search_name += " " + sub_name
+        search_name = search_name.lstrip()
+        contains = tbl["Squad"].str.contains(search_name)
+        if contains.sum() == 1:
+            return tbl[contains]["Squad"].item()
+    return None
+
+
+def legacy_collect_stats(tbl, team_name):
+    stats = {}
+    for stat in LEGACY_STATS:
+        squad = legacy_find_team(tbl, team_name)
+        stats[stat] = tbl.loc[tbl["Squad"] == f"{squad}"][f"{stat}"].item()
+    return stats
+
+
+class PageResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page", type=Path, default=DEFAULT_PAGE)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    response = PageResponse(args.page.read_text(encoding="utf-8"))
+    standings.cached_get = lambda url, source: response
+    with open(TEAMS, encoding="utf-8") as csv_file:
+        names = [row["team_name"] for row in csv.DictReader(csv_file)]
+    # the legacy search can not match QPR at all
+    names = [name for name in names if name != "Queens Park Rangers FC"]
+    tables = standings.Tables(standings.championship_url)
+    tbl = tables.overall_standings_table
+
+    def indexed():
+        # a fresh index each time, as every run builds a new Tables
+        tables.team_index = standings.TeamNameIndex(
+            tbl["Squad"], standings.load_team_aliases()
+        )
+        return [tables.collect_stats(name) for name in names]
+
+    timings = {
+        "legacy, one team": lambda: legacy_collect_stats(tbl, names[0]),
+        "legacy, league": lambda: [legacy_collect_stats(tbl, n) for n in names],
+        "indexed, league": indexed,
+    }
+    print(f"{len(names)} teams")
+    for name, func in timings.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:>16}: {best * 1000:8.2f} ms (best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Contains configurations for the standings and form charts.
+"""
+import os
+from pathlib import Path
+
+from configs.http import cache_dir
+
+# rendered PNGs, named by a hash of the data they show
+charts_dir = Path(os.getenv("TWITTER_BOT_CHARTS_DIR", cache_dir / "charts"))
+
+# inches, 16:9 so Twitter does not crop the image in the timeline
+figure_size = (8, 4.5)
+dpi = 150
+
+# processes rendering a league's charts
+chart_workers = 2
+
+# below this many charts, rendering in-process is quicker than starting a pool
+min_pool_charts = 8
+
+result_colours = {"W": "#2ca02c", "D": "#f2c744", "L": "#d62728"}
+highlight_colour = "#6c1d45"
+team_colour = "#99d6ea"
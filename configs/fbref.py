@@ -1,9 +1,26 @@
 """
 Contains useful configurations relating to the stats website www.fbref.com
 """
+import os
 
-championship_url = r"https://fbref.com/en/comps/10/Championship-Stats"
+# overridable to point the bot at a stand-in, i.e. in benchmarks/season_replay.py
+base_url = os.getenv("TWITTER_BOT_FBREF_URL", r"https://fbref.com")
 
-burnley_url = r"https://fbref.com/en/squads/943e8050/Burnley-Stats"
+championship_url = f"{base_url}/en/comps/10/Championship-Stats"
+
+# fbref competition page for each api.football-data.org competition ID
+league_urls = {
+    2002: f"{base_url}/en/comps/20/Bundesliga-Stats",
+    2003: f"{base_url}/en/comps/23/Eredivisie-Stats",
+    2013: f"{base_url}/en/comps/24/Serie-A-Stats",
+    2014: f"{base_url}/en/comps/12/La-Liga-Stats",
+    2015: f"{base_url}/en/comps/13/Ligue-1-Stats",
+    2016: championship_url,
+    2017: f"{base_url}/en/comps/32/Primeira-Liga-Stats",
+    2019: f"{base_url}/en/comps/11/Serie-A-Stats",
+    2021: f"{base_url}/en/comps/9/Premier-League-Stats",
+}
+
+burnley_url = f"{base_url}/en/squads/943e8050/Burnley-Stats"
 
 cron_schedule = "0 13 * * *"
@@ -0,0 +1,27 @@
+"""
+Contains useful configurations relating to the football-data.org API
+"""
+import os
+
+# overridable to point the bot at a stand-in, i.e. in benchmarks/season_replay.py
+base_url = os.getenv(
+    "TWITTER_BOT_FOOTBALL_DATA_URL", r"https://api.football-data.org/v4"
+)
+
+# same variable the pyfootball package reads its key from
+api_key = os.getenv("PYFOOTBALL_API_KEY", "")
+
+# free tier quota, updated at run time from the X-Requests-Available-Minute header
+requests_per_minute = 10
+
+# keep-alive connections kept open to the API
+pool_maxsize = 10
+
+# attempts at a request answered with 429 Too Many Requests before giving up
+max_retries = 3
+
+# competitions whose team lists are fetched at the same time when refreshing reference data
+reference_data_workers = 4
+
+# weekly refresh of the team catalog (venues, names, fbref squads), Monday mornings
+team_catalog_cron_schedule = "0 5 * * 1"
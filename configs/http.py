@@ -0,0 +1,20 @@
+"""
+Contains configurations for outbound HTTP requests and the shared on-disk response cache.
+"""
+import os
+from pathlib import Path
+
+cache_dir = Path(
+    os.getenv("TWITTER_BOT_CACHE_DIR", Path.home() / ".cache" / "twitter_bot")
+)
+
+cache_max_bytes = 64 * 1024 * 1024
+
+# seconds a cached response is served without revalidation, per source
+cache_ttls = {
+    "fbref": 6 * 60 * 60,
+    "football-data": 15 * 60,
+    "default": 5 * 60,
+}
+
+request_timeout = 30
@@ -0,0 +1,34 @@
+"""
+Contains the league places the derived standings stats measure gaps to, by
+api.football-data.org competition ID.
+"""
+
+# lowest rank of the promotion play-off places (or European places in a top flight)
+playoff_places = {
+    2002: 6,
+    2003: 5,
+    2013: 6,
+    2014: 6,
+    2015: 5,
+    2016: 6,
+    2017: 5,
+    2019: 6,
+    2021: 6,
+}
+
+# number of relegation places at the bottom of the table
+relegation_places = {
+    2002: 2,
+    2003: 2,
+    2013: 3,
+    2014: 3,
+    2015: 3,
+    2016: 3,
+    2017: 2,
+    2019: 3,
+    2021: 3,
+}
+
+# used for competitions not listed above
+default_playoff_places = 6
+default_relegation_places = 3
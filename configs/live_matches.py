@@ -0,0 +1,29 @@
+"""
+Contains the polling timings of the live match mode, which watches tracked fixtures from
+shortly before kickoff until full time.
+"""
+
+# minutes before kickoff a fixture starts being watched
+start_lead_minutes = 15
+
+# seconds between polls of a fixture that has not kicked off, late team news can move it
+pre_kickoff_interval = 10 * 60
+
+# seconds between polls of a match in play, until full time is near
+in_play_interval = 10 * 60
+
+# minutes after kickoff from which full time is near, 90 minutes plus half time
+full_time_near_minutes = 105
+
+# seconds between polls once full time is near
+full_time_interval = 60
+
+# a match not reported finished this long after kickoff stops being watched
+max_match_minutes = 4 * 60
+
+# seconds a competition's matches are shared by its watchers before being polled again
+min_poll_age = 30
+
+# football-data.org requests a minute a live run may use, of the quota of 10 shared by
+# every process, so the fixture syncs and venue lookups of other jobs still get through
+live_requests_per_minute = 6
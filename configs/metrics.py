@@ -0,0 +1,18 @@
+"""
+Contains configurations for the run metrics exported to Prometheus.
+"""
+import os
+from pathlib import Path
+
+from configs.paths import state_dir
+
+# prefix of every exported metric name
+prefix = "twitter_bot"
+
+# file read by the node-exporter textfile collector, point its
+# --collector.textfile.directory at this file's directory
+textfile = Path(
+    os.getenv(
+        "TWITTER_BOT_METRICS_TEXTFILE", state_dir / "metrics" / "twitter_bot.prom"
+    )
+)
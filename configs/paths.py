@@ -0,0 +1,25 @@
+"""
+Contains the locations of data files used by the `twitter_bot` package.
+"""
+import os
+from pathlib import Path
+
+data_dir = Path(
+    os.getenv("TWITTER_BOT_DATA_DIR", Path(__file__).resolve().parent.parent / "data")
+)
+
+# persistent state (fixture store, ledgers), mount as a volume when run in docker
+state_dir = Path(
+    os.getenv("TWITTER_BOT_STATE_DIR", Path.home() / ".local" / "share" / "twitter_bot")
+)
+
+# team catalog csvs, rebuilt weekly, kept with the state so they outlive the image
+catalog_dir = Path(os.getenv("TWITTER_BOT_CATALOG_DIR", state_dir / "team_catalog"))
+
+# Parquet snapshots of every standings table fetched
+history_dir = Path(
+    os.getenv("TWITTER_BOT_HISTORY_DIR", state_dir / "standings_history")
+)
+
+# outputs handed between the ops of a dagster run, kept by the JSON IO manager
+io_manager_dir = Path(os.getenv("TWITTER_BOT_IO_DIR", state_dir / "dagster_io"))
@@ -0,0 +1,21 @@
+"""
+Contains the timings of the posts in each tracked team's season calendar.
+"""
+
+# matchday preview of the opposition, before kickoff
+preview_lead_minutes = 3 * 60
+
+# post-match slot after kickoff, by which time the next fixture can be announced
+full_time_minutes = 2 * 60 + 30
+
+# first fixture of a season is announced this long before kickoff
+announcement_lead_days = 7
+
+# post-match slots missed by up to this long (i.e. while the daemon was down) are still run
+catch_up_minutes = 6 * 60
+
+# seconds between fixture syncs made by the calendar sensor
+sync_interval = 6 * 60 * 60
+
+# seconds between evaluations of the calendar sensor
+sensor_interval = 5 * 60
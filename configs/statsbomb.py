@@ -0,0 +1,30 @@
+"""
+Contains the locations and settings of the StatsBomb event ingestion.
+"""
+import os
+from pathlib import Path
+
+from configs.paths import data_dir
+
+# StatsBomb open data layout, one events/{match_id}.json file per match
+events_dir = Path(
+    os.getenv("TWITTER_BOT_STATSBOMB_DIR", data_dir / "statsbomb" / "events")
+)
+
+# StatsBomb open data matches files, matches/{competition_id}/{season_id}.json, which
+# name the home and away team of each match
+matches_dir = Path(
+    os.getenv("TWITTER_BOT_STATSBOMB_MATCHES_DIR", events_dir.parent / "matches")
+)
+
+# per-team, per-match summaries written by an ingest
+summaries_path = data_dir / "statsbomb_summaries.csv"
+
+# characters read from an event file at a time, a match is never held in memory whole
+read_chunk_size = 64 * 1024
+
+# processes summarising event files, one per core by default
+ingest_workers = os.cpu_count() or 1
+
+# below this many files, summarising in-process is quicker than starting a pool
+min_pool_files = 8
@@ -0,0 +1,15 @@
+"""
+Contains the teams the multi-team job posts for.
+"""
+
+# every team listed in data/team_ids_{competition_id}.csv is tracked
+tracked_competitions = [2016]
+
+# restrict to these team IDs, empty to track every team in the competitions
+tracked_team_ids = []
+
+# number of teams processed at the same time
+max_concurrent_teams = 4
+
+# team the command line reports on when no --team-id is given (Burnley)
+default_team_id = 328
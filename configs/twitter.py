@@ -0,0 +1,44 @@
+"""
+Contains configurations for posting tweets through the outbound tweet queue.
+"""
+
+# hashtag appended to every tweet by helpers.format_tweet
+hashtag = "#twitterclarets"
+
+# weighted length Twitter allows a tweet, emoji and CJK characters count as two
+max_tweet_length = 280
+
+# account whose keys are in configs.keys
+default_account = "default"
+
+# attempts at posting a tweet before it is marked as failed
+max_attempts = 8
+
+# seconds of the first retry after a server error, doubled on each attempt
+backoff_base = 5
+
+# longest wait between attempts, in seconds
+backoff_max = 15 * 60
+
+# seconds a drain waits for tweets that are backing off before returning
+max_drain_wait = 60
+
+# connect and read timeouts, in seconds, of a request to post a tweet
+post_timeout = (5, 30)
+
+# seconds a tweet's text is kept in the queue's ledger, and the same text is not queued
+# again, Twitter only refuses a tweet matching a recent one
+duplicate_window = 24 * 60 * 60
+
+# seconds between checks of the queue by the drain sensor
+drain_sensor_interval = 30
+
+# seconds between polls of the account's mentions by the reply service, 180 polls are
+# allowed every 15 minutes
+mention_poll_interval = 5
+
+# mentions fetched a request, the most the API allows
+mentions_page_size = 100
+
+# seconds between refreshes of the reply service's table of next fixtures
+fixture_refresh_interval = 15 * 60
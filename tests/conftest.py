@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# modules within twitter_bot import each other by bare name, as they do when
+# main.py is loaded by dagster from inside the package directory
+sys.path.insert(0, str(Path(__file__).parent.parent / "twitter_bot"))
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from twitter_bot import charts
+from twitter_bot.standings import parse_standings_table
+
+FBREF_HTML = Path(__file__).parent / "data" / "fbref_championship.html"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class FakeTables:
+    url = "https://fbref.com/en/comps/10/Championship-Stats"
+
+    def __init__(self, table):
+        self.overall_standings_table = table
+
+    def find_team(self, team_name):
+        squads = set(self.overall_standings_table["Squad"])
+        return team_name if team_name in squads else None
+
+
+@pytest.fixture(scope="module")
+def table():
+    return parse_standings_table(FBREF_HTML.read_text(encoding="utf-8"))
+
+
+def test_chart_data(table):
+    assert charts.form_data(table, "Sheffield Utd")["results"] == list("WWWDL")
+    goals = charts.goals_data(table, "Sheffield Utd")
+    assert (goals["goals_for"], goals["goals_against"]) == (20, 7)
+    position = charts.position_data(table, "Burnley")
+    assert position["squads"][0] == "Sheffield Utd"
+    assert len(position["points"]) == len(table)
+
+
+def test_team_charts_cached_by_data(tmp_path, table, monkeypatch):
+    tables = FakeTables(table)
+    paths = charts.team_charts(tables, "Burnley", directory=tmp_path)
+    assert set(paths) == set(charts.CHARTS)
+    for path in paths.values():
+        assert path.read_bytes().startswith(PNG_SIGNATURE)
+
+    drawn = []
+    monkeypatch.setattr(charts, "_render_to", drawn.append)
+    assert charts.team_charts(tables, "Burnley", directory=tmp_path) == paths
+    assert not drawn
+
+    # a change to the table only redraws the charts showing it
+    changed = table.copy()
+    changed.loc[changed["Squad"] == "Burnley", "GF"] += 1
+    charts.team_charts(FakeTables(changed), "Burnley", directory=tmp_path)
+    assert [job[0] for job in drawn] == ["goals"]
+
+
+def test_team_charts_unknown_team(tmp_path, table):
+    with pytest.raises(ValueError):
+        charts.team_charts(FakeTables(table), "Real Madrid", directory=tmp_path)
+
+
+def test_league_charts_in_a_pool(tmp_path, table):
+    tables = FakeTables(table)
+    squads = table["Squad"].tolist()[:4]
+    paths = charts.league_charts(
+        tables, squads, kinds=["form", "goals"], workers=2, directory=tmp_path
+    )
+    assert list(paths) == squads
+    files = sorted(tmp_path.glob("*/*.png"))
+    assert len(files) == 8
+    assert sorted(p for team in paths.values() for p in team.values()) == files
@@ -0,0 +1,74 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from twitter_bot import __main__ as cli
+
+ROOT = Path(__file__).parent.parent
+HEAVY = ["dagster", "pandas", "bs4", "tweepy", "pyarrow", "matplotlib"]
+
+
+def test_startup_imports_nothing_heavy():
+    code = (
+        "import sys\n"
+        "from twitter_bot import __main__ as cli\n"
+        "cli.build_parser()\n"
+        f"print(sorted(set({HEAVY!r}) & set(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_next_fixture_imports_nothing_heavy():
+    # the fixture and venue would come from the network, everything else runs as is
+    code = (
+        "import sys\n"
+        "from twitter_bot import __main__ as cli\n"
+        "import helpers\n"
+        "from models import Fixture\n"
+        "helpers.get_next_fixture = lambda team_id: Fixture.from_json([1, "
+        "'2022-10-29T14:00:00Z', 'TIMED', 15, [2016, 'Championship'], "
+        "[328, 'Burnley FC', 'Burnley', 'BUR'], [1081, 'Preston North End FC']])\n"
+        "helpers.get_home_team_venue = lambda fix: 'Turf Moor'\n"
+        "assert cli.main(['next-fixture', '--team-id', '328']) == 0\n"
+        f"print(sorted(set({HEAVY!r}) & set(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "Preston North End FC" in result.stdout
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_parse_subcommands():
+    parser = cli.build_parser()
+    args = parser.parse_args(["opp-stats", "--team-id", "59", "--post"])
+    assert (args.func, args.team_id, args.post) == (cli.opp_stats, 59, True)
+    args = parser.parse_args(["--timings", "next-fixture"])
+    assert args.timings and args.team_id == cli.default_team_id
+    with pytest.raises(SystemExit):
+        parser.parse_args([])
+
+
+def test_timings_report(monkeypatch, capsys):
+    def command(args, timings):
+        with timings.importing():
+            pass
+        return 3
+
+    monkeypatch.setattr(cli, "next_fixture", command)
+    assert cli.main(["--timings", "next-fixture"]) == 3
+    report = capsys.readouterr().err
+    assert report.startswith("startup ") and "imports" in report and "total" in report
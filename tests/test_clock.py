@@ -0,0 +1,61 @@
+import datetime
+
+import pytest
+
+# the clock the modules of twitter_bot read, imported by bare name as they import it
+import clock
+from fixture_store import FixtureStore
+
+UTC = datetime.timezone.utc
+
+
+@pytest.fixture
+def fake_clock():
+    fake = clock.FakeClock(datetime.datetime(2022, 10, 29, 13, tzinfo=UTC))
+    clock.set_clock(fake)
+    yield fake
+    clock.set_clock(None)
+
+
+def test_now_follows_the_clock(fake_clock):
+    assert clock.now() == datetime.datetime(2022, 10, 29, 13, tzinfo=UTC)
+    assert clock.utcnow() == datetime.datetime(2022, 10, 29, 13)
+    fake_clock.advance(24 * 60 * 60)
+    assert clock.unix_time() == fake_clock.time
+    assert clock.now().date() == datetime.date(2022, 10, 30)
+
+
+def test_system_clock_restored():
+    clock.set_clock(clock.FakeClock(0))
+    clock.set_clock(None)
+    assert clock.now().year >= 2022
+
+
+def match(match_id, kickoff):
+    return {
+        "id": match_id,
+        "utcDate": kickoff,
+        "status": "SCHEDULED",
+        "lastUpdated": "2022-07-01T10:00:00Z",
+        "homeTeam": {"id": 328},
+        "awayTeam": {"id": 68},
+        "competition": {"id": 2016},
+    }
+
+
+def test_fixture_store_replays_days(tmp_path, fake_clock):
+    store = FixtureStore(tmp_path / "fixtures.sqlite")
+    store.sync_matches(
+        [match(1, "2022-10-29T14:00:00Z"), match(2, "2022-11-05T15:00:00Z")]
+    )
+    assert store.next_fixture(328)["id"] == 1
+    fake_clock.advance(2 * 60 * 60)
+    assert store.next_fixture(328)["id"] == 2
+
+    calls = []
+    fetch = lambda endpoint: calls.append(endpoint) or {"matches": []}
+    store.sync_endpoint("teams/328/matches", fetch)
+    assert store.sync_endpoint("teams/328/matches", fetch) is None
+    fake_clock.advance(24 * 60 * 60)
+    store.sync_endpoint("teams/328/matches", fetch)
+    assert len(calls) == 2
@@ -0,0 +1,109 @@
+import threading
+
+import requests.exceptions
+from dagster import materialize
+
+from twitter_bot.assets import create_assets
+from twitter_bot.team_catalog import TeamCatalog
+
+TEAMS = {
+    2016: [
+        {
+            "id": 328,
+            "name": "Burnley FC",
+            "shortName": "Burnley",
+            "tla": "BUR",
+            "venue": "Turf Moor",
+        },
+        {"id": 68, "name": "Norwich City FC"},
+    ],
+    2021: [{"id": 57, "name": "Arsenal FC"}],
+}
+
+
+def fake_football_data(calls):
+    lock = threading.Lock()
+
+    def get_football_data(endpoint):
+        with lock:
+            calls.append(endpoint)
+        if endpoint == "competitions":
+            return {
+                "competitions": [
+                    {"id": comp_id, "name": f"Competition {comp_id}"}
+                    for comp_id in [*TEAMS, 9999]
+                ]
+            }
+        comp_id = int(endpoint.split("/")[1])
+        if comp_id not in TEAMS:
+            raise requests.exceptions.HTTPError("403 Client Error")
+        return {"teams": TEAMS[comp_id]}
+
+    return get_football_data
+
+
+def test_write_csv_if_changed(tmp_path):
+    path = tmp_path / "team_ids_2016.csv"
+    rows = [{"team_id": 328, "team_name": "Burnley FC"}]
+    first = create_assets.write_csv_if_changed(path, rows, create_assets.TEAM_FIELDS)
+    assert first["changed"] and first["rows"] == 1
+    assert path.read_text() == "team_id,team_name\n328,Burnley FC\n"
+    mtime = path.stat().st_mtime_ns
+    second = create_assets.write_csv_if_changed(path, rows, create_assets.TEAM_FIELDS)
+    assert not second["changed"]
+    assert second["content_hash"] == first["content_hash"]
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_refresh_reference_data(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(create_assets, "get_football_data", fake_football_data(calls))
+    results = create_assets.refresh_reference_data(workers=3, directory=tmp_path)
+    assert results[9999] is None
+    assert results[2016]["rows"] == 2 and results[2021]["rows"] == 1
+    assert create_assets.read_competition_ids(tmp_path / "comp_ids.csv") == [
+        2016,
+        2021,
+        9999,
+    ]
+    assert not (tmp_path / "team_ids_9999.csv").exists()
+
+    again = create_assets.refresh_reference_data(workers=3, directory=tmp_path)
+    assert not any(result["changed"] for result in again.values() if result)
+    assert len(calls) == 8
+
+
+def test_partitioned_team_assets(monkeypatch, tmp_path):
+    monkeypatch.setattr(create_assets, "data_dir", tmp_path)
+    monkeypatch.setattr(create_assets, "get_football_data", fake_football_data([]))
+    result = materialize(
+        [create_assets.get_comp_team_ids, create_assets.write_comp_team_ids],
+        partition_key="2016",
+    )
+    assert result.success
+    assert (tmp_path / "team_ids_2016.csv").read_text().splitlines() == [
+        "team_id,team_name",
+        "328,Burnley FC",
+        "68,Norwich City FC",
+    ]
+
+
+def test_partitioned_team_catalog(monkeypatch, tmp_path):
+    monkeypatch.setattr(create_assets, "catalog_dir", tmp_path)
+    monkeypatch.setattr(create_assets, "get_football_data", fake_football_data([]))
+    monkeypatch.setattr(
+        create_assets,
+        "fetch_squad_urls",
+        lambda comp_id: {"Burnley": "https://fbref.com/en/squads/943e8050/Burnley"},
+    )
+    result = materialize(
+        [create_assets.get_comp_team_ids, create_assets.write_team_catalog],
+        partition_key="2016",
+    )
+    assert result.success
+    catalog = TeamCatalog.load(tmp_path)
+    burnley = catalog.get(328)
+    assert (burnley.fbref_squad, burnley.competition_id) == ("Burnley", 2016)
+    assert burnley.fbref_url == "https://fbref.com/en/squads/943e8050/Burnley"
+    assert burnley.venue == "Turf Moor" and burnley.aliases == ("Burnley", "BUR")
+    assert catalog.get(68).fbref_squad == "Norwich City"
@@ -0,0 +1,170 @@
+import importlib.util
+import json
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+import tweepy
+
+SCRIPT = (
+    Path(__file__).parent.parent
+    / "twitter_bot"
+    / "scripts"
+    / "python"
+    / "delete_all.py"
+)
+spec = importlib.util.spec_from_file_location("delete_all", SCRIPT)
+delete_all = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(delete_all)
+
+
+def error_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = b"{}"  # pylint: disable=protected-access
+    return response
+
+
+class Status:
+    def __init__(self, status_id):
+        self.id = status_id
+        self._json = {"id": status_id, "created_at": "Sat Oct 29 14:00:00 +0000 2022"}
+        self._json["full_text"] = f"tweet {status_id}"
+
+
+class FakeAPI:
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.deleted = []
+        self.lock = threading.Lock()
+
+    def destroy_status(self, status_id):
+        with self.lock:
+            errors = self.errors.get(status_id)
+            if errors:
+                raise errors.pop(0)
+            self.deleted.append(status_id)
+
+    def user_timeline(self, **kwargs):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_export_resumes_from_oldest_exported(tmp_path, monkeypatch):
+    calls = []
+
+    class FakeCursor:
+        def __init__(self, _method, **kwargs):
+            calls.append(kwargs)
+            self.max_id = kwargs.get("max_id", 10)
+
+        def items(self):
+            return (Status(i) for i in range(self.max_id, 0, -1))
+
+    monkeypatch.setattr(tweepy, "Cursor", FakeCursor)
+    archive = tmp_path / "timeline.jsonl"
+    partial = tmp_path / "timeline.jsonl.part"
+    partial.write_text('{"id":10}\n{"id":9}\n')
+
+    assert delete_all.export_timeline(FakeAPI(), archive) == 8
+    assert calls[0]["max_id"] == 8
+    assert not partial.exists()
+    assert list(delete_all.archived_ids(archive)) == list(range(10, 0, -1))
+    assert json.loads(archive.read_text().split("\n")[-2]) == {
+        "id": 1,
+        "created_at": "Sat Oct 29 14:00:00 +0000 2022",
+        "text": "tweet 1",
+    }
+
+
+def test_deleted_ids_checkpointed_and_skipped_on_resume(tmp_path):
+    checkpoint = delete_all.Checkpoint(tmp_path / "deleted.txt")
+    api = FakeAPI()
+    counts = delete_all.delete_statuses(api, iter(range(1, 51)), checkpoint, workers=4)
+    checkpoint.close()
+    assert counts == {"deleted": 50, "skipped": 0, "failed": 0}
+    assert sorted(api.deleted) == list(range(1, 51))
+
+    checkpoint = delete_all.Checkpoint(tmp_path / "deleted.txt")
+    counts = delete_all.delete_statuses(api, iter(range(1, 61)), checkpoint, workers=4)
+    assert counts == {"deleted": 10, "skipped": 50, "failed": 0}
+    assert len(api.deleted) == 60
+
+
+def test_rate_limit_pauses_until_reset():
+    clock = FakeClock()
+    gate = delete_all.RateGate(clock=clock, sleep=clock.sleep)
+    limited = tweepy.errors.TooManyRequests(
+        error_response(429, {"x-rate-limit-reset": "1600"})
+    )
+    api = FakeAPI({7: [limited]})
+    assert delete_all.delete_status(api, 7, gate)
+    assert clock.now >= 1601
+    assert api.deleted == [7]
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (tweepy.errors.NotFound(error_response(404)), True),
+        (tweepy.errors.Forbidden(error_response(403)), False),
+    ],
+    ids=["already deleted", "forbidden"],
+)
+def test_client_errors_not_retried(error, expected):
+    clock = FakeClock()
+    gate = delete_all.RateGate(clock=clock, sleep=clock.sleep)
+    api = FakeAPI({3: [error]})
+    assert delete_all.delete_status(api, 3, gate) is expected
+    assert api.deleted == []
+
+
+def test_tweets_posted_since_export_added_to_archive(tmp_path, monkeypatch):
+    calls = []
+
+    class FakeCursor:
+        def __init__(self, _method, **kwargs):
+            calls.append(kwargs)
+
+        def items(self):
+            return (Status(i) for i in (12, 11))
+
+    monkeypatch.setattr(tweepy, "Cursor", FakeCursor)
+    archive = tmp_path / "timeline.jsonl"
+    archive.write_text('{"id":10}\n{"id":9}\n')
+
+    assert delete_all.update_timeline(FakeAPI(), archive) == 2
+    assert calls[0]["since_id"] == 10
+    assert list(delete_all.archived_ids(archive)) == [12, 11, 10, 9]
+
+
+def test_rate_limit_waits_not_counted_as_attempts():
+    clock = FakeClock()
+    gate = delete_all.RateGate(clock=clock, sleep=clock.sleep)
+    limited = [
+        tweepy.errors.TooManyRequests(error_response(429))
+        for _ in range(delete_all.MAX_ATTEMPTS + 1)
+    ]
+    api = FakeAPI({7: limited})
+    assert delete_all.delete_status(api, 7, gate)
+    assert api.deleted == [7]
+
+
+def test_worker_errors_raised(tmp_path):
+    checkpoint = delete_all.Checkpoint(tmp_path / "deleted.txt")
+    checkpoint.close()
+    # writing to the closed checkpoint fails in the worker
+    with pytest.raises(ValueError):
+        delete_all.delete_statuses(FakeAPI(), iter(range(1, 20)), checkpoint)
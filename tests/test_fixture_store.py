@@ -0,0 +1,121 @@
+import datetime
+import threading
+
+import pytest
+
+from twitter_bot.fixture_store import FixtureStore, utc_timestamp
+
+
+def match(fixture_id, home, away, kickoff, last_updated="2022-10-01T00:00:00Z"):
+    return {
+        "id": fixture_id,
+        "utcDate": kickoff,
+        "status": "SCHEDULED",
+        "lastUpdated": last_updated,
+        "homeTeam": {"id": home, "name": f"Team {home}", "shortName": f"T{home}"},
+        "awayTeam": {"id": away, "name": f"Team {away}", "shortName": f"T{away}"},
+        "competition": {"id": 2016, "name": "Championship", "type": "LEAGUE"},
+    }
+
+
+NOW = datetime.datetime(2022, 10, 20, 12, 0)
+MATCHES = [
+    match(1, 328, 68, "2022-10-15T14:00:00Z"),
+    match(2, 59, 328, "2022-10-22T14:00:00Z"),
+    match(3, 328, 70, "2022-10-29T14:00:00Z"),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FixtureStore(tmp_path / "fixtures.sqlite")
+    store.sync_matches(MATCHES)
+    return store
+
+
+def test_next_fixture(store):
+    assert store.next_fixture(328, after=NOW)["id"] == 2
+    assert store.next_fixture(70, after=NOW)["id"] == 3
+    assert store.next_fixture(328, competition_id=2001, after=NOW) is None
+    assert store.next_fixture(999, after=NOW) is None
+
+
+def test_fixtures_between(store):
+    start = datetime.datetime(2022, 10, 22, tzinfo=datetime.timezone.utc)
+    week = start + datetime.timedelta(days=7)
+    assert [m["id"] for m in store.fixtures_between(start, week)] == [2]
+    fortnight = store.fixtures_between(start - datetime.timedelta(days=7), week)
+    assert [m["id"] for m in fortnight] == [1, 2]
+    assert store.fixtures_between(start, week, team_ids=[70]) == []
+
+
+def test_sync_is_incremental(store):
+    moved = match(2, 59, 328, "2022-10-23T12:00:00Z", "2022-10-05T00:00:00Z")
+    counts = store.sync_matches(
+        MATCHES[:1] + [moved, match(4, 68, 59, "2022-11-01T19:45:00Z")]
+    )
+    assert counts == {"added": 1, "updated": 1, "rescheduled": 1}
+    assert store.next_fixture(328, after=NOW)["utcDate"] == "2022-10-23T12:00:00Z"
+    [change] = store.fixture_changes(team_id=328)
+    assert (change["old_kickoff"], change["new_kickoff"]) == (
+        "2022-10-22T14:00:00Z",
+        "2022-10-23T12:00:00Z",
+    )
+    assert store.fixture_changes(team_id=70) == []
+
+
+def test_sync_endpoint_skips_recent_sync(store):
+    calls = []
+
+    def fetch(endpoint):
+        calls.append(endpoint)
+        return {"matches": MATCHES}
+
+    assert store.sync_endpoint("teams/328/matches", fetch) is not None
+    assert store.sync_endpoint("teams/328/matches", fetch) is None
+    assert calls == ["teams/328/matches"]
+
+
+def test_announced_kickoff_persists(store, tmp_path):
+    assert store.announced_kickoff(328) is None
+    store.mark_announced(328, datetime.datetime(2022, 10, 22, 14, 0))
+    reopened = FixtureStore(tmp_path / "fixtures.sqlite")
+    assert reopened.announced_kickoff(328) == "2022-10-22T14:00:00Z"
+    assert reopened.announced() == {328: "2022-10-22T14:00:00Z"}
+
+
+def test_announce_compares_and_sets(store):
+    first = datetime.datetime(2022, 10, 22, 14, 0)
+    moved = datetime.datetime(2022, 10, 23, 12, 0)
+    assert store.announce(328, first, expected=None)
+    assert not store.announce(328, first, expected=None)
+    assert not store.announce(328, moved, expected="2022-10-15T14:00:00Z")
+    assert store.announce(328, moved, expected="2022-10-22T14:00:00Z")
+    assert store.announced_kickoff(328) == "2022-10-23T12:00:00Z"
+
+
+def test_only_one_concurrent_run_announces(tmp_path):
+    path = tmp_path / "fixtures.sqlite"
+    kickoff = datetime.datetime(2022, 10, 22, 14, 0)
+    stores = [FixtureStore(path) for _ in range(8)]
+    # every run reads the announcement before any of them records one
+    expected = [store.announced_kickoff(328) for store in stores]
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda s=store, e=seen: results.append(s.announce(328, kickoff, e))
+        )
+        for store, seen in zip(stores, expected)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+
+
+def test_utc_timestamp_converts_aware_datetimes():
+    bst = datetime.timezone(datetime.timedelta(hours=1))
+    assert utc_timestamp(datetime.datetime(2022, 10, 22, 15, 0, tzinfo=bst)) == (
+        "2022-10-22T14:00:00Z"
+    )
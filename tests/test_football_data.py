@@ -0,0 +1,114 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_cache
+from twitter_bot.football_data import (
+    FootballDataClient,
+    SharedTokenBucket,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_queues_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(10, clock=clock, sleep=clock.sleep)
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.now == 0
+    bucket.acquire()
+    assert clock.now == pytest.approx(6)
+
+
+def test_token_bucket_follows_quota_headers():
+    clock = FakeClock()
+    bucket = TokenBucket(10, clock=clock, sleep=clock.sleep)
+    bucket.update(available=0, reset_in=42)
+    bucket.acquire()
+    assert clock.now == pytest.approx(42)
+
+
+def test_shared_token_bucket_one_quota_across_processes(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "rate_limits.sqlite"
+    # each bucket has its own connection, as it would in another process
+    first, second = (
+        SharedTokenBucket(10, path, clock=clock, sleep=clock.sleep) for _ in range(2)
+    )
+    for _ in range(5):
+        first.acquire()
+        second.acquire()
+    assert clock.now == 0
+    second.acquire()
+    assert clock.now == pytest.approx(6)
+    first.update(available=0, reset_in=42)
+    second.acquire()
+    assert clock.now == pytest.approx(48)
+
+
+class StubAPI(BaseHTTPRequestHandler):
+    hits = 0
+    available = 9
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        type(self).hits += 1
+        time.sleep(0.2)
+        body = b'{"venue": "Turf Moor"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Requests-Available-Minute", str(self.available))
+        self.send_header("X-RequestCounter-Reset", "30")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    StubAPI.hits = 0
+    StubAPI.available = 9
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cache = http_cache.ResponseCache(tmp_path / "cache.sqlite", ttls={"default": 0})
+    monkeypatch.setattr(http_cache, "_default_cache", cache)
+    yield FootballDataClient(
+        token="x", url=f"http://127.0.0.1:{server.server_address[1]}"
+    )
+    server.shutdown()
+
+
+def test_concurrent_identical_requests_coalesced(client):
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(client.get_json("teams/328")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [{"venue": "Turf Moor"}] * 5
+    assert StubAPI.hits == 1
+    assert client.stats == {"calls": 5, "coalesced": 4}
+
+
+def test_quota_header_limits_bucket(client):
+    StubAPI.available = 0
+    client.get_json("teams/328")
+    assert client.limiter.blocked_until > time.monotonic() + 20
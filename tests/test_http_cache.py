@@ -0,0 +1,88 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from twitter_bot.http_cache import ResponseCache
+
+PAGES = {"/league": b"<html>league table</html>", "/big": b"x" * 600}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        etag = f'"{self.path}-v1"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = PAGES[self.path]
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_fresh_response_served_from_cache(tmp_path, stub_server):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttls={"fbref": 60})
+    first = cache.get(f"{stub_server}/league", source="fbref")
+    second = cache.get(f"{stub_server}/league", source="fbref")
+    assert first.text == second.text == "<html>league table</html>"
+    assert not first.from_cache and second.from_cache
+    assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+    assert len(StubHandler.requests_seen) == 1
+
+
+def test_stale_response_revalidated_with_etag(tmp_path, stub_server):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttls={"default": 0})
+    cache.get(f"{stub_server}/league")
+    response = cache.get(f"{stub_server}/league")
+    assert response.from_cache
+    assert response.text == "<html>league table</html>"
+    assert cache.stats["revalidated"] == 1
+    assert StubHandler.requests_seen[-1] == ("/league", '"/league-v1"')
+
+
+def test_max_age_overrides_ttl(tmp_path, stub_server):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttls={"default": 60})
+    cache.get(f"{stub_server}/league")
+    assert cache.get(f"{stub_server}/league", max_age=0).from_cache
+    assert cache.stats == {"hits": 0, "misses": 1, "revalidated": 1, "evictions": 0}
+    assert StubHandler.requests_seen[-1] == ("/league", '"/league-v1"')
+
+
+def test_cache_persists_between_instances(tmp_path, stub_server):
+    ResponseCache(tmp_path / "cache.sqlite", ttls={"default": 60}).get(
+        f"{stub_server}/league"
+    )
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttls={"default": 60})
+    assert cache.get(f"{stub_server}/league").from_cache
+    assert len(StubHandler.requests_seen) == 1
+
+
+def test_least_recently_used_evicted(tmp_path, stub_server):
+    cache = ResponseCache(
+        tmp_path / "cache.sqlite", max_bytes=610, ttls={"default": 60}
+    )
+    cache.get(f"{stub_server}/league")
+    cache.get(f"{stub_server}/big")
+    assert cache.stats["evictions"] == 1
+    assert cache.size() == 600
+    assert not cache.get(f"{stub_server}/league").from_cache
@@ -0,0 +1,69 @@
+import json
+import os
+import time
+
+from dagster import job, op
+
+# the modules of twitter_bot share these by bare name, as they import each other
+from json_io_manager import decode, encode, json_io_manager
+from models import Fixture
+from test_models import MATCH
+
+
+def test_encode_round_trips_fixtures_and_int_keys():
+    value = {
+        2016: {"added": 1, "updated": 0},
+        "fixtures": [Fixture.from_match(MATCH), None],
+    }
+    text = json.dumps(encode(value))
+    assert decode(json.loads(text)) == value
+
+
+def test_fixture_handed_between_steps_as_json(tmp_path):
+    @op
+    def load_fixture():
+        return Fixture.from_match(MATCH)
+
+    @op
+    def kickoff(fix):
+        return {fix.home_team_id: fix.date.isoformat()}
+
+    @job(
+        resource_defs={
+            "io_manager": json_io_manager.configured({"base_dir": str(tmp_path)})
+        }
+    )
+    def fixture_job():
+        kickoff(load_fixture())
+
+    result = fixture_job.execute_in_process()
+    assert result.output_for_node("kickoff") == {328: "2022-10-29T15:00:00+01:00"}
+    assert sorted(p.name for p in tmp_path.rglob("*.json")) == ["result.json"] * 2
+    assert not list(tmp_path.rglob("*.pickle"))
+
+
+def test_outputs_of_old_runs_pruned_by_the_next_run(tmp_path):
+    old_run = tmp_path / "old-run"
+    (old_run / "load_fixture").mkdir(parents=True)
+    (old_run / "load_fixture" / "result.json").write_text("[]")
+    two_days_ago = time.time() - 2 * 24 * 60 * 60 - 1
+    os.utime(old_run, (two_days_ago, two_days_ago))
+    recent_run = tmp_path / "recent-run"
+    recent_run.mkdir()
+
+    @op
+    def load_fixture():
+        return Fixture.from_match(MATCH)
+
+    @job(
+        resource_defs={
+            "io_manager": json_io_manager.configured({"base_dir": str(tmp_path)})
+        }
+    )
+    def fixture_job():
+        load_fixture()
+
+    result = fixture_job.execute_in_process()
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        [result.run_id, "recent-run"]
+    )
@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# the modules of twitter_bot share these by bare name, as they import each other
+from league_stats import (
+    decode_form,
+    encode_form,
+    form_emoji,
+    league_stats,
+    line_gap,
+)
+from standings import parse_standings_table
+
+FBREF_HTML = Path(__file__).parent / "data" / "fbref_championship.html"
+
+
+@pytest.fixture(scope="module")
+def standings():
+    return parse_standings_table(FBREF_HTML.read_text(encoding="utf-8"))
+
+
+def test_form_packed_latest_result_lowest():
+    form = encode_form(pd.Series(["W W D L W", "L", "", None, "D W W W W L"]))
+    assert form["form_code"].tolist() == [0b1111100111, 0b01, 0, 0, 0b1111111101]
+    assert form["form_points"].tolist() == [10, 0, 0, 0, 12]
+    assert decode_form(0b1111100111) == "W W D L W"
+    assert decode_form(0b01) == "L"
+    assert form_emoji([0b1010]).tolist() == ["\U0001F7E1 \U0001F7E1"]
+
+
+def test_line_gap_either_side_of_the_line():
+    points = np.array([30, 25, 20, 20, 18, 10])
+    assert line_gap(points, 2).tolist() == [10, 5, -5, -5, -7, -15]
+    assert line_gap(points, 6).tolist() == [0] * 6
+
+
+def test_league_stats_whole_table(standings):
+    stats = league_stats(
+        standings, 2016, pd.Series({"Norwich City": 5, "Sheffield Utd": 1})
+    )
+    assert len(stats) == len(standings)
+    assert stats.index[0] == "Sheffield Utd"
+    assert str(stats["form_code"].dtype) == "uint16"
+    assert str(stats["rank_change"].dtype) == "Int16"
+    norwich = stats.loc["Norwich City"]
+    assert norwich["points_per_game"] == pytest.approx(2.0)
+    assert norwich["goal_ratio"] == pytest.approx(1.8)
+    assert norwich["form_points"] == 11
+    assert norwich["rank_change"] == 3
+    assert stats.loc["Sheffield Utd", "rank_change"] == 0
+    assert pd.isna(stats.loc["Burnley", "rank_change"])
+    # sixth place is the last play-off place and the bottom three go down
+    assert (stats["playoff_gap"].iloc[:6] >= 0).all()
+    assert (stats["playoff_gap"].iloc[6:] <= 0).all()
+    assert (stats["relegation_gap"].iloc[:-3] >= 0).all()
+    assert (stats["relegation_gap"].iloc[-3:] <= 0).all()
+    assert stats.loc["Blackpool", "relegation_gap"] == 2
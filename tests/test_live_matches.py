@@ -0,0 +1,237 @@
+import asyncio
+import datetime
+import heapq
+
+import pytest
+
+# the modules of twitter_bot share these by bare name, as they import each other
+import clock
+import live_matches
+from live_matches import LivePoller, MatchFeed, poll_interval
+
+UTC = datetime.timezone.utc
+SATURDAY = datetime.datetime(2022, 10, 29, tzinfo=UTC)
+MATCH_LENGTH = datetime.timedelta(minutes=115)
+
+
+class VirtualTime:
+    """Runs a coroutine against a FakeClock, waking its sleepers in time order."""
+
+    def __init__(self, fake_clock):
+        self.clock = fake_clock
+        self._sleepers = []
+        self._count = 0
+
+    async def sleep(self, seconds):
+        future = asyncio.get_running_loop().create_future()
+        self._count += 1
+        heapq.heappush(self._sleepers, (self.clock() + seconds, self._count, future))
+        await future
+
+    def run(self, coro):
+        async def drive():
+            task = asyncio.ensure_future(coro)
+            while not task.done():
+                # let every task run until it sleeps
+                for _ in range(20):
+                    await asyncio.sleep(0)
+                if self._sleepers and not task.done():
+                    when, _, future = heapq.heappop(self._sleepers)
+                    self.clock.set(max(when, self.clock()))
+                    future.set_result(None)
+            return task.result()
+
+        return asyncio.run(drive())
+
+
+def match(match_id, kickoff, competition_id=2016, status="SCHEDULED"):
+    return {
+        "id": match_id,
+        "utcDate": kickoff.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "status": status,
+        "competition": {"id": competition_id, "name": "Championship"},
+        "homeTeam": {"id": match_id * 2, "name": f"Home {match_id}"},
+        "awayTeam": {"id": match_id * 2 + 1, "name": f"Away {match_id}"},
+    }
+
+
+class FakeFootballData:
+    """Answers matchday endpoints with each match's status as of the clock."""
+
+    def __init__(self, matches):
+        self.matches = matches
+        self.requests = []
+
+    async def fetch(self, endpoint):
+        self.requests.append((clock.unix_time(), endpoint))
+        competition_id = int(endpoint.split("/")[1])
+        return {
+            "matches": [
+                self.played(m)
+                for m in self.matches
+                if m["competition"]["id"] == competition_id
+            ]
+        }
+
+    @staticmethod
+    def played(m):
+        kickoff = datetime.datetime.strptime(
+            m["utcDate"], "%Y-%m-%dT%H:%M:%SZ"
+        ).replace(tzinfo=UTC)
+        if m["status"] != "SCHEDULED" or clock.now() < kickoff:
+            return m
+        if clock.now() < kickoff + MATCH_LENGTH:
+            return dict(m, status="IN_PLAY")
+        return dict(m, status="FINISHED", score={"fullTime": {"home": 2, "away": 1}})
+
+
+@pytest.fixture
+def virtual_time():
+    fake = clock.FakeClock(SATURDAY + datetime.timedelta(hours=9))
+    clock.set_clock(fake)
+    yield VirtualTime(fake)
+    clock.set_clock(None)
+
+
+@pytest.mark.parametrize(
+    "status, minutes, expected",
+    [
+        ("SCHEDULED", -15, 10 * 60),
+        ("TIMED", -3, 3 * 60),
+        ("IN_PLAY", 0, 10 * 60),
+        ("PAUSED", 100, 5 * 60),
+        ("IN_PLAY", 110, 60),
+        ("FINISHED", 110, None),
+        ("POSTPONED", -15, None),
+        ("IN_PLAY", 4 * 60, None),
+    ],
+)
+def test_poll_interval(status, minutes, expected):
+    kickoff = SATURDAY + datetime.timedelta(hours=15)
+    at = kickoff + datetime.timedelta(minutes=minutes)
+    assert poll_interval(status, kickoff, at) == expected
+
+
+def test_saturday_of_fixtures_stays_within_quota(virtual_time):
+    three_pm = SATURDAY + datetime.timedelta(hours=15)
+    matches = (
+        [match(1, SATURDAY + datetime.timedelta(hours=11, minutes=30))]
+        + [match(i, three_pm) for i in range(2, 13)]
+        + [match(13, three_pm, competition_id=2021)]
+        + [match(14, three_pm, status="POSTPONED")]
+        + [match(15, SATURDAY + datetime.timedelta(hours=19, minutes=45))]
+    )
+    api = FakeFootballData(matches)
+    finished = []
+
+    def on_finished(m):
+        finished.append((clock.now(), m["id"]))
+
+    poller = LivePoller(
+        MatchFeed(api.fetch, sleep=virtual_time.sleep),
+        on_finished,
+        sleep=virtual_time.sleep,
+    )
+    results = virtual_time.run(poller.run(matches))
+
+    statuses = [m["status"] for m in results]
+    assert statuses == ["FINISHED"] * 13 + ["POSTPONED", "FINISHED"]
+    assert sorted(match_id for _, match_id in finished) == list(range(1, 14)) + [15]
+    # each result is found within a couple of polls of full time
+    for finished_at, match_id in finished:
+        kickoff = datetime.datetime.strptime(
+            matches[match_id - 1]["utcDate"], "%Y-%m-%dT%H:%M:%SZ"
+        ).replace(tzinfo=UTC)
+        assert finished_at - (kickoff + MATCH_LENGTH) <= datetime.timedelta(minutes=2)
+    # one request a poll covers a competition's whole day of matches
+    times = [t for t, _ in api.requests]
+    assert len(times) < 100
+    assert max(sum(1 for u in times if t <= u < t + 60) for t in times) <= 10
+
+
+class FakeTables:
+    def __init__(self, url):
+        self.url = url
+
+    def collect_stats(self, team_name):
+        if team_name == "Away 1":
+            raise ValueError(f"{team_name} not found in {self.url}")
+        return {
+            "position": 2,
+            "goals_for": 30,
+            "goals_against": 12,
+            "form_emoji": "WWD",
+            "top_scorer": "Foster",
+            "wins": 9,
+            "draws": 4,
+            "loss": 2,
+        }
+
+
+def test_finished_match_synced_and_result_queued(monkeypatch):
+    synced, queued = [], []
+    store = type("Store", (), {"sync_matches": lambda _self, m: synced.extend(m)})()
+    monkeypatch.setattr(live_matches, "get_fixture_store", lambda: store)
+    monkeypatch.setattr(live_matches, "Tables", FakeTables)
+    monkeypatch.setattr(
+        live_matches,
+        "send_tweet",
+        lambda t, team_id: queued.append((t, team_id)) or len(queued),
+    )
+    finished = dict(
+        match(1, SATURDAY),
+        status="FINISHED",
+        score={"fullTime": {"home": 3, "away": 0}},
+    )
+    assert live_matches.post_full_time(finished, team_ids=[2, 8]) == [1, 2]
+    assert synced == [finished]
+    assert queued == [
+        ("Full time in the Championship\n\nHome 1 3 - 0 Away 1", 2),
+        (
+            "Home 1 currently sit 2nd in the Championship.\n"
+            "Having scored 30 and conceded 12 goals \U000026BD\n\n"
+            "Form: WWD\nTop Scorer(s): Foster\nW: 9, D: 4,  L: 2",
+            2,
+        ),
+    ]
+
+    # the result is still posted when the stats of a tracked team cannot be found
+    queued.clear()
+    assert live_matches.post_full_time(finished, team_ids=[3]) == [1]
+    assert queued == [("Full time in the Championship\n\nHome 1 3 - 0 Away 1", 3)]
+
+    queued.clear()
+    assert live_matches.post_full_time(dict(finished, score={}), team_ids=[2]) == []
+    assert not queued
+
+
+def test_watch_kickoff_watches_the_tracked_fixtures_of_one_kickoff(
+    monkeypatch, tmp_path
+):
+    from fixture_store import FixtureStore
+
+    store = FixtureStore(tmp_path / "fixtures.sqlite")
+    kickoff = SATURDAY + datetime.timedelta(hours=15)
+    later = kickoff + datetime.timedelta(hours=2)
+    store.sync_matches(
+        [
+            match(1, kickoff),
+            match(2, kickoff),
+            match(3, later),
+            match(4, kickoff, status="FINISHED"),
+        ]
+    )
+    teams = [{"team_id": team_id, "competition_id": 2016} for team_id in (2, 6, 8)]
+    monkeypatch.setattr(live_matches, "get_fixture_store", lambda: store)
+    monkeypatch.setattr(live_matches, "read_tracked_teams", lambda *args: teams)
+
+    class Poller:
+        def __init__(self, on_finished):
+            assert on_finished.keywords == {"team_ids": [2, 6, 8]}
+
+        async def run(self, matches):
+            return list(matches)
+
+    monkeypatch.setattr(live_matches, "LivePoller", Poller)
+    watched = live_matches.watch_kickoff(kickoff)
+    assert [m["id"] for m in watched] == [1]
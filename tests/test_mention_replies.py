@@ -0,0 +1,146 @@
+import datetime
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# the modules of twitter_bot share these by bare name, as they import each other
+import clock
+import mention_replies
+from fixture_store import FixtureStore
+from tweet_queue import TweetQueue, QueueDrainer, SENT
+
+FOOTBALL_DATA = Path(__file__).parent / "data" / "football_data.json"
+TEAMS = [
+    {"team_id": 328, "team_name": "Burnley FC", "competition_id": 2016},
+    {"team_id": 74, "team_name": "West Bromwich Albion FC", "competition_id": 2016},
+    {"team_id": 69, "team_name": "Queens Park Rangers FC", "competition_id": 2016},
+]
+ME = 1
+
+
+class FakeTwitter:
+    """Answers get_me, get_users_mentions and create_tweet like tweepy.Client."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.requests = []
+        self.posted = []
+
+    def get_me(self, **_kwargs):
+        return SimpleNamespace(data=SimpleNamespace(id=ME))
+
+    def get_users_mentions(self, user_id, **params):
+        self.requests.append(params)
+        mentions, next_token = self.pages.pop(0) if self.pages else ([], None)
+        meta = {"result_count": len(mentions)}
+        if mentions:
+            meta["newest_id"] = max((m.id for m in mentions), key=int)
+        if next_token:
+            meta["next_token"] = next_token
+        users = [
+            SimpleNamespace(id=m.author_id, username=f"fan{m.author_id}")
+            for m in mentions
+        ]
+        return SimpleNamespace(
+            data=mentions or None, includes={"users": users}, meta=meta
+        )
+
+    def create_tweet(self, text, **kwargs):
+        self.posted.append(dict(kwargs, text=text))
+        return SimpleNamespace(data={"id": str(len(self.posted)), "text": text})
+
+
+def mention(tweet_id, text, author_id=7):
+    return SimpleNamespace(id=str(tweet_id), text=text, author_id=author_id)
+
+
+@pytest.fixture
+def fake_clock():
+    fake = clock.FakeClock(
+        datetime.datetime(2022, 10, 28, 12, tzinfo=datetime.timezone.utc)
+    )
+    clock.set_clock(fake)
+    yield fake
+    clock.set_clock(None)
+
+
+@pytest.fixture
+def table(tmp_path, fake_clock, monkeypatch):
+    recorded = json.loads(FOOTBALL_DATA.read_text(encoding="utf-8"))
+    store = FixtureStore(tmp_path / "fixtures.sqlite")
+    store.sync_matches(recorded["competitions/2016/matches"]["matches"])
+    monkeypatch.setattr(mention_replies, "get_fixture_store", lambda: store)
+    monkeypatch.setattr(mention_replies, "sync_competition_matches", lambda _id: None)
+    table = mention_replies.FixtureTable(TEAMS)
+    table.refresh()
+    return table
+
+
+def make_replier(table, tmp_path, pages):
+    twitter = FakeTwitter(pages)
+    queue = TweetQueue(tmp_path / "tweets.sqlite", clock=clock.unix_time)
+    drainer = QueueDrainer(queue, client_factory=lambda _account: twitter)
+    replier = mention_replies.MentionReplier(
+        table, drainer, cursor_path=tmp_path / "mentions.cursor"
+    )
+    return replier, twitter
+
+
+def test_lookup_by_name_alias_and_short_name(table):
+    burnley = table.lookup("@twitterclarets who do Burnley play next?")
+    assert burnley["team"] == "Burnley"
+    assert burnley["competition"] == "Championship"
+    assert burnley["h_a"] in ("at home", "away")
+    assert table.lookup("West Brom next?")["team"] == "West Bromwich Albion"
+    assert table.lookup("when are QPR on")["team"] == "Queens Park Rangers"
+    assert table.lookup("Burnley v West Brom") is None
+    assert table.lookup("Real Madrid") is None
+
+
+def test_first_poll_only_starts_the_cursor(table, tmp_path):
+    replier, twitter = make_replier(
+        table, tmp_path, [([mention(100, "Burnley next?")], None)]
+    )
+    assert replier.run_once() == 0
+    assert replier.since_id == "100"
+    assert twitter.posted == []
+
+
+def test_burst_of_mentions_answered_in_one_batch(table, tmp_path):
+    replier, twitter = make_replier(
+        table,
+        tmp_path,
+        [
+            ([mention(100, "hello")], None),
+            (
+                [mention(103, "Burnley next?", 8), mention(102, "West Brom?", 9)],
+                "page-2",
+            ),
+            (
+                [mention(101, "when are QPR on"), mention(104, "@twitterclarets hi")],
+                None,
+            ),
+        ],
+    )
+    replier.run_once()
+    assert replier.run_once() == 3
+    assert twitter.requests[1]["since_id"] == "100"
+    assert twitter.requests[2]["pagination_token"] == "page-2"
+    assert [p["in_reply_to_tweet_id"] for p in twitter.posted] == ["101", "102", "103"]
+    assert twitter.posted[0]["text"].startswith("@fan7 Queens Park Rangers play ")
+    assert twitter.posted[2]["text"].startswith("@fan8 Burnley play ")
+    assert replier.since_id == "104"
+    assert replier.drainer.queue.counts() == {SENT: 3}
+
+
+def test_own_tweets_not_answered(table, tmp_path):
+    replier, twitter = make_replier(
+        table,
+        tmp_path,
+        [([mention(100, "hi")], None), ([mention(101, "Burnley", author_id=ME)], None)],
+    )
+    replier.run_once()
+    assert replier.run_once() == 0
+    assert twitter.posted == []
@@ -0,0 +1,86 @@
+import pytest
+
+from twitter_bot import metrics as metrics_module
+from twitter_bot.metrics import Metrics, MetricsStore, measure_op, to_textfile
+
+
+def test_totals_filtered_by_labels():
+    metrics = Metrics()
+    metrics.inc("cache_requests_total", source="fbref", result="hit")
+    metrics.inc("cache_requests_total", 2, source="football-data", result="hit")
+    metrics.inc("cache_requests_total", source="fbref", result="miss")
+    assert metrics.total("cache_requests_total") == 4
+    assert metrics.total("cache_requests_total", result="hit") == 3
+    assert metrics.total("cache_requests_total", source="fbref", result="miss") == 1
+
+
+def test_timer_records_summary():
+    metrics = Metrics()
+    for _ in range(3):
+        with metrics.timer("http_request", source="fbref"):
+            pass
+    assert metrics.total("http_request_seconds_count", source="fbref") == 3
+    assert metrics.total("http_request_seconds_sum") >= 0
+    assert metrics.kinds["http_request_seconds"] == "summary"
+
+
+def test_store_accumulates_counters_across_processes(tmp_path):
+    store = MetricsStore(tmp_path / "metrics.sqlite")
+    for _ in range(2):
+        # each flush of a process adds its pending counts to the shared totals
+        metrics = Metrics()
+        metrics.inc("tweets_total", status="sent")
+        metrics.set("standings_rows", 24, table="overall")
+        store.add(*metrics.take_pending())
+        assert metrics.take_pending()[0] == {}
+    assert store.series() == [
+        ("standings_rows", (("table", "overall"),), "gauge", 24),
+        ("tweets_total", (("status", "sent"),), "counter", 2),
+    ]
+
+
+def test_textfile_format():
+    text = to_textfile(
+        [
+            ("op_seconds_count", (("op", "post_tweet"),), "summary", 2),
+            ("op_seconds_sum", (("op", "post_tweet"),), "summary", 0.5),
+            ("tweets_total", (("status", 'say "hi"'),), "counter", 1),
+            ("queue_depth", (), "gauge", 3),
+        ]
+    )
+    assert text == (
+        "# TYPE twitter_bot_op_seconds summary\n"
+        'twitter_bot_op_seconds_count{op="post_tweet"} 2\n'
+        'twitter_bot_op_seconds_sum{op="post_tweet"} 0.5\n'
+        "# TYPE twitter_bot_tweets_total counter\n"
+        'twitter_bot_tweets_total{status="say \\"hi\\""} 1\n'
+        "# TYPE twitter_bot_queue_depth gauge\n"
+        "twitter_bot_queue_depth 3\n"
+    )
+
+
+def test_measure_op_metadata_and_textfile(tmp_path, monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(metrics_module, "_default_metrics", metrics)
+    monkeypatch.setattr(
+        metrics_module, "_default_store", MetricsStore(tmp_path / "metrics.sqlite")
+    )
+    textfile = tmp_path / "twitter_bot.prom"
+    monkeypatch.setattr(metrics_module, "textfile", textfile)
+    metrics.inc("cache_requests_total", source="fbref", result="hit")
+
+    with measure_op("fetch_league_tables") as metadata:
+        metrics.inc("cache_requests_total", source="fbref", result="miss")
+        metrics.inc("http_downloaded_bytes_total", 2048, source="fbref")
+    assert metadata["cache_misses"] == 1
+    assert metadata["bytes_downloaded"] == 2048
+    assert "cache_hits" not in metadata
+    assert metadata["wall_time_seconds"] >= 0
+    assert 'twitter_bot_op_seconds_count{op="fetch_league_tables"} 1' in (
+        textfile.read_text()
+    )
+
+    with pytest.raises(RuntimeError):
+        with measure_op("post_tweet"):
+            raise RuntimeError("boom")
+    assert metrics.total("op_failures_total", op="post_tweet") == 1
@@ -0,0 +1,50 @@
+import datetime
+import pickle
+
+import pytest
+
+from twitter_bot.models import Fixture, Team
+
+MATCH = {
+    "id": 399,
+    "utcDate": "2022-10-29T14:00:00Z",
+    "status": "TIMED",
+    "matchday": 16,
+    "competition": {
+        "id": 2016,
+        "name": "Championship",
+        "code": "ELC",
+        "type": "LEAGUE",
+    },
+    "homeTeam": {"id": 328, "name": "Burnley FC", "shortName": "Burnley", "tla": "BUR"},
+    "awayTeam": {"id": 59, "name": "Blackburn Rovers FC", "tla": "BLA"},
+}
+
+
+def test_fixture_from_match_in_uk_time():
+    fix = Fixture.from_match(MATCH)
+    assert fix.date.isoformat() == "2022-10-29T15:00:00+01:00"
+    assert fix.competition.type == "LEAGUE"
+    assert (fix.home_team_id, fix.away_team_name) == (328, "Blackburn Rovers FC")
+    assert fix.home_team.display_name == "Burnley"
+    assert fix.away_team.display_name == "Blackburn Rovers FC"
+    # a kickoff after the clocks go back is in GMT
+    later = Fixture.from_match(dict(MATCH, utcDate="2022-11-05T15:00:00Z"))
+    assert later.date.utcoffset() == datetime.timedelta(0)
+
+
+def test_fixture_is_immutable_and_slotted():
+    fix = Fixture.from_match(MATCH)
+    with pytest.raises(AttributeError):
+        fix.date = fix.date + datetime.timedelta(hours=1)
+    assert not hasattr(fix, "__dict__")
+    assert not hasattr(fix.home_team, "__dict__")
+
+
+def test_fixture_json_round_trip():
+    fix = Fixture.from_match(MATCH)
+    value = fix.to_json()
+    assert value[:2] == [399, "2022-10-29T14:00:00Z"]
+    assert Fixture.from_json(value) == fix
+    assert Team(*value[5]) == fix.home_team
+    assert len(str(value)) < len(pickle.dumps(fix))
@@ -0,0 +1,79 @@
+import pytest
+
+from twitter_bot.fixture_store import FixtureStore
+from twitter_bot.season_calendar import build_timetable, due_slots, parse_timestamp
+
+
+def match(fixture_id, home, away, kickoff, last_updated="2022-10-01T00:00:00Z"):
+    return {
+        "id": fixture_id,
+        "utcDate": kickoff,
+        "lastUpdated": last_updated,
+        "homeTeam": {"id": home},
+        "awayTeam": {"id": away},
+        "competition": {"id": 2016},
+    }
+
+
+MATCHES = [
+    match(1, 328, 68, "2022-10-15T14:00:00Z"),
+    match(2, 59, 328, "2022-10-22T14:00:00Z"),
+    match(3, 328, 70, "2022-10-29T14:00:00Z"),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FixtureStore(tmp_path / "fixtures.sqlite")
+    store.sync_matches(MATCHES)
+    return store
+
+
+def test_timetable_slots(store):
+    slots = build_timetable(store, [328])
+    assert [(slot.kind, slot.fixture_id) for slot in slots] == [
+        ("announcement", 1),
+        ("preview", 1),
+        ("post_match", 1),
+        ("preview", 2),
+        ("post_match", 2),
+        ("preview", 3),
+        ("post_match", 3),
+    ]
+    assert slots[0].due == parse_timestamp("2022-10-08T14:00:00Z")
+    assert slots[3].due == parse_timestamp("2022-10-22T11:00:00Z")
+    assert slots[4].due == parse_timestamp("2022-10-22T16:30:00Z")
+
+
+def test_moved_fixture_moves_slots(store):
+    before = {slot.key for slot in build_timetable(store, [328])}
+    store.sync_matches(
+        [match(2, 59, 328, "2022-10-23T12:00:00Z", "2022-10-05T00:00:00Z")]
+    )
+    after = build_timetable(store, [328])
+    moved = [slot for slot in after if slot.key not in before]
+    assert sorted(slot.kind for slot in moved) == [
+        "announcement",
+        "post_match",
+        "preview",
+    ]
+    assert {slot.kickoff for slot in moved} == {parse_timestamp("2022-10-23T12:00:00Z")}
+
+
+def test_due_slots(store):
+    slots = build_timetable(store, [328, 59])
+    now = parse_timestamp("2022-10-22T11:05:00Z")
+    due = due_slots(slots, now)
+    assert {(slot.kind, slot.team_id) for slot in due} == {
+        ("preview", 328),
+        ("preview", 59),
+        ("announcement", 59),
+    }
+    [announcement] = due_slots(slots, parse_timestamp("2022-10-20T09:00:00Z"))
+    assert (announcement.kind, announcement.team_id) == ("announcement", 59)
+    late = due_slots(slots, parse_timestamp("2022-10-22T20:00:00Z"))
+    assert {(slot.kind, slot.team_id) for slot in late} == {
+        ("post_match", 328),
+        ("post_match", 59),
+    }
+    assert due_slots(slots, parse_timestamp("2022-10-23T00:00:00Z")) == []
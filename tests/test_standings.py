@@ -0,0 +1,150 @@
+import pickle
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from twitter_bot.standings import FbrefPage, parse_standings_table
+
+FBREF_HTML = Path(__file__).parent / "data" / "fbref_championship.html"
+CHAMP_TBL = Path(__file__).parent.parent / "data" / "champ_tbl.csv"
+
+
+@pytest.fixture(scope="module")
+def standings():
+    return parse_standings_table(FBREF_HTML.read_text(encoding="utf-8"))
+
+
+def test_parse_standings_table_matches_saved_csv(standings):
+    expected = pd.read_csv(CHAMP_TBL, keep_default_na=False)
+    assert list(standings.columns) == list(expected.columns)
+    assert standings["Squad"].tolist() == expected["Squad"].tolist()
+    assert standings["Last 5"].tolist() == expected["Last 5"].tolist()
+    assert standings["GD"].tolist() == expected["GD"].astype(int).tolist()
+
+
+@pytest.mark.parametrize(
+    "column, dtype",
+    [
+        ("Rk", "int64"),
+        ("Pts", "int64"),
+        ("GD", "int64"),
+        ("Pts/MP", "float64"),
+        ("Attendance", "Int64"),
+    ],
+)
+def test_parse_standings_table_dtypes(standings, column, dtype):
+    assert str(standings[column].dtype) == dtype
+
+
+def test_parse_standings_table_values(standings):
+    top = standings.iloc[0]
+    assert top["Squad"] == "Sheffield Utd"
+    assert top["GD"] == 13
+    assert top["Attendance"] == 28026
+    assert standings.loc[standings["Squad"] == "Reading", "GD"].item() == -2
+
+
+def test_parse_standings_table_no_table():
+    with pytest.raises(ValueError):
+        parse_standings_table("<html><body><table id='other'></table></body></html>")
+
+
+def test_page_indexes_commented_tables_and_parses_on_first_use():
+    page = FbrefPage(FBREF_HTML.read_text(encoding="utf-8"))
+    assert page.table_ids == [
+        "results2022-2023101_overall",
+        "results2022-2023101_home_away",
+        "stats_squads_standard_for",
+    ]
+    assert page.parsed() == []
+    squads = page.table("squad_standard")
+    assert page.parsed() == ["stats_squads_standard_for"]
+    assert page.table("stats_squads_standard_for") is squads
+    assert squads.columns[:5].tolist() == [
+        "Squad",
+        "# Pl",
+        "Age",
+        "Poss",
+        "Playing Time MP",
+    ]
+    assert str(squads["Age"].dtype) == "float64"
+    assert str(squads["Playing Time Min"].dtype) == "int64"
+    with pytest.raises(ValueError):
+        page.table("squad_shooting")
+
+
+def test_home_away_table_split_by_over_header():
+    home_away = FbrefPage(FBREF_HTML.read_text(encoding="utf-8")).table("home_away")
+    assert "Home MP" in home_away and "Away Pts/MP" in home_away
+    assert (home_away["Home MP"] + home_away["Away MP"] > 0).all()
+
+
+class FakeResponse:
+    text = FBREF_HTML.read_text(encoding="utf-8")
+
+
+@pytest.fixture
+def fetches():
+    return []
+
+
+@pytest.fixture
+def tables(monkeypatch, fetches):
+    import twitter_bot.standings as standings
+
+    def fake_cached_get(url, source):
+        fetches.append(url)
+        return FakeResponse()
+
+    monkeypatch.setattr(standings, "cached_get", fake_cached_get)
+    monkeypatch.setattr(standings, "record_snapshot", lambda df, competition_id: None)
+    monkeypatch.setattr(standings, "previous_ranks", lambda competition_id: None)
+    return standings.Tables("https://fbref.com/en/comps/10/Championship-Stats")
+
+
+def test_collect_stats(tables):
+    stats = tables.collect_stats("Norwich City FC")
+    assert stats["position"] == 2
+    assert (stats["wins"], stats["draws"], stats["loss"]) == (7, 3, 2)
+    assert stats["goals_for"] == 18 and stats["goals_against"] == 10
+    assert stats["top_scorer"] == "Josh Sargent - 6"
+    assert stats["form_emoji"].count("\U0001F7E2") == 3
+    assert stats["form_emoji"] == tables.runner_get_form_emoji("Norwich City FC")
+    assert stats["form_points"] == 11 and stats["rank_change"] is None
+
+
+def test_collect_stats_unknown_team(tables):
+    with pytest.raises(ValueError):
+        tables.collect_stats("Real Madrid CF")
+
+
+def test_home_away_record_from_the_same_download(tables, fetches):
+    record = tables.get_team_home_away("Burnley FC", "Home")
+    row = tables.home_away_table.set_index("Squad").loc["Burnley"]
+    assert record["played"] == row["Home MP"]
+    assert record["points"] == row["Home Pts"]
+    assert tables.get_team_home_away("Burnley FC", "Away")["wins"] == row["Away W"]
+    assert len(fetches) == 1
+    with pytest.raises(ValueError):
+        tables.get_team_home_away("Real Madrid CF", "Home")
+
+
+def test_tables_pickle_for_multiprocess_runs(tables):
+    home_away = tables.home_away_table
+    copy = pickle.loads(pickle.dumps(tables))
+    assert copy.page.parsed() == tables.page.parsed()
+    assert copy.home_away_table.equals(home_away)
+    assert copy.collect_stats("Norwich City FC")["position"] == 2
+
+
+def test_squad_urls_of_the_standings():
+    page = FbrefPage(
+        FBREF_HTML.read_text(encoding="utf-8"),
+        "https://fbref.com/en/comps/10/Championship-Stats",
+    )
+    urls = page.squad_urls()
+    assert len(urls) == len(page.table("overall"))
+    assert urls["Norwich City"] == (
+        "https://fbref.com/en/squads/00000001/Norwich-City-Stats"
+    )
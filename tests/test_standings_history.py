@@ -0,0 +1,102 @@
+import datetime
+from pathlib import Path
+
+import pytest
+
+from twitter_bot import standings_history
+from twitter_bot.standings import parse_standings_table
+from twitter_bot.standings_history import StandingsHistory
+
+FBREF_HTML = Path(__file__).parent / "data" / "fbref_championship.html"
+UTC = datetime.timezone.utc
+
+
+@pytest.fixture(scope="module")
+def table():
+    return parse_standings_table(FBREF_HTML.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def history(tmp_path):
+    return StandingsHistory(tmp_path / "history")
+
+
+def _after_matchday(table, squad, won):
+    """Return the table with squad's result added."""
+    df = table.copy()
+    row = df["Squad"] == squad
+    df.loc[row, "MP"] += 1
+    df.loc[row, "W" if won else "L"] += 1
+    df.loc[row, "Pts"] += 3 if won else 0
+    return df
+
+
+def test_snapshot_partitioned_by_competition_and_date(history, table):
+    path = history.snapshot(
+        table, 2016, datetime.datetime(2022, 10, 29, 15, tzinfo=UTC)
+    )
+    assert path.relative_to(history.root).parts[:2] == (
+        "competition_id=2016",
+        "snapshot_date=2022-10-29",
+    )
+
+
+def test_unchanged_standings_not_snapshotted(history, table):
+    assert history.snapshot(table, 2016, datetime.datetime(2022, 10, 29, tzinfo=UTC))
+    assert (
+        history.snapshot(table, 2016, datetime.datetime(2022, 10, 30, tzinfo=UTC))
+        is None
+    )
+    # the same table in another competition is still written
+    assert history.snapshot(table, 2021, datetime.datetime(2022, 10, 30, tzinfo=UTC))
+
+
+def test_team_trajectory(history, table):
+    squad = "Burnley"
+    day = datetime.datetime(2022, 10, 1, 17, tzinfo=UTC)
+    history.snapshot(table, 2016, day)
+    later = _after_matchday(table, squad, won=True)
+    history.snapshot(later, 2016, day + datetime.timedelta(days=4))
+    # a second snapshot on the same day replaces the first
+    history.snapshot(
+        _after_matchday(table, squad, won=False), 2016, day + datetime.timedelta(days=7)
+    )
+    latest = _after_matchday(later, squad, won=True)
+    history.snapshot(latest, 2016, day + datetime.timedelta(days=7, hours=2))
+
+    trajectory = history.team_trajectory(2016, squad, columns=["points", "played"])
+    assert list(trajectory.columns) == ["points", "played"]
+    assert [d.isoformat() for d in trajectory.index] == [
+        "2022-10-01",
+        "2022-10-05",
+        "2022-10-08",
+    ]
+    start = table.loc[table["Squad"] == squad, "Pts"].item()
+    assert trajectory["points"].tolist() == [start, start + 3, start + 6]
+
+    since = history.team_trajectory(2016, squad, since=datetime.date(2022, 10, 5))
+    assert len(since) == 2
+    assert list(since.columns) == ["rank", "points", "form"]
+
+
+def test_table_on(history, table):
+    history.snapshot(table, 2016, datetime.datetime(2022, 10, 29, tzinfo=UTC))
+    on_day = history.table_on(2016, datetime.date(2022, 10, 29))
+    assert on_day["squad"].tolist() == table["Squad"].tolist()
+    assert on_day["goal_difference"].tolist() == table["GD"].tolist()
+    assert str(on_day["rank"].dtype) == "int16"
+    assert history.table_on(2016, datetime.date(2022, 10, 30)).empty
+
+
+def test_unknown_competition(history):
+    assert history.team_trajectory(2021, "Burnley").empty
+
+
+def test_record_snapshot_logs_failure(monkeypatch, table, caplog):
+    class Broken:
+        def snapshot(self, df, competition_id):
+            raise OSError("read-only file system")
+
+    monkeypatch.setattr(standings_history, "get_standings_history", Broken)
+    assert standings_history.record_snapshot(table, 2016) is None
+    assert "read-only file system" in caplog.text
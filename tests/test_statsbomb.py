@@ -0,0 +1,141 @@
+import json
+
+import pytest
+
+from twitter_bot import statsbomb
+from twitter_bot.tweet_templates import render
+from twitter_bot.tweets import match_stats, match_stats_tweets
+
+HOME = {"id": 217, "name": "Barcelona"}
+AWAY = {"id": 206, "name": "Deportivo Alavés"}
+
+
+def event(kind, team, possession_team=None, duration=1.0, **detail):
+    return {
+        "type": {"name": kind},
+        "team": team,
+        "possession_team": possession_team or team,
+        "duration": duration,
+        **detail,
+    }
+
+
+EVENTS = [
+    {"type": {"name": "Starting XI"}, "team": HOME, "possession_team": HOME},
+    {"type": {"name": "Starting XI"}, "team": AWAY, "possession_team": HOME},
+    event("Pass", HOME, duration=3.0, **{"pass": {"length": 12.5}}),
+    event("Pass", HOME, duration=3.0, **{"pass": {"outcome": {"name": "Incomplete"}}}),
+    event("Shot", HOME, shot={"statsbomb_xg": 0.41, "outcome": {"name": "Goal"}}),
+    event("Shot", HOME, shot={"statsbomb_xg": 0.05, "outcome": {"name": "Off T"}}),
+    event("Pass", AWAY, duration=2.0, **{"pass": {"length": 30.0}}),
+    event("Shot", AWAY, shot={"statsbomb_xg": 0.12, "outcome": {"name": "Saved"}}),
+    event("Own Goal For", AWAY, possession_team=HOME, duration=0.0),
+]
+
+
+def write_match(directory, match_id, events=EVENTS):
+    path = directory / f"{match_id}.json"
+    path.write_text(json.dumps(events, indent=4, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_events_streamed_across_chunks(tmp_path, chunk_size):
+    path = write_match(tmp_path, 1)
+    assert list(statsbomb.iter_events(path, chunk_size=chunk_size)) == EVENTS
+
+
+@pytest.mark.parametrize("text", ["", "{}", '[{"a": 1}', '[{"a": 1},'])
+def test_malformed_file(tmp_path, text):
+    path = tmp_path / "1.json"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(statsbomb.iter_events(path, chunk_size=4))
+
+
+def test_summarise_match(tmp_path):
+    summary = statsbomb.summarise_match(write_match(tmp_path, 15946))
+    assert summary.match_id == 15946
+    assert summary.events == len(EVENTS)
+    home, away = summary.teams
+    assert home == statsbomb.TeamMatchStats(217, "Barcelona", 1, 2, 1, 0.46, 2, 1, 72.7)
+    assert away == statsbomb.TeamMatchStats(
+        206, "Deportivo Alavés", 1, 1, 1, 0.12, 1, 1, 27.3
+    )
+
+
+def test_ingest_events_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setattr(statsbomb, "min_pool_files", 2)
+    for match_id in (30, 4, 1000):
+        write_match(tmp_path, match_id)
+    summaries = statsbomb.ingest_events(tmp_path, workers=2)
+    assert [summary.match_id for summary in summaries] == [4, 30, 1000]
+    assert summaries == statsbomb.ingest_events(tmp_path, workers=1)
+
+    path = statsbomb.write_summaries(summaries, tmp_path / "summaries.csv")
+    frame = statsbomb.summaries_frame(summaries)
+    assert len(frame) == 6
+    assert path.read_text(encoding="utf-8").splitlines()[0] == (
+        "match_id,team_id,team,goals,shots,shots_on_target,xg,passes,"
+        "passes_completed,possession"
+    )
+
+
+def test_match_stats_template(tmp_path):
+    home, away = statsbomb.summarise_match(write_match(tmp_path, 1)).teams
+    values = {}
+    for side, team in (("home", home), ("away", away)):
+        values.update(
+            {
+                side: team.team,
+                f"{side}_goals": team.goals,
+                f"{side}_xg": team.xg,
+                f"{side}_shots": team.shots,
+                f"{side}_on_target": team.shots_on_target,
+                f"{side}_possession": team.possession,
+                f"{side}_passes": team.passes_completed,
+            }
+        )
+    assert render("match_stats", values) == (
+        "Barcelona 1 - 1 Deportivo Alavés\n\n"
+        "xG: 0.46 - 0.12\n"
+        "Shots (on target): 2 (1) - 1 (1)\n"
+        "Possession: 73% - 27%\n"
+        "Passes completed: 1 - 1"
+    )
+
+
+def test_load_home_teams(tmp_path):
+    season = tmp_path / "11" / "1.json"
+    season.parent.mkdir()
+    season.write_text(
+        json.dumps(
+            [
+                {"match_id": 15946, "home_team": {"home_team_id": 206}},
+                {"match_id": 15956, "home_team": {"home_team_id": 217}},
+            ]
+        ),
+        encoding="utf-8",
+    )
+    assert statsbomb.load_home_teams(tmp_path) == {15946: 206, 15956: 217}
+    assert statsbomb.load_home_teams(tmp_path / "missing") == {}
+
+
+def test_match_stats_home_team_from_matches_file(tmp_path):
+    summary = statsbomb.summarise_match(write_match(tmp_path, 15946))
+    assert match_stats(summary)["home"] == "Barcelona"
+    values = match_stats(summary, home_team_id=206)
+    assert (values["home"], values["away"]) == ("Deportivo Alavés", "Barcelona")
+    assert (values["home_xg"], values["away_xg"]) == (0.12, 0.46)
+    with pytest.raises(ValueError):
+        match_stats(summary, home_team_id=1)
+
+
+def test_match_stats_tweets_skip_malformed_summaries(tmp_path):
+    summary = statsbomb.summarise_match(write_match(tmp_path, 15946))
+    one_team = summary._replace(match_id=2, teams=summary.teams[:1])
+    with pytest.raises(ValueError):
+        match_stats(one_team)
+    tweets = match_stats_tweets([summary, one_team], home_teams={15946: 206, 2: 217})
+    assert len(tweets) == 1
+    assert tweets[0].startswith("Deportivo Alavés 1 - 1 Barcelona")
@@ -0,0 +1,64 @@
+import os
+
+# the modules of twitter_bot share these by bare name, as they import each other
+import team_catalog
+from models import Team
+from team_catalog import CATALOG_FIELDS, CatalogTeam, TeamCatalog, catalog_path
+
+BURNLEY = CatalogTeam(
+    team_id=328,
+    team_name="Burnley FC",
+    short_name="Burnley",
+    tla="BUR",
+    venue="Turf Moor",
+    competition_id=2016,
+    fbref_squad="Burnley",
+    aliases=("Burnley", "BUR"),
+    fbref_url="https://fbref.com/en/squads/943e8050/Burnley-Stats",
+)
+
+
+def write_catalog(directory, teams):
+    lines = [",".join(CATALOG_FIELDS)]
+    for team in teams:
+        row = team.to_row()
+        lines.append(",".join(str(row[field]) for field in CATALOG_FIELDS))
+    catalog_path(teams[0].competition_id, directory).write_text(
+        "\n".join(lines) + "\n", encoding="utf-8"
+    )
+
+
+def test_catalog_loaded_into_map_by_team_id(tmp_path):
+    write_catalog(tmp_path, [BURNLEY, BURNLEY._replace(team_id=59, venue="")])
+    catalog = TeamCatalog.load(tmp_path)
+    assert len(catalog) == 2
+    assert catalog.get(328) == BURNLEY
+    assert catalog.venue(328) == "Turf Moor"
+    assert catalog.venue(59) is None
+    assert catalog.venue(57) is None
+
+
+def test_complete_fills_names_missing_from_a_fixture():
+    catalog = TeamCatalog([BURNLEY])
+    assert catalog.complete(Team(328, "Burnley FC")) == Team(
+        328, "Burnley FC", "Burnley", "BUR"
+    )
+    assert catalog.complete(Team(328, "Burnley FC", "Clarets")).short_name == "Clarets"
+    assert catalog.complete(Team(57, "Arsenal FC")) == Team(57, "Arsenal FC")
+
+
+def test_default_catalog_read_again_when_rewritten(monkeypatch, tmp_path):
+    monkeypatch.setattr(team_catalog, "catalog_dir", tmp_path)
+    monkeypatch.setattr(team_catalog, "_default_catalog", None)
+    assert len(team_catalog.get_team_catalog()) == 0
+
+    write_catalog(tmp_path, [BURNLEY])
+    catalog = team_catalog.get_team_catalog()
+    assert catalog.venue(328) == "Turf Moor"
+    assert team_catalog.get_team_catalog() is catalog
+
+    write_catalog(tmp_path, [BURNLEY._replace(venue="Burnley Stadium")])
+    # filesystems with coarse timestamps would not tell the two writes apart
+    mtime = catalog_path(2016, tmp_path).stat().st_mtime_ns + 1_000_000_000
+    os.utime(catalog_path(2016, tmp_path), ns=(mtime, mtime))
+    assert team_catalog.get_team_catalog().venue(328) == "Burnley Stadium"
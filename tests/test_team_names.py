@@ -0,0 +1,86 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from twitter_bot.team_names import (
+    TeamNameIndex,
+    load_team_aliases,
+    normalise_team_name,
+)
+from twitter_bot.standings import parse_standings_table
+
+DATA = Path(__file__).parent.parent / "data"
+FBREF_HTML = Path(__file__).parent / "data" / "fbref_championship.html"
+
+
+@pytest.fixture(scope="module")
+def index():
+    squads = parse_standings_table(FBREF_HTML.read_text(encoding="utf-8"))["Squad"]
+    return TeamNameIndex(squads, load_team_aliases(str(DATA / "team_aliases.csv")))
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Sheffield United FC", "sheffield united"),
+        ("Sheffield Utd", "sheffield united"),
+        ("Huddersfield Town AFC", "huddersfield town"),
+        ("Atlético Madrid", "atletico madrid"),
+        ("Brighton & Hove Albion FC", "brighton and hove albion"),
+    ],
+)
+def test_normalise_team_name(name, expected):
+    assert normalise_team_name(name) == expected
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Preston North End FC", "Preston"),
+        ("Sheffield United FC", "Sheffield Utd"),
+        ("Queens Park Rangers FC", "QPR"),
+        ("West Bromwich Albion FC", "West Brom"),
+        ("Burnley", "Burnley"),
+        ("Real Madrid CF", None),
+    ],
+)
+def test_resolve(index, name, expected):
+    assert index.resolve(name) == expected
+
+
+def test_every_championship_team_resolves(index):
+    with open(DATA / "team_ids_2016.csv", encoding="utf-8") as csv_file:
+        names = [row["team_name"] for row in csv.DictReader(csv_file)]
+    resolved = {index.resolve(name) for name in names}
+    assert resolved == set(index.names)
+
+
+def test_ambiguous_prefix_is_not_resolved():
+    index = TeamNameIndex(["Sheffield Utd", "Sheffield Weds"])
+    assert index.resolve("Sheffield") is None
+    assert index.resolve("Sheffield Wednesday FC") is None
+    assert index.resolve("Sheffield Weds") == "Sheffield Weds"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("@twitterclarets when do West Brom play next?", "West Brom"),
+        ("@twitterclarets next game for sheffield united fc", "Sheffield Utd"),
+        ("Preston North End next?", "Preston"),
+        ("who have QPR got", "QPR"),
+        ("@Burnley fixtures please", None),
+        ("Burnley or Preston first?", None),
+        ("who plays next?", None),
+    ],
+)
+def test_search(index, text, expected):
+    assert index.search(text) == expected
+
+
+def test_search_prefers_the_longest_name():
+    index = TeamNameIndex(["Sheffield Utd", "Sheffield Weds"])
+    assert index.search("when are sheffield wednesday on") is None
+    assert index.search("when are Sheffield Weds on") == "Sheffield Weds"
+    assert index.search("when are sheffield on") is None
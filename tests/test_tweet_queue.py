@@ -0,0 +1,315 @@
+import json
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+import tweepy
+from requests.adapters import HTTPAdapter
+
+from twitter_bot.tweet_queue import (
+    TweetQueue,
+    QueueDrainer,
+    PENDING,
+    SENT,
+    REJECTED,
+    FAILED,
+    UNKNOWN,
+    default_client_factory,
+)
+from configs.twitter import duplicate_window, post_timeout
+
+
+class StubTwitter(BaseHTTPRequestHandler):
+    """Answers POST /2/tweets with the next queued (status, headers) response."""
+
+    responses = []
+    posted = []
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        length = int(self.headers.get("Content-Length", 0))
+        self.posted.append(json.loads(self.rfile.read(length)))
+        status, headers = self.responses.pop(0) if self.responses else (201, {})
+        body = json.dumps(
+            {"data": {"id": str(len(self.posted)), "text": self.posted[-1]["text"]}}
+            if status == 201
+            else {"title": "error", "detail": "error", "type": "about:blank"}
+        ).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Sends requests for api.twitter.com to the stub server instead."""
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        request.url = request.url.replace("https://api.twitter.com", self.target)
+        return super().send(request, **kwargs)
+
+
+@pytest.fixture
+def stub_twitter():
+    StubTwitter.responses = []
+    StubTwitter.posted = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTwitter)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return TweetQueue(tmp_path / "tweets.sqlite", clock=FakeClock())
+
+
+def make_drainer(queue, stub_twitter):
+    def client_factory(_account):
+        client = tweepy.Client(
+            consumer_key="key",
+            consumer_secret="secret",
+            access_token="token",
+            access_token_secret="token-secret",
+        )
+        client.session.mount("https://", RedirectAdapter(stub_twitter))
+        return client
+
+    return QueueDrainer(queue, client_factory, sleep=queue.clock.sleep)
+
+
+def test_tweets_posted_in_order(queue, stub_twitter):
+    first, second = queue.enqueue("first"), queue.enqueue("second")
+    assert make_drainer(queue, stub_twitter).drain() == {"default": 2}
+    assert [p["text"] for p in StubTwitter.posted] == ["first", "second"]
+    assert queue.get(first)["status"] == queue.get(second)["status"] == SENT
+    assert queue.get(second)["remote_id"] == "2"
+
+
+def test_rate_limited_tweet_waits_for_reset(queue, stub_twitter):
+    reset = queue.clock() + 120
+    StubTwitter.responses = [(429, {"x-rate-limit-reset": str(int(reset))})]
+    tweet_id = queue.enqueue("rate limited")
+    drainer = make_drainer(queue, stub_twitter)
+    assert drainer.drain(max_wait=60) == {"default": 0}
+    assert queue.get(tweet_id)["status"] == PENDING
+    assert drainer.drain(max_wait=300) == {"default": 1}
+    assert queue.clock() >= reset
+    assert queue.get(tweet_id)["status"] == SENT
+
+
+def test_server_errors_backed_off_until_failed(queue, stub_twitter, monkeypatch):
+    monkeypatch.setattr("twitter_bot.tweet_queue.max_attempts", 3)
+    StubTwitter.responses = [(503, {})] * 3
+    tweet_id = queue.enqueue("unlucky")
+    make_drainer(queue, stub_twitter).drain(max_wait=3600)
+    assert len(StubTwitter.posted) == 3
+    assert queue.get(tweet_id)["status"] == FAILED
+    assert queue.get(tweet_id)["attempts"] == 3
+
+
+def test_refused_tweet_rejected_without_retry(queue, stub_twitter):
+    StubTwitter.responses = [(403, {})]
+    rejected, sent = queue.enqueue("duplicate"), queue.enqueue("new")
+    make_drainer(queue, stub_twitter).drain()
+    assert queue.get(rejected)["status"] == REJECTED
+    assert queue.get(sent)["status"] == SENT
+    assert len(StubTwitter.posted) == 2
+
+
+def test_refused_keys_leave_the_queue_for_a_later_drain(queue, stub_twitter):
+    StubTwitter.responses = [(401, {})]
+    first, second = queue.enqueue("first"), queue.enqueue("second")
+    drainer = make_drainer(queue, stub_twitter)
+    with pytest.raises(tweepy.errors.Unauthorized):
+        drainer.drain()
+    assert queue.get(first)["status"] == queue.get(second)["status"] == PENDING
+    assert drainer.drain() == {"default": 2}
+
+
+def test_bad_request_failed_and_requeued(queue, stub_twitter):
+    StubTwitter.responses = [(400, {})]
+    tweet_id = queue.enqueue("malformed")
+    drainer = make_drainer(queue, stub_twitter)
+    assert drainer.drain() == {"default": 0}
+    assert queue.get(tweet_id)["status"] == FAILED
+    assert queue.requeue(tweet_id)
+    assert drainer.drain() == {"default": 1}
+    assert queue.get(tweet_id)["status"] == SENT
+
+
+def test_queue_survives_restart_and_recovers_stale_claims(tmp_path):
+    clock = FakeClock()
+    queue = TweetQueue(tmp_path / "tweets.sqlite", clock=clock)
+    tweet_id = queue.enqueue("in flight")
+    assert queue.claim("default")["tweet_id"] == tweet_id
+
+    reopened = TweetQueue(tmp_path / "tweets.sqlite", clock=clock)
+    assert reopened.claim("default") is None
+    assert reopened.recover() == 0
+    clock.sleep(600)
+    assert reopened.recover() == 1
+    # the drainer may have posted it before stopping, so it is not posted again
+    assert reopened.get(tweet_id)["status"] == UNKNOWN
+    assert reopened.claim("default") is None
+    assert reopened.requeue(tweet_id)
+    assert not reopened.requeue(tweet_id)
+    assert reopened.claim("default") == {
+        "tweet_id": tweet_id,
+        "text": "in flight",
+        "attempts": 1,
+        "reply_to": None,
+    }
+
+
+class FailingAdapter(HTTPAdapter):
+    """Fails every request with the given requests exception."""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        raise self.error
+
+
+@pytest.mark.parametrize(
+    "error, status",
+    [
+        (requests.ConnectTimeout("connect timed out"), PENDING),
+        (requests.ReadTimeout("read timed out"), UNKNOWN),
+        (requests.exceptions.ChunkedEncodingError("connection broken"), UNKNOWN),
+    ],
+)
+def test_request_errors_retried_only_when_never_sent(queue, error, status):
+    def client_factory(_account):
+        client = tweepy.Client(consumer_key="key", consumer_secret="secret")
+        client.session.mount("https://", FailingAdapter(error))
+        return client
+
+    tweet_id = queue.enqueue("flaky network")
+    drainer = QueueDrainer(queue, client_factory, sleep=queue.clock.sleep)
+    assert drainer.drain(max_wait=0) == {"default": 0}
+    assert queue.get(tweet_id)["status"] == status
+
+
+def test_client_requests_time_out_on_the_session_tweepy_built(
+    queue, stub_twitter, monkeypatch
+):
+    import helpers
+
+    sent = []
+
+    class RecordingAdapter(RedirectAdapter):
+        def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+            sent.append((kwargs["timeout"], request.headers["User-Agent"]))
+            return super().send(request, **kwargs)
+
+    built = tweepy.Client(consumer_key="key", consumer_secret="secret")
+    session = built.session
+    session.mount("https://", RecordingAdapter(stub_twitter))
+    monkeypatch.setattr(helpers, "twitter_auth", lambda: built)
+
+    client = default_client_factory("default")
+    assert client.session is session
+    tweet_id = queue.enqueue("hello")
+    assert QueueDrainer(queue, lambda _account: client).drain() == {"default": 1}
+    assert queue.get(tweet_id)["status"] == SENT
+    timeout, user_agent = sent[0]
+    assert timeout == post_timeout and user_agent.startswith("Python/")
+    session.post("https://api.twitter.com/2/tweets", json={"text": "x"}, timeout=9)
+    assert sent[1][0] == 9
+
+
+def test_replies_posted_in_reply_to_their_tweet(queue, stub_twitter):
+    ids = queue.enqueue_many([("@fan Burnley play Preston", "1001"), ("news", None)])
+    assert make_drainer(queue, stub_twitter).drain() == {"default": 2}
+    assert StubTwitter.posted[0]["reply"] == {"in_reply_to_tweet_id": "1001"}
+    assert "reply" not in StubTwitter.posted[1]
+    assert [queue.get(tweet_id)["reply_to"] for tweet_id in ids] == ["1001", None]
+
+
+def test_queue_created_before_replies_is_migrated(tmp_path):
+    path = tmp_path / "tweets.sqlite"
+    conn = sqlite3.connect(str(path))
+    conn.executescript(
+        "CREATE TABLE tweets (tweet_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "account TEXT NOT NULL, text TEXT NOT NULL, "
+        "status TEXT NOT NULL DEFAULT 'pending', "
+        "attempts INTEGER NOT NULL DEFAULT 0, not_before REAL NOT NULL, "
+        "enqueued_at REAL NOT NULL, claimed_at REAL, sent_at REAL, "
+        "remote_id TEXT, error TEXT);"
+        "INSERT INTO tweets (account, text, not_before, enqueued_at) "
+        "VALUES ('default', 'old', 0, 0);"
+    )
+    conn.close()
+    queue = TweetQueue(path, clock=FakeClock())
+    assert queue.claim("default")["reply_to"] is None
+    assert queue.get(queue.enqueue("reply", reply_to="7"))["reply_to"] == "7"
+
+
+def test_duplicate_caught_by_ledger_before_posting(queue, stub_twitter):
+    first = queue.enqueue_unique("Burnley play Preston", team_id=328)
+    assert queue.enqueue_unique("Burnley play Preston ", team_id=328) is None
+    assert queue.enqueue_unique("Burnley play Preston", account="other") is not None
+    assert queue.counts() == {PENDING: 2}
+    make_drainer(queue, stub_twitter).drain(["default"])
+    assert [p["text"] for p in StubTwitter.posted] == ["Burnley play Preston"]
+    assert queue.get(first)["status"] == SENT
+
+
+def test_same_text_queued_again_after_duplicate_window(queue):
+    assert queue.enqueue_unique("Full time: Burnley 2 - 1 Preston") is not None
+    queue.clock.sleep(duplicate_window - 1)
+    assert queue.enqueue_unique("Full time: Burnley 2 - 1 Preston") is None
+    queue.clock.sleep(1)
+    assert queue.enqueue_unique("Full time: Burnley 2 - 1 Preston") is not None
+
+
+def test_failed_tweet_can_be_queued_again(queue, stub_twitter, monkeypatch):
+    monkeypatch.setattr("twitter_bot.tweet_queue.max_attempts", 1)
+    StubTwitter.responses = [(503, {})]
+    tweet_id = queue.enqueue_unique("unlucky")
+    make_drainer(queue, stub_twitter).drain()
+    assert queue.get(tweet_id)["status"] == FAILED
+    assert queue.enqueue_unique("unlucky") is not None
+
+
+def test_concurrent_runs_queue_a_tweet_once(tmp_path):
+    path = tmp_path / "tweets.sqlite"
+    results = []
+
+    def run():
+        # each run opens its own connection, as separate processes do
+        results.append(TweetQueue(path).enqueue_unique("Matchday!", team_id=328))
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(result is not None for result in results) == 1
+    assert TweetQueue(path).counts() == {PENDING: 1}
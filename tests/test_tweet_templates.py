@@ -0,0 +1,99 @@
+import pytest
+
+from twitter_bot.tweet_templates import (
+    Line,
+    Template,
+    render,
+    render_batch,
+    weighted_length,
+)
+
+STATS = {
+    "opposition": "Blackburn",
+    "position": "3rd",
+    "competition": "Championship",
+    "goals_for": 30,
+    "goals_against": 25,
+    "form_emoji": "\U0001F7E2\U0001F7E2\U0001F534⚪\U0001F7E2",
+    "top_scorer": "Ben Brereton - 12",
+    "wins": 15,
+    "draws": 3,
+    "loss": 8,
+}
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Burnley", 7),
+        ("⚽", 2),
+        ("\U0001F7E2\U0001F534", 4),
+        ("\U0001F44D\U0001F3FD", 2),
+        ("\U0001F468‍\U0001F469‍\U0001F467", 2),
+        ("\U0001F1EC\U0001F1E7", 2),
+        ("1️⃣", 2),
+        ("日本", 4),
+        ("Café", 4),
+        ("—", 1),
+    ],
+    ids=[
+        "latin",
+        "emoji",
+        "two emoji",
+        "skin tone",
+        "zwj sequence",
+        "flag",
+        "keycap",
+        "cjk",
+        "combining accent",
+        "dash",
+    ],
+)
+def test_weighted_length(text, expected):
+    assert weighted_length(text) == expected
+
+
+def test_opp_stats_keeps_every_line_that_fits():
+    assert render("opp_stats", STATS) == (
+        "Blackburn currently sit 3rd in the Championship.\n"
+        "Having scored 30 and conceded 25 goals ⚽\n\n"
+        f"Form: {STATS['form_emoji']}\n"
+        "Top Scorer(s): Ben Brereton - 12\n"
+        "W: 15, D: 3,  L: 8"
+    )
+
+
+def test_optional_lines_dropped_to_fit_with_hashtag():
+    template = Template(
+        "test",
+        [Line("{a}"), Line(""), Line("{b}", optional=True), Line("{c}", optional=True)],
+        suffix="\n\n#tag",
+        max_length=20,
+    )
+    # "aaaaa" + "\n\n" + "bbbbbbbb" + "\n\n#tag" is 21, so only c fits
+    assert template.render({"a": "aaaaa", "b": "bbbbbbbb", "c": "cc"}) == (
+        "aaaaa\n\ncc"
+    )
+    assert template.render({"a": "aaaaa", "b": "bbbbbbb", "c": "cc"}) == (
+        "aaaaa\n\nbbbbbbb"
+    )
+
+
+def test_emoji_weighed_when_fitting():
+    template = Template(
+        "test", [Line("{a}"), Line("{b}", optional=True)], suffix="", max_length=10
+    )
+    assert template.render({"a": "abcd", "b": "⚽" * 2}) == "abcd\n⚽⚽"
+    assert template.render({"a": "abcd", "b": "⚽" * 3}) == "abcd"
+
+
+def test_required_lines_too_long():
+    template = Template("test", [Line("{a}")], suffix="", max_length=5)
+    with pytest.raises(ValueError):
+        template.render({"a": "too long"})
+
+
+def test_render_batch():
+    teams = [dict(STATS, opposition=name) for name in ["Hull", "Luton", "Stoke"]]
+    tweets = render_batch("opp_stats", teams)
+    assert [tweet.split(" ")[0] for tweet in tweets] == ["Hull", "Luton", "Stoke"]
@@ -0,0 +1,202 @@
+"""
+Command line for one-off checks and posts, without starting dagster::
+
+    python -m twitter_bot next-fixture --team-id 328
+    python -m twitter_bot opp-stats --post
+    python -m twitter_bot post "Up the Clarets" --drain
+    python -m twitter_bot requeue 42
+    python -m twitter_bot live
+    python -m twitter_bot --timings next-fixture
+
+Only the standard library is imported up front. Each subcommand imports the helpers,
+`Tables` and queue modules it needs when it runs, so a check of the next fixture never
+loads dagster, and `--timings` reports how long startup, imports and the command took.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+# pylint: disable=wrong-import-position,import-outside-toplevel
+import argparse  # noqa: E402
+import sys  # noqa: E402
+from contextlib import contextmanager  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Optional  # noqa: E402
+
+# modules within twitter_bot import each other by bare name
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from configs.teams import default_team_id  # noqa: E402
+
+
+class Timings:
+    """Wall time of each phase of a command, in seconds."""
+
+    def __init__(self, started: float = None):
+        self.phases = {"startup": 0.0, "imports": 0.0, "command": 0.0}
+        self._mark = time.perf_counter() if started is None else started
+
+    def lap(self, phase: str):
+        """Add the time since the last lap to phase."""
+        now = time.perf_counter()
+        self.phases[phase] += now - self._mark
+        self._mark = now
+
+    @contextmanager
+    def importing(self):
+        """Count the body of a with statement, the command's imports, as imports."""
+        self.lap("command")
+        try:
+            yield
+        finally:
+            self.lap("imports")
+
+    def report(self) -> str:
+        total = sum(self.phases.values())
+        phases = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in self.phases.items())
+        return f"{phases} (total {total * 1000:.0f} ms)"
+
+
+def _next_fixture(team_id: int, timings: Timings):
+    with timings.importing():
+        from helpers import get_next_fixture
+    return get_next_fixture(team_id)
+
+
+def next_fixture(args, timings: Timings) -> int:
+    """Print the announcement of the team's next fixture, queueing it with --post."""
+    fix = _next_fixture(args.team_id, timings)
+    if fix is None:
+        return 1
+    with timings.importing():
+        from tweets import next_fixture_date_tweet
+    tweet = next_fixture_date_tweet(fix, args.team_id)
+    print(tweet)
+    if args.post:
+        _queue(tweet, timings)
+    return 0
+
+
+def opp_stats(args, timings: Timings) -> int:
+    """Print the preview of the next opposition's league stats, queueing it with --post."""
+    fix = _next_fixture(args.team_id, timings)
+    if fix is None:
+        return 1
+    with timings.importing():
+        from configs.fbref import league_urls
+        from standings import Tables
+        from tweets import opp_stats as collect_opp_stats, opp_stats_tweet
+    url = league_urls.get(fix.competition.id)
+    if url is None:
+        print(f"No standings for {fix.competition.name}.", file=sys.stderr)
+        return 1
+    tweet = opp_stats_tweet(collect_opp_stats(fix, args.team_id, Tables(url)))
+    print(tweet)
+    if args.post:
+        _queue(tweet, timings)
+    return 0
+
+
+def _queue(tweet: str, timings: Timings) -> Optional[int]:
+    with timings.importing():
+        from helpers import send_tweet
+    tweet_id = send_tweet(tweet)
+    if tweet_id is None:
+        print("Tweet already queued, not queued again.", file=sys.stderr)
+    else:
+        print(f"Queued tweet {tweet_id}.", file=sys.stderr)
+    return tweet_id
+
+
+def post(args, timings: Timings) -> int:
+    """Queue a tweet, posting everything queued straight away with --drain."""
+    _queue(args.text, timings)
+    if args.drain:
+        with timings.importing():
+            from tweet_queue import QueueDrainer, get_tweet_queue
+        print(QueueDrainer(get_tweet_queue()).drain(), file=sys.stderr)
+    return 0
+
+
+def requeue(args, timings: Timings) -> int:
+    """Queue a failed tweet again, or one marked unknown once known not to be posted."""
+    with timings.importing():
+        from tweet_queue import get_tweet_queue
+    if not get_tweet_queue().requeue(args.tweet_id):
+        print(f"Tweet {args.tweet_id} is not failed or unknown.", file=sys.stderr)
+        return 1
+    print(f"Queued tweet {args.tweet_id} again.", file=sys.stderr)
+    return 0
+
+
+def live(args, timings: Timings) -> int:
+    """Watch today's fixtures of the tracked teams, queueing each result at full time."""
+    with timings.importing():
+        from live_matches import watch_today
+    for match in watch_today():
+        print(
+            f"{match['homeTeam']['name']} v {match['awayTeam']['name']}: "
+            f"{match['status']}"
+        )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m twitter_bot", description=__doc__.split("::")[0].strip()
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="report startup, import and command time on stderr",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, func in [("next-fixture", next_fixture), ("opp-stats", opp_stats)]:
+        command = commands.add_parser(name, help=func.__doc__)
+        command.add_argument("--team-id", type=int, default=default_team_id)
+        command.add_argument(
+            "--post", action="store_true", help="queue the tweet to be posted"
+        )
+        command.set_defaults(func=func)
+
+    command = commands.add_parser("post", help=post.__doc__)
+    command.add_argument("text", help="tweet, the hashtag is appended")
+    command.add_argument(
+        "--drain", action="store_true", help="post the queued tweets now"
+    )
+    command.set_defaults(func=post)
+
+    command = commands.add_parser("requeue", help=requeue.__doc__)
+    command.add_argument("tweet_id", type=int, help="ID of the tweet in the queue")
+    command.set_defaults(func=requeue)
+
+    command = commands.add_parser("live", help=live.__doc__)
+    command.set_defaults(func=live)
+    return parser
+
+
+def main(argv=None, started: float = None) -> int:
+    """
+    Run a subcommand.
+    Args:
+        argv: command line arguments, defaults to sys.argv.
+        started: time.perf_counter() when the process started loading the command line.
+
+    Returns:
+        int: exit status.
+    """
+    timings = Timings(started)
+    args = build_parser().parse_args(argv)
+    timings.lap("startup")
+    try:
+        status = args.func(args, timings)
+    finally:
+        timings.lap("command")
+        if args.timings:
+            print(timings.report(), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main(started=_STARTED))
@@ -1,9 +1,266 @@
-from pyfootball.football import Football
-from typing import List, Dict, Any
+"""
+Reference data assets of the `twitter_bot` package: the competitions available from the
+football-data.org API and the teams of each, written as CSVs to `configs.paths.data_dir`.
+
+Team lists are partitioned by competition, one partition per competition in
+`comp_ids.csv`, so every competition can be refreshed with a single backfill. A CSV is only
+rewritten when the hash of its content changes, making repeated materializations no-ops.
+The team catalog of each competition, its teams' venues, names and fbref squads, is built
+from the same team lists into `configs.paths.catalog_dir` and refreshed weekly by
+`team_catalog_job`. Outside of dagster every team list can be refreshed in parallel, and
+the catalogs not built yet filled in, from `twitter_bot/`::
+
+    python -m assets.create_assets --workers 4
+    python -m assets.create_assets --catalog --competitions 2016
+    python -m assets.create_assets --catalog --missing
+"""
+import argparse
 import csv
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional
+
 import requests.exceptions
-from dagster import asset
+from dagster import (
+    asset,
+    AssetSelection,
+    define_asset_job,
+    Output,
+    StaticPartitionsDefinition,
+)
+
+from configs.fbref import league_urls
+from configs.football_data import reference_data_workers
+from configs.paths import catalog_dir, data_dir
+from configs.teams import tracked_competitions
+from helpers import get_football_data
+from standings import FbrefPage
+from team_catalog import CATALOG_FIELDS, CatalogTeam, catalog_path
+from team_names import TeamNameIndex, load_team_aliases, normalise_team_name
+
+COMPETITION_FIELDS = ["comp_id", "comp_name"]
+TEAM_FIELDS = ["team_id", "team_name"]
+
+
+def read_competition_ids(path: Path = None) -> List[int]:
+    """
+    Read the competition IDs in `comp_ids.csv`, falling back to the tracked competitions
+    before the csv has been written.
+    """
+    path = path or data_dir / "comp_ids.csv"
+    try:
+        with open(path, mode="r", encoding="utf-8") as csv_file:
+            return [int(row["comp_id"]) for row in csv.DictReader(csv_file)]
+    except FileNotFoundError:
+        return list(tracked_competitions)
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def write_csv_if_changed(
+    path: Path, rows: Iterable[Dict[str, Any]], fieldnames: List[str]
+) -> Dict[str, Any]:
+    """
+    Write rows to a csv, leaving the file untouched if its content would not change.
+    The file is replaced atomically, so readers never see a partly written csv.
+    Args:
+        path: location of the csv.
+        rows: dictionaries keyed by fieldnames.
+        fieldnames: columns of the csv.
+
+    Returns:
+        dict of the path, content_hash, number of rows and whether the file changed.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(
+        buffer, fieldnames=fieldnames, lineterminator="\n", extrasaction="ignore"
+    )
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    content = buffer.getvalue()
+    digest = content_hash(content)
+    changed = not path.exists() or content_hash(path.read_text("utf-8")) != digest
+    if changed:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(content, encoding="utf-8")
+        tmp.replace(path)
+    return {
+        "path": str(path),
+        "content_hash": digest,
+        "rows": count,
+        "changed": changed,
+    }
+
+
+def fetch_competitions() -> List[Dict[str, Any]]:
+    """
+    Get all the competitions available from the football-data.org API.
+    Returns:
+        competition_ids and competition_names
+    """
+    comps = get_football_data("competitions")["competitions"]
+    return [{"comp_id": comp["id"], "comp_name": comp["name"]} for comp in comps]
+
+
+def fetch_competition_teams(comp_id: int) -> List[Dict[str, Any]]:
+    """
+    Given a comp_id, returns all the teams involved from the football-data.org API.
+    Returns:
+        team_ids and team_names, with the short_name, tla and venue of each team
+    """
+    teams = get_football_data(f"competitions/{comp_id}/teams")["teams"]
+    return [
+        {
+            "team_id": team["id"],
+            "team_name": team["name"],
+            "short_name": team.get("shortName") or "",
+            "tla": team.get("tla") or "",
+            "venue": team.get("venue") or "",
+        }
+        for team in teams
+    ]
+
+
+def fetch_squad_urls(comp_id: int) -> Dict[str, str]:
+    """
+    Given a comp_id, return the fbref page of each squad in the competition's standings,
+    none if the competition has no fbref page configured.
+    """
+    if comp_id not in league_urls:
+        return {}
+    return FbrefPage.fetch(league_urls[comp_id]).squad_urls()
+
+
+def catalog_teams(
+    comp_id: int, teams: List[Dict[str, Any]], squad_urls: Dict[str, str]
+) -> List[CatalogTeam]:
+    """
+    Given the teams of a competition from `fetch_competition_teams` and its squad urls,
+    return the catalog of the teams, matching each to its fbref squad.
+    """
+    aliases = load_team_aliases()
+    index = TeamNameIndex(list(squad_urls), aliases)
+    catalog = []
+    for team in teams:
+        squad = index.resolve(team["team_name"]) or aliases.get(
+            normalise_team_name(team["team_name"]), ""
+        )
+        names = [team.get("short_name"), team.get("tla"), squad]
+        catalog.append(
+            CatalogTeam(
+                team_id=int(team["team_id"]),
+                team_name=team["team_name"],
+                short_name=team.get("short_name") or "",
+                tla=team.get("tla") or "",
+                venue=team.get("venue") or "",
+                competition_id=comp_id,
+                fbref_squad=squad,
+                aliases=tuple(
+                    dict.fromkeys(n for n in names if n and n != team["team_name"])
+                ),
+                fbref_url=squad_urls.get(squad, ""),
+            )
+        )
+    return catalog
+
+
+def write_team_catalog_csv(
+    comp_id: int,
+    teams: List[Dict[str, Any]],
+    squad_urls: Dict[str, str],
+    directory: Path = None,
+) -> Dict[str, Any]:
+    """Write the catalog of a competition's teams to `team_catalog_{comp_id}.csv`."""
+    return write_csv_if_changed(
+        catalog_path(comp_id, directory or catalog_dir),
+        [team.to_row() for team in catalog_teams(comp_id, teams, squad_urls)],
+        CATALOG_FIELDS,
+    )
+
+
+def refresh_team_catalog(comp_id: int, directory: Path = None) -> Dict[str, Any]:
+    """Fetch the teams and squad urls of a competition and write its team catalog."""
+    return write_team_catalog_csv(
+        comp_id, fetch_competition_teams(comp_id), fetch_squad_urls(comp_id), directory
+    )
+
+
+def write_competition_teams(
+    comp_id: int, teams: List[Dict[str, Any]], directory: Path = None
+) -> Dict[str, Any]:
+    """Write the teams of a competition to `team_ids_{comp_id}.csv` if they changed."""
+    path = (directory or data_dir) / f"team_ids_{comp_id}.csv"
+    return write_csv_if_changed(path, teams, TEAM_FIELDS)
+
+
+def refresh_competition_teams(
+    comp_id: int, directory: Path = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Fetch and write the teams of a competition.
+    Returns:
+        result of `write_csv_if_changed`, None if the competition is not available.
+    """
+    try:
+        teams = fetch_competition_teams(comp_id)
+    except requests.exceptions.HTTPError:
+        print(f"Competition ID {comp_id} not found.")
+        return None
+    return write_competition_teams(comp_id, teams, directory)
+
+
+def refresh_reference_data(
+    comp_ids: Iterable[int] = None,
+    workers: int = reference_data_workers,
+    directory: Path = None,
+) -> Dict[int, Optional[Dict[str, Any]]]:
+    """
+    Refresh `comp_ids.csv` and the team list of every competition. Team lists are
+    fetched by a pool of workers sharing the football-data client's rate limit.
+    Args:
+        comp_ids: competitions to refresh the teams of, defaults to every competition.
+        workers: number of team lists fetched at the same time.
+        directory: where the csvs are written, defaults to `configs.paths.data_dir`.
+
+    Returns:
+        result of writing each competition's team list, keyed by comp_id.
+    """
+    directory = directory or data_dir
+    if comp_ids is None:
+        comps = fetch_competitions()
+        write_csv_if_changed(directory / "comp_ids.csv", comps, COMPETITION_FIELDS)
+        comp_ids = [comp["comp_id"] for comp in comps]
+    comp_ids = list(comp_ids)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            lambda comp_id: refresh_competition_teams(comp_id, directory), comp_ids
+        )
+        return dict(zip(comp_ids, results))
+
+
+competition_partitions = StaticPartitionsDefinition(
+    [str(comp_id) for comp_id in read_competition_ids()]
+)
+
+
+def _write_output(result: Dict[str, Any]) -> Output:
+    return Output(
+        result,
+        metadata={
+            "path": result["path"],
+            "content_hash": result["content_hash"],
+            "rows": result["rows"],
+            "changed": result["changed"],
+        },
+    )
 
 
 @asset
@@ -13,57 +270,116 @@ def get_comp_ids() -> List[Dict[str, Any]]:
     Returns:
         competition_ids and competition_names
     """
-    fbl = Football()
-    comps = fbl.get_all_competitions()
-    return [{"comp_id": comp.id, "comp_name": comp.name} for comp in comps]
+    return fetch_competitions()
 
 
 @asset
-def write_comp_ids(get_comp_ids):
+def write_comp_ids(get_comp_ids) -> Output:
     """
     Function to create a csv containing all the competition IDs and names for those available
     in the football-data.org API
     """
-    path = Path.cwd().parent.parent / "data" / "comp_ids.csv"
-    with open(path, mode="w", encoding="utf-8") as csv_file:
-        fieldnames = ["comp_id", "comp_name"]
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in get_comp_ids:
-            writer.writerow(row)
-
+    return _write_output(
+        write_csv_if_changed(
+            data_dir / "comp_ids.csv", get_comp_ids, COMPETITION_FIELDS
+        )
+    )
 
-@asset
-def championship_id():
-    return 2016
 
-
-@asset
-def get_comp_team_ids(championship_id) -> List[Dict[str, Any]]:
+@asset(partitions_def=competition_partitions)
+def get_comp_team_ids(context) -> List[Dict[str, Any]]:
     """
-    Given a comp_id, returns all the teams involved from the football-data.org API.
+    Returns all the teams involved in the partition's competition from the
+    football-data.org API, none if the competition is not available.
     Returns:
         team_ids and team_names
     """
-    fbl = Football()
-    teams = fbl.get_competition_teams(championship_id)
-    return [{"team_id": team.id, "team_name": team.name} for team in teams]
+    comp_id = int(context.partition_key)
+    try:
+        return fetch_competition_teams(comp_id)
+    except requests.exceptions.HTTPError:
+        context.log.warning(f"Competition ID {comp_id} not found.")
+        return []
 
 
-@asset
-def write_comp_team_ids(championship_id, get_comp_team_ids):
+@asset(partitions_def=competition_partitions)
+def write_comp_team_ids(context, get_comp_team_ids) -> Output:
     """
-    Given a comp_id, creates a csv containing all the team IDs and names involved
-    for those available in the football-data.org API
+    Creates a csv containing all the team IDs and names involved in the partition's
+    competition, for those available in the football-data.org API
     """
-    path = Path.cwd().parent.parent / "data" / f"team_ids_{championship_id}.csv"
+    comp_id = int(context.partition_key)
+    if not get_comp_team_ids:
+        # keep the last team list of a competition the API did not answer for
+        return Output(None, metadata={"rows": 0, "changed": False})
+    return _write_output(write_competition_teams(comp_id, get_comp_team_ids))
+
+
+@asset(partitions_def=competition_partitions)
+def write_team_catalog(context, get_comp_team_ids) -> Output:
+    """
+    Creates a csv cataloguing the venue, names, aliases and fbref squad of every team in
+    the partition's competition, so tweets need no API call for team metadata.
+    """
+    comp_id = int(context.partition_key)
+    if not get_comp_team_ids:
+        return Output(None, metadata={"rows": 0, "changed": False})
     try:
-        with open(path, mode="w", encoding="utf-8") as csv_file:
-            fieldnames = ["team_id", "team_name"]
-            writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in get_comp_team_ids:
-                writer.writerow(row)
-    except requests.exceptions.HTTPError:
-        print(f"Competition ID {championship_id} not found.")
-        path.unlink()
+        squad_urls = fetch_squad_urls(comp_id)
+    except requests.exceptions.RequestException as error:
+        # the catalog is still worth having without the fbref squad pages
+        context.log.warning(f"Could not fetch the fbref squads of {comp_id}: {error}")
+        squad_urls = {}
+    return _write_output(write_team_catalog_csv(comp_id, get_comp_team_ids, squad_urls))
+
+
+reference_data_assets = [
+    get_comp_ids,
+    write_comp_ids,
+    get_comp_team_ids,
+    write_comp_team_ids,
+    write_team_catalog,
+]
+
+team_catalog_job = define_asset_job(
+    "team_catalog_job",
+    selection=AssetSelection.assets(
+        get_comp_team_ids, write_comp_team_ids, write_team_catalog
+    ),
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the reference data csvs.")
+    parser.add_argument("--workers", type=int, default=reference_data_workers)
+    parser.add_argument(
+        "--competitions",
+        type=int,
+        nargs="*",
+        help="competition IDs to refresh the teams of, defaults to all",
+    )
+    parser.add_argument(
+        "--catalog",
+        action="store_true",
+        help="refresh the team catalog of the competitions instead",
+    )
+    parser.add_argument(
+        "--missing",
+        action="store_true",
+        help="with --catalog, only build the catalogs not written yet",
+    )
+    args = parser.parse_args()
+    if args.catalog:
+        for competition in args.competitions or tracked_competitions:
+            if args.missing and catalog_path(competition).exists():
+                continue
+            try:
+                print(competition, refresh_team_catalog(competition))
+            except requests.exceptions.RequestException as error:
+                # tweets fall back to the API for the venues of a missing catalog
+                print(f"Team catalog of {competition} not built: {error}")
+    else:
+        for competition, result in refresh_reference_data(
+            args.competitions, args.workers
+        ).items():
+            print(competition, result)
@@ -0,0 +1,259 @@
+"""
+Standings and form charts as part of the `twitter_bot` package.
+
+Charts are drawn from a `Tables` overall standings table: the league's points as bars with
+the team highlighted, a strip of the team's last five results, and the team's goals for
+and against next to the league average. Each chart is rendered by the Agg backend onto a
+figure kept for reuse by its process, and saved as a PNG named by a hash of the data it
+shows, so a chart whose data has not changed is never drawn again. A league's charts are
+rendered by a pool of processes.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from configs.charts import (
+    charts_dir,
+    figure_size,
+    dpi,
+    chart_workers,
+    min_pool_charts,
+    result_colours,
+    highlight_colour,
+    team_colour,
+)
+from metrics import get_metrics
+
+# bump to redraw every cached chart after changing how charts are drawn
+STYLE_VERSION = 1
+
+
+def position_data(table: pd.DataFrame, squad: str) -> dict:
+    """Points of every squad in table order, highlighting squad."""
+    return {
+        "squads": table["Squad"].tolist(),
+        "points": [int(points) for points in table["Pts"]],
+        "highlight": squad,
+    }
+
+
+def form_data(table: pd.DataFrame, squad: str) -> dict:
+    """Squad's last five results, oldest first, i.e. ['W', 'W', 'D', 'L', 'W']."""
+    form = table.loc[table["Squad"] == squad, "Last 5"].item()
+    return {"squad": squad, "results": form.split()}
+
+
+def goals_data(table: pd.DataFrame, squad: str) -> dict:
+    """Squad's goals for and against, alongside the league average of each."""
+    row = table.loc[table["Squad"] == squad].iloc[0]
+    return {
+        "squad": squad,
+        "goals_for": int(row["GF"]),
+        "goals_against": int(row["GA"]),
+        "average_for": round(float(table["GF"].mean()), 2),
+        "average_against": round(float(table["GA"].mean()), 2),
+    }
+
+
+def draw_position(ax, data: dict):
+    squads = data["squads"]
+    colours = [
+        highlight_colour if squad == data["highlight"] else team_colour
+        for squad in squads
+    ]
+    ax.barh(range(len(squads)), data["points"], color=colours)
+    ax.set_yticks(range(len(squads)), squads, fontsize=6)
+    ax.invert_yaxis()
+    ax.set_xlabel("Points")
+    ax.set_title(f"{data['highlight']} in the table")
+
+
+def draw_form(ax, data: dict):
+    results = data["results"]
+    ax.bar(
+        range(len(results)),
+        [1] * len(results),
+        width=0.9,
+        color=[result_colours.get(result, "grey") for result in results],
+    )
+    for i, result in enumerate(results):
+        ax.text(i, 0.5, result, ha="center", va="center", color="white", size=24)
+    ax.set_axis_off()
+    ax.set_title(f"{data['squad']} last {len(results)}")
+
+
+def draw_goals(ax, data: dict):
+    positions = [0, 1]
+    ax.bar(
+        [p - 0.2 for p in positions],
+        [data["goals_for"], data["goals_against"]],
+        width=0.4,
+        color=highlight_colour,
+        label=data["squad"],
+    )
+    ax.bar(
+        [p + 0.2 for p in positions],
+        [data["average_for"], data["average_against"]],
+        width=0.4,
+        color=team_colour,
+        label="League average",
+    )
+    ax.set_xticks(positions, ["Scored", "Conceded"])
+    ax.legend()
+    ax.set_title(f"{data['squad']} goals")
+
+
+# chart kind: (data from a standings table and squad, drawing of the data)
+CHARTS: Dict[str, Tuple[Callable[[pd.DataFrame, str], dict], Callable]] = {
+    "position": (position_data, draw_position),
+    "form": (form_data, draw_form),
+    "goals": (goals_data, draw_goals),
+}
+
+# fixed margins of each kind of chart, quicker than working them out with tight_layout
+MARGINS = {
+    "position": {"left": 0.2, "right": 0.97, "top": 0.92, "bottom": 0.1},
+    "form": {"left": 0.03, "right": 0.97, "top": 0.85, "bottom": 0.05},
+    "goals": {"left": 0.08, "right": 0.97, "top": 0.9, "bottom": 0.08},
+}
+
+_figures: Dict[str, Figure] = {}
+_figures_lock = threading.Lock()
+
+
+def _figure(kind: str) -> Figure:
+    """Return this process's figure for a kind of chart, cleared for drawing."""
+    figure = _figures.get(kind)
+    if figure is None:
+        figure = _figures[kind] = Figure(figsize=figure_size, dpi=dpi)
+        FigureCanvasAgg(figure)
+    figure.clear()
+    figure.subplots_adjust(**MARGINS[kind])
+    return figure
+
+
+def chart_key(kind: str, data: dict) -> str:
+    """Hash of everything a chart shows, naming its PNG."""
+    payload = json.dumps(
+        {"kind": kind, "style": STYLE_VERSION, "data": data}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def chart_path(kind: str, data: dict, directory: Path = None) -> Path:
+    return (directory or charts_dir) / kind / f"{chart_key(kind, data)}.png"
+
+
+def render_png(kind: str, data: dict) -> bytes:
+    """Draw a chart with the Agg backend and return it as PNG bytes."""
+    with _figures_lock:
+        figure = _figure(kind)
+        CHARTS[kind][1](figure.add_subplot(), data)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def _render_to(job: Tuple[str, dict, str]) -> str:
+    """Render a chart to a path, written atomically. Runs in the pool's processes."""
+    kind, data, path = job
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+    tmp.write_bytes(render_png(kind, data))
+    tmp.replace(path)
+    return str(path)
+
+
+def render_chart(kind: str, data: dict, directory: Path = None) -> Path:
+    """
+    Render a chart unless a PNG of the same data already exists.
+    Args:
+        kind: kind of chart, a key of `CHARTS`.
+        data: data of the chart, i.e. from `position_data`.
+        directory: where PNGs are cached, defaults to `configs.charts.charts_dir`.
+
+    Returns:
+        Path of the chart's PNG.
+    """
+    path = chart_path(kind, data, directory)
+    cached = path.exists()
+    if not cached:
+        _render_to((kind, data, str(path)))
+    get_metrics().inc(
+        "charts_total", kind=kind, result="cached" if cached else "rendered"
+    )
+    return path
+
+
+def team_charts(
+    tables, team_name: str, kinds: Iterable[str] = tuple(CHARTS), directory: Path = None
+) -> Dict[str, Path]:
+    """
+    Given a Tables object and a team_name, render the team's charts.
+    Returns:
+        dict of chart kind to the Path of its PNG.
+    """
+    squad = tables.find_team(team_name)
+    if squad is None:
+        raise ValueError(f"{team_name} not found in {tables.url}")
+    table = tables.overall_standings_table
+    return {
+        kind: render_chart(kind, CHARTS[kind][0](table, squad), directory)
+        for kind in kinds
+    }
+
+
+def league_charts(
+    tables,
+    squads: Iterable[str] = None,
+    kinds: Iterable[str] = tuple(CHARTS),
+    workers: int = chart_workers,
+    directory: Path = None,
+) -> Dict[str, Dict[str, Path]]:
+    """
+    Given a Tables object, render the charts of many squads at once. Charts already
+    cached are skipped, the rest are rendered by a pool of `workers` processes.
+    Args:
+        tables: Tables object of the league.
+        squads: squad names as they appear in the table, defaults to every squad.
+        kinds: kinds of chart to render for each squad.
+        workers: number of rendering processes.
+        directory: where PNGs are cached, defaults to `configs.charts.charts_dir`.
+
+    Returns:
+        dict of squad to a dict of chart kind to the Path of its PNG.
+    """
+    table = tables.overall_standings_table
+    squads = list(table["Squad"] if squads is None else squads)
+    paths: Dict[str, Dict[str, Path]] = {squad: {} for squad in squads}
+    jobs: List[Tuple[str, dict, str]] = []
+    for squad in squads:
+        for kind in kinds:
+            data = CHARTS[kind][0](table, squad)
+            path = chart_path(kind, data, directory)
+            paths[squad][kind] = path
+            if not path.exists():
+                jobs.append((kind, data, str(path)))
+
+    metrics = get_metrics()
+    metrics.inc("charts_total", len(squads) * len(kinds) - len(jobs), result="cached")
+    metrics.inc("charts_total", len(jobs), result="rendered")
+    with metrics.timer("charts_render"):
+        if len(jobs) < min_pool_charts or workers <= 1:
+            for job in jobs:
+                _render_to(job)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                list(pool.map(_render_to, jobs, chunksize=chunksize))
+    return paths
@@ -0,0 +1,60 @@
+"""
+The current time as seen by the `twitter_bot` package.
+
+Everything that decides what to post, or how long a synced fixture list or cached response
+is trusted for, reads the time from here rather than from the system clock, so a season
+can be replayed day by day with `set_clock` and a `FakeClock`.
+"""
+import datetime
+import time
+from typing import Callable, Optional
+
+_clock: Callable[[], float] = time.time
+
+
+def unix_time() -> float:
+    """Return the current unix time in seconds."""
+    return _clock()
+
+
+def now(tz: Optional[datetime.tzinfo] = datetime.timezone.utc) -> datetime.datetime:
+    """Return the current time in tz, UTC by default."""
+    return datetime.datetime.fromtimestamp(_clock(), tz)
+
+
+def utcnow() -> datetime.datetime:
+    """Return the current UTC time as a naive datetime, like `datetime.utcnow`."""
+    return now().replace(tzinfo=None)
+
+
+def set_clock(clock: Optional[Callable[[], float]]):
+    """
+    Read the time from clock, a function returning unix time, instead of the system clock.
+    None goes back to the system clock.
+    """
+    global _clock  # pylint: disable=global-statement
+    _clock = clock or time.time
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to.
+    Args:
+        start: unix time, or an aware datetime, the clock starts at.
+    """
+
+    def __init__(self, start):
+        self.time = 0.0
+        self.set(start)
+
+    def __call__(self) -> float:
+        return self.time
+
+    def set(self, when):
+        """Move the clock to when, a unix time or an aware datetime."""
+        self.time = when.timestamp() if isinstance(when, datetime.datetime) else when
+
+    def advance(self, seconds: float):
+        self.time += seconds
+
+    sleep = advance
@@ -0,0 +1,374 @@
+"""
+A persistent SQLite store of fixtures, keyed by team and competition, as part of the
+`twitter_bot` package.
+
+Matches from football-data.org are synced into the store incrementally: new fixtures are
+added, changed ones updated and any kickoff change recorded as a delta. The next fixture
+of a team and the kickoff last announced for it are then indexed queries, so checks do not
+need an API round trip per team per run, and the state survives container restarts.
+"""
+import datetime
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from clock import unix_time, utcnow
+from configs.paths import state_dir
+
+# seconds before an endpoint already synced is requested again
+SYNC_INTERVAL = 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixtures (
+    fixture_id INTEGER PRIMARY KEY,
+    competition_id INTEGER NOT NULL,
+    home_team_id INTEGER,
+    away_team_id INTEGER,
+    kickoff TEXT NOT NULL,
+    status TEXT,
+    last_updated TEXT,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS team_fixtures (
+    team_id INTEGER NOT NULL,
+    competition_id INTEGER NOT NULL,
+    kickoff TEXT NOT NULL,
+    fixture_id INTEGER NOT NULL,
+    PRIMARY KEY (team_id, fixture_id)
+);
+CREATE INDEX IF NOT EXISTS team_fixtures_kickoff
+    ON team_fixtures (team_id, kickoff);
+CREATE INDEX IF NOT EXISTS team_fixtures_competition_kickoff
+    ON team_fixtures (team_id, competition_id, kickoff);
+CREATE TABLE IF NOT EXISTS fixture_changes (
+    change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fixture_id INTEGER NOT NULL,
+    old_kickoff TEXT NOT NULL,
+    new_kickoff TEXT NOT NULL,
+    detected_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fixture_changes_fixture ON fixture_changes (fixture_id);
+CREATE TABLE IF NOT EXISTS announcements (
+    team_id INTEGER PRIMARY KEY,
+    kickoff TEXT NOT NULL,
+    announced_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS syncs (
+    endpoint TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def utc_timestamp(date: datetime.datetime) -> str:
+    """
+    Given a datetime, return it as the UTC timestamp used by the API and the store,
+    i.e. '2022-10-29T14:00:00Z'. Naive datetimes are taken to already be in UTC.
+    """
+    if date.tzinfo is not None:
+        date = date.astimezone(datetime.timezone.utc)
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FixtureStore:
+    """
+    SQLite store of fixtures and the fixture dates announced for each team.
+    Args:
+        path: location of the SQLite file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def sync_matches(self, matches: List[dict]) -> Dict[str, int]:
+        """
+        Given match dictionaries from api.football-data.org, add new fixtures, update
+        changed ones and record every kickoff change.
+        Returns:
+            dict with the number of fixtures added, updated and rescheduled.
+        """
+        counts = {"added": 0, "updated": 0, "rescheduled": 0}
+        now = utc_timestamp(utcnow())
+        with self._lock, self._conn:
+            known = self._known_fixtures([match["id"] for match in matches])
+            for match in matches:
+                fixture_id, kickoff = match["id"], match["utcDate"]
+                previous = known.get(fixture_id)
+                if previous is not None and previous == (
+                    kickoff,
+                    match.get("lastUpdated"),
+                ):
+                    continue
+                if previous is None:
+                    counts["added"] += 1
+                else:
+                    counts["updated"] += 1
+                    if previous[0] != kickoff:
+                        counts["rescheduled"] += 1
+                        self._conn.execute(
+                            "INSERT INTO fixture_changes "
+                            "(fixture_id, old_kickoff, new_kickoff, detected_at) "
+                            "VALUES (?, ?, ?, ?)",
+                            (fixture_id, previous[0], kickoff, now),
+                        )
+                self._upsert(match)
+        return counts
+
+    def _known_fixtures(self, fixture_ids: List[int]) -> Dict[int, tuple]:
+        known = {}
+        for i in range(0, len(fixture_ids), 500):
+            chunk = fixture_ids[i : i + 500]
+            known.update(
+                (fixture_id, (kickoff, last_updated))
+                for fixture_id, kickoff, last_updated in self._conn.execute(
+                    "SELECT fixture_id, kickoff, last_updated FROM fixtures "
+                    f"WHERE fixture_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return known
+
+    def _upsert(self, match: dict):
+        fixture_id, kickoff = match["id"], match["utcDate"]
+        competition_id = match["competition"]["id"]
+        team_ids = (match["homeTeam"]["id"], match["awayTeam"]["id"])
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fixtures (fixture_id, competition_id, home_team_id, "
+            "away_team_id, kickoff, status, last_updated, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                fixture_id,
+                competition_id,
+                *team_ids,
+                kickoff,
+                match.get("status"),
+                match.get("lastUpdated"),
+                json.dumps(match),
+            ),
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO team_fixtures "
+            "(team_id, competition_id, kickoff, fixture_id) VALUES (?, ?, ?, ?)",
+            [
+                (team_id, competition_id, kickoff, fixture_id)
+                for team_id in team_ids
+                if team_id is not None
+            ],
+        )
+
+    def sync_endpoint(
+        self,
+        endpoint: str,
+        fetch: Callable[[str], dict],
+        max_age: float = SYNC_INTERVAL,
+    ) -> Optional[Dict[str, int]]:
+        """
+        Sync the matches of an API endpoint (i.e. 'competitions/2016/matches') unless it
+        was synced within max_age seconds.
+        Args:
+            endpoint: football-data.org endpoint returning a 'matches' list.
+            fetch: function returning the decoded JSON of an endpoint.
+            max_age: seconds a previous sync is trusted for.
+
+        Returns:
+            counts from `sync_matches`, None if the endpoint was not requested.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at FROM syncs WHERE endpoint = ?", (endpoint,)
+            ).fetchone()
+        if row is not None and unix_time() - row[0] < max_age:
+            return None
+        counts = self.sync_matches(fetch(endpoint)["matches"])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO syncs (endpoint, synced_at) VALUES (?, ?)",
+                (endpoint, unix_time()),
+            )
+        return counts
+
+    def next_fixture(
+        self,
+        team_id: int,
+        competition_id: Optional[int] = None,
+        after: Optional[datetime.datetime] = None,
+    ) -> Optional[dict]:
+        """
+        Given a team_id, return the match dictionary of its next fixture.
+        Args:
+            team_id: team ID value according to api.football-data.org.
+            competition_id: only consider fixtures of this competition.
+            after: only consider fixtures kicking off after this time, defaults to now.
+
+        Returns:
+            dict of the match as returned by the API, None if no fixture is known.
+        """
+        after = utc_timestamp(after or utcnow())
+        query = (
+            "SELECT f.payload FROM team_fixtures t "
+            "JOIN fixtures f ON f.fixture_id = t.fixture_id "
+            "WHERE t.team_id = ? AND t.kickoff > ? "
+        )
+        params = [team_id, after]
+        if competition_id is not None:
+            query += "AND t.competition_id = ? "
+            params.append(competition_id)
+        query += "ORDER BY t.kickoff LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def team_fixtures(self, team_id: int) -> List[dict]:
+        """
+        Given a team_id, return its fixtures in kickoff order.
+        Returns:
+            list of dictionaries with fixture_id, competition_id and kickoff.
+        """
+        keys = ["fixture_id", "competition_id", "kickoff"]
+        with self._lock:
+            return [
+                dict(zip(keys, row))
+                for row in self._conn.execute(
+                    "SELECT fixture_id, competition_id, kickoff FROM team_fixtures "
+                    "WHERE team_id = ? ORDER BY kickoff",
+                    (team_id,),
+                )
+            ]
+
+    def fixtures_between(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        team_ids: Optional[List[int]] = None,
+    ) -> List[dict]:
+        """
+        Return the match dictionaries of the fixtures kicking off from start until end,
+        optionally only those of team_ids, in kickoff order.
+        """
+        query = (
+            "SELECT DISTINCT f.payload, f.kickoff FROM team_fixtures t "
+            "JOIN fixtures f ON f.fixture_id = t.fixture_id "
+            "WHERE t.kickoff >= ? AND t.kickoff < ? "
+        )
+        params = [utc_timestamp(start), utc_timestamp(end)]
+        if team_ids:
+            query += f"AND t.team_id IN ({','.join('?' * len(team_ids))}) "
+            params += list(team_ids)
+        query += "ORDER BY f.kickoff, f.fixture_id"
+        with self._lock:
+            return [json.loads(row[0]) for row in self._conn.execute(query, params)]
+
+    def fixture_changes(
+        self, team_id: Optional[int] = None, since: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Return the recorded kickoff changes, optionally for one team's fixtures and
+        only those detected after the `since` timestamp.
+        """
+        query = (
+            "SELECT c.fixture_id, c.old_kickoff, c.new_kickoff, c.detected_at "
+            "FROM fixture_changes c JOIN fixtures f ON f.fixture_id = c.fixture_id "
+            "WHERE 1 = 1 "
+        )
+        params = []
+        if team_id is not None:
+            query += "AND ? IN (f.home_team_id, f.away_team_id) "
+            params.append(team_id)
+        if since is not None:
+            query += "AND c.detected_at > ? "
+            params.append(since)
+        query += "ORDER BY c.change_id"
+        keys = ["fixture_id", "old_kickoff", "new_kickoff", "detected_at"]
+        with self._lock:
+            return [dict(zip(keys, row)) for row in self._conn.execute(query, params)]
+
+    def announced_kickoff(self, team_id: int) -> Optional[str]:
+        """Return the kickoff last announced for a team, None if nothing was announced."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT kickoff FROM announcements WHERE team_id = ?", (team_id,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def announced(self) -> Dict[int, str]:
+        """Return the kickoff last announced for every team."""
+        with self._lock:
+            return dict(
+                self._conn.execute("SELECT team_id, kickoff FROM announcements")
+            )
+
+    def mark_announced(self, team_id: int, kickoff: datetime.datetime):
+        """Record that the fixture kicking off at kickoff has been announced for a team."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO announcements (team_id, kickoff, announced_at) "
+                "VALUES (?, ?, ?)",
+                (
+                    team_id,
+                    utc_timestamp(kickoff),
+                    utc_timestamp(utcnow()),
+                ),
+            )
+
+    def announce(
+        self, team_id: int, kickoff: datetime.datetime, expected: Optional[str]
+    ) -> bool:
+        """
+        Compare-and-set the kickoff announced for a team: record kickoff only if the
+        kickoff announced is still expected, so of concurrent runs that read the same
+        announcement only one goes on to announce the new fixture.
+        Args:
+            team_id: team ID value according to api.football-data.org.
+            kickoff: kickoff of the fixture being announced.
+            expected: kickoff timestamp read from `announced_kickoff`, None if nothing
+                was announced.
+
+        Returns:
+            bool: whether the announcement was recorded.
+        """
+        values = (utc_timestamp(kickoff), utc_timestamp(utcnow()), team_id)
+        with self._lock, self._conn:
+            if expected is None:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO announcements "
+                    "(kickoff, announced_at, team_id) VALUES (?, ?, ?)",
+                    values,
+                )
+            else:
+                cur = self._conn.execute(
+                    "UPDATE announcements SET kickoff = ?, announced_at = ? "
+                    "WHERE team_id = ? AND kickoff = ?",
+                    (*values, expected),
+                )
+            return cur.rowcount == 1
+
+    def clear_announced(self, team_id: int):
+        """Forget the fixture announced for a team, so its next fixture is announced again."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM announcements WHERE team_id = ?", (team_id,)
+            )
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_fixture_store() -> FixtureStore:
+    """
+    Return the process-wide FixtureStore, creating it in `configs.paths.state_dir` on first use.
+    """
+    global _default_store  # pylint: disable=global-statement
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = FixtureStore(state_dir / "fixtures.sqlite")
+        return _default_store
@@ -0,0 +1,299 @@
+"""
+A shared client for the football-data.org API as part of the `twitter_bot` package.
+
+Every request in a process goes through one keep-alive session and one token bucket that
+follows the API's per-minute quota headers, so bursts wait for a free slot instead of
+failing with 429s. The bucket of `get_client` is kept in SQLite under the state dir, so
+the steps of a multiprocess run and runs launched side by side share the one quota.
+Identical requests made at the same time are merged into one, and responses are kept in
+the shared response cache.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from configs.football_data import (
+    base_url,
+    api_key,
+    requests_per_minute,
+    pool_maxsize,
+    max_retries,
+)
+from configs.paths import state_dir
+from http_cache import CachedResponse, cached_get
+
+# seconds to wait after a 429 that does not say when the quota resets
+DEFAULT_RESET = 60
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate_per_minute` requests a minute.
+    `acquire` blocks until a token is free, so callers queue rather than fail.
+    Args:
+        rate_per_minute: tokens added per minute, and the bucket's capacity.
+        clock: monotonic clock in seconds.
+        sleep: function to wait a number of seconds.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self.waits = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        """Hold the bucket's tokens while they are read and changed."""
+        with self._lock:
+            yield
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """
+        Take a token if one is available, without waiting.
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one is available.
+        """
+        with self._state():
+            now = self.clock()
+            self._refill(now)
+            if now >= self.blocked_until and self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            self.waits += 1
+            return max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+
+    def acquire(self):
+        """Take a token, waiting until one is available."""
+        while True:
+            wait = self.take()
+            if not wait:
+                return
+            self.sleep(wait)
+
+    def update(self, available: Optional[int], reset_in: Optional[float]):
+        """
+        Align the bucket with the quota the API reports.
+        Args:
+            available: requests left this minute (X-Requests-Available-Minute).
+            reset_in: seconds until the quota resets (X-RequestCounter-Reset).
+        """
+        with self._state():
+            now = self.clock()
+            self._refill(now)
+            if available is not None:
+                self.tokens = min(self.tokens, float(available))
+                if available <= 0:
+                    self.blocked_until = max(
+                        self.blocked_until, now + (reset_in or DEFAULT_RESET)
+                    )
+
+
+_BUCKET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    blocked_until REAL NOT NULL
+);
+"""
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket whose tokens are kept in a SQLite file, so every process using the file
+    takes from the one quota. The clock is wall time, as it is compared across processes.
+    Args:
+        rate_per_minute: tokens added per minute, and the bucket's capacity.
+        path: location of the SQLite file.
+        name: name of the bucket within the file.
+        clock: wall clock in seconds, the same in every process.
+        sleep: function to wait a number of seconds.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        path: Path,
+        name: str = "football-data",
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        super().__init__(rate_per_minute, clock, sleep)
+        self.name = name
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_BUCKET_SCHEMA)
+
+    @contextmanager
+    def _state(self) -> Iterator[None]:
+        with self._lock:
+            # the write lock is taken up front, so no other process reads the tokens
+            # until they are written back
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated, blocked_until FROM buckets WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                if row is not None:
+                    self.tokens, self.updated, self.blocked_until = row
+                yield
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets "
+                    "(name, tokens, updated, blocked_until) VALUES (?, ?, ?, ?)",
+                    (self.name, self.tokens, self.updated, self.blocked_until),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+
+def _int_header(r: requests.Response, name: str) -> Optional[int]:
+    try:
+        return int(r.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class RateLimitedSession(requests.Session):
+    """
+    requests.Session with a pooled keep-alive adapter that takes a token from `limiter`
+    before every request and retries requests answered with 429 once the quota resets.
+    """
+
+    def __init__(self, limiter: TokenBucket, retries: int = max_retries):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.limiter = limiter
+        self.retries = retries
+        self.requests_sent = 0
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            r = super().request(method, url, *args, **kwargs)
+            self.requests_sent += 1
+            reset_in = _int_header(r, "X-RequestCounter-Reset")
+            if r.status_code == 429:
+                self.limiter.update(0, reset_in)
+                if attempt < self.retries:
+                    continue
+            else:
+                self.limiter.update(
+                    _int_header(r, "X-Requests-Available-Minute"), reset_in
+                )
+            return r
+        return r
+
+
+class FootballDataClient:
+    """
+    Client for the football-data.org v4 API.
+    Args:
+        token: API token, defaults to the PYFOOTBALL_API_KEY environment variable.
+        url: API root.
+        limiter: token bucket shared by every request of the client.
+    """
+
+    def __init__(
+        self,
+        token: str = api_key,
+        url: str = base_url,
+        limiter: Optional[TokenBucket] = None,
+    ):
+        self.url = url.rstrip("/")
+        self.limiter = limiter or TokenBucket(requests_per_minute)
+        self.session = RateLimitedSession(self.limiter)
+        self.session.headers["X-Auth-Token"] = token
+        self.stats = {"calls": 0, "coalesced": 0}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, max_age: Optional[float] = None) -> CachedResponse:
+        """
+        GET an endpoint through the response cache, joining an identical request
+        already in flight instead of sending another.
+        Args:
+            endpoint: path relative to the API root, i.e. 'teams/328/matches'.
+            max_age: seconds a cached response is served for, 0 to revalidate it with a
+                conditional request. Defaults to the cache's football-data TTL.
+
+        Returns:
+            CachedResponse of the endpoint.
+        """
+        url = f"{self.url}/{endpoint.lstrip('/')}"
+        with self._lock:
+            self.stats["calls"] += 1
+            future = self._inflight.get(url)
+            owner = future is None
+            if owner:
+                future = self._inflight[url] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(
+                cached_get(
+                    url, source="football-data", session=self.session, max_age=max_age
+                )
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                del self._inflight[url]
+        return future.result()
+
+    def get_json(self, endpoint: str) -> dict:
+        """GET an endpoint and return its decoded JSON."""
+        return self.get(endpoint).json()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> FootballDataClient:
+    """
+    Return the process-wide FootballDataClient, so all callers share its connections
+    and rate limit, its tokens kept in `configs.paths.state_dir` for every process.
+    """
+    global _default_client  # pylint: disable=global-statement
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = FootballDataClient(
+                limiter=SharedTokenBucket(
+                    requests_per_minute, state_dir / "rate_limits.sqlite"
+                )
+            )
+        return _default_client
@@ -1,13 +1,21 @@
 """
 A module of helper functions to be used within the `main` module of the `twitter_bot` package.
 """
+import csv
 import datetime
-import pytz
-import tweepy
-from pyfootball.football import Football
-from configs import keys
+import re
+from configs.paths import data_dir
+from football_data import get_client
+from fixture_store import get_fixture_store, utc_timestamp, SYNC_INTERVAL
+from tweet_queue import get_tweet_queue
+from tweet_templates import weighted_length
+from metrics import get_metrics
+from models import Fixture
+from team_catalog import get_team_catalog
+from clock import now
+from configs.twitter import hashtag, max_tweet_length
 
-from pathlib import Path
+from typing import Optional
 
 
 def twitter_auth():
@@ -15,6 +23,10 @@ def twitter_auth():
     Authenticate user with Twitter developers account, returning a client from the tweepy package.
     :return: Twitter API v2 Client
     """
+    # imported here, so commands that only read fixtures load neither tweepy nor the keys
+    import tweepy  # pylint: disable=import-outside-toplevel
+    from configs import keys  # pylint: disable=import-outside-toplevel
+
     # Authenticate to Twitter
     client = tweepy.Client(
         consumer_key=keys.CONSUMER_API_KEY,
@@ -34,49 +46,87 @@ def format_tweet(tweet: str) -> str:
     Returns:
         tweet: str: same tweet with hashtag appended.
     """
-    tweet += "\n\n#twitterclarets"
+    tweet += f"\n\n{hashtag}"
     return tweet
 
 
-def get_next_fixture(team_id: int):
+def get_football_data(endpoint: str) -> dict:
+    """
+    GET an endpoint of the football-data.org API through the shared, rate limited client.
+    Args:
+        endpoint: path relative to the API root, i.e. 'teams/328/matches'.
+
+    Returns:
+        dict: decoded JSON response.
+    """
+    # IDs are dropped from the label so there is one series per kind of endpoint
+    call = re.sub(r"\d+", ":id", endpoint.strip("/"))
+    with get_metrics().timer("football_data_call", endpoint=call):
+        return get_client().get_json(endpoint)
+
+
+def get_next_fixture(team_id: int, competition_id: int = None):
     """
     Given a team_id, return the date of the next fixture for the corresponding team.
+    The team's matches are synced into the fixture store at most once an hour, the next
+    fixture is then read from the store.
     Args:
         team_id: team ID value according to api.football-data.org.
+        competition_id: only consider fixtures of this competition. Its matches are
+            expected to have been synced with `sync_competition_matches`.
 
     Returns:
         Fixture object of next fixture, None if no fixtures available.
     """
-    fbl = Football()
-    now = datetime.datetime.now()
-    fixtures = fbl.get_team_fixtures(team_id)
-    fixtures_upcoming = [utc_to_uk_time(fix) for fix in fixtures if fix.date > now]
-    try:
-        return fixtures_upcoming[0]
-    except KeyError:
+    store = get_fixture_store()
+    if competition_id is None:
+        store.sync_endpoint(f"teams/{team_id}/matches", get_football_data)
+    match = store.next_fixture(team_id, competition_id)
+    if match is None:
         print("Dates for future fixtures are not currently available.")
         return None
+    return Fixture.from_match(match)
 
 
-def utc_to_uk_time(_object: object):
-    """Given an object, finds all the attributes with a date type and converts them from
-    utc to UK time.
-
+def sync_competition_matches(comp_id: int, max_age: float = SYNC_INTERVAL) -> dict:
+    """
+    Given a comp_id, sync every match of the competition's current season into the
+    fixture store, so the fixtures of all its teams come from a single request.
     Args:
-        _object: Any pyfootball object (i.e. Fixture, Competition)
+        comp_id: competition ID value according to api.football-data.org.
+        max_age: seconds a previous sync of the competition is trusted for.
 
     Returns:
-        _object: The same object with time attribute converted to UK time.
+        counts of fixtures added, updated and rescheduled, None if recently synced.
     """
-    date_attributes = [
-        key
-        for key in _object.__dict__.keys()
-        if isinstance(_object.__dict__[key], datetime.datetime)
-    ]
-    london = pytz.timezone("Europe/London")
-    for att in date_attributes:
-        setattr(_object, att, london.fromutc(getattr(_object, att)))
-    return _object
+    return get_fixture_store().sync_endpoint(
+        f"competitions/{comp_id}/matches", get_football_data, max_age
+    )
+
+
+def read_tracked_teams(competition_ids: list, team_ids: list = None) -> list:
+    """
+    Read the teams to post for from `data/team_ids_{competition_id}.csv` for each
+    competition, optionally restricted to team_ids.
+    Returns:
+        list of dictionaries with team_id, team_name and competition_id.
+    """
+    team_ids = set(team_ids or [])
+    teams = []
+    for comp_id in competition_ids:
+        path = data_dir / f"team_ids_{comp_id}.csv"
+        with open(path, mode="r", encoding="utf-8") as csv_file:
+            for row in csv.DictReader(csv_file):
+                if team_ids and int(row["team_id"]) not in team_ids:
+                    continue
+                teams.append(
+                    {
+                        "team_id": int(row["team_id"]),
+                        "team_name": row["team_name"],
+                        "competition_id": comp_id,
+                    }
+                )
+    return teams
 
 
 def make_date_readable(date_obj: datetime.datetime) -> list:
@@ -101,12 +151,12 @@ def get_opposition_team(fixture, team_id):
         team_id: ID of the team you want the opposition of.
 
     Returns:
-        dictionary of opposition team.
+        Team of the opposition.
     """
     if fixture.home_team_id == team_id:
-        return fixture.away_team
+        return get_team_catalog().complete(fixture.away_team)
     if fixture.away_team_id == team_id:
-        return fixture.home_team
+        return get_team_catalog().complete(fixture.home_team)
     print(
         f"Team with ID: {team_id} are not participating in "
         f"{fixture.home_team_name}({fixture.home_team_id}) "
@@ -139,7 +189,8 @@ def home_or_away(fixture, team_id: int) -> str:
 
 def get_home_team_venue(fixture) -> str:
     """
-    Given a Fixture object, return the venue of the home team.
+    Given a Fixture object, return the venue of the home team, from the team catalog
+    unless the team is not catalogued.
     Be careful, this may be incorrect if the games played at a neutral ground.
     Args:
         fixture: Fixture object
@@ -147,20 +198,49 @@ def get_home_team_venue(fixture) -> str:
     Returns:
         The name of the home teams venue.
     """
-    fbl = Football()
     home_team_id = fixture.home_team_id
-    return fbl.get_team(home_team_id).venue
+    venue = get_team_catalog().venue(home_team_id)
+    if venue is not None:
+        return venue
+    return get_football_data(f"teams/{home_team_id}")["venue"]
+
+
+def write_latest_fixture_date(fixture_date: datetime.datetime, team_id: int):
+    """
+    Record fixture_date as the latest fixture date announced for the team.
+    """
+    get_fixture_store().mark_announced(team_id, fixture_date)
+
 
+def get_latest_fixture_date(team_id: int):
+    """
+    Return the UTC kickoff timestamp of the latest fixture announced for the team,
+    None if no fixture has been announced.
+    """
+    return get_fixture_store().announced_kickoff(team_id)
 
-def write_latest_fixture_date(fixture_date: datetime.datetime):
-    path = Path().cwd() / "latest_fixture.txt"
-    date = datetime.datetime.strftime(fixture_date, format="%d-%m-%y")
-    with open(path, mode="w", encoding="utf-8") as file:
-        file.write(date)
 
+def is_fixture_date_new(fixture, team_id: int) -> bool:
+    """
+    Given a Fixture object, return whether its kickoff differs from the latest fixture
+    date announced for the team.
+    """
+    return utc_timestamp(fixture.date) != get_latest_fixture_date(team_id)
 
-def get_latest_fixture_date():
-    pass
+
+def claim_fixture_announcement(fixture, team_id: int) -> bool:
+    """
+    Given a Fixture object, record it as the latest fixture announced for the team unless
+    it already is, compare-and-set against the kickoff read, so of runs for the team at
+    the same time only one announces it.
+    Returns:
+        bool: whether the fixture should be announced by this run.
+    """
+    store = get_fixture_store()
+    announced = store.announced_kickoff(team_id)
+    if utc_timestamp(fixture.date) == announced:
+        return False
+    return store.announce(team_id, fixture.date, expected=announced)
 
 
 def make_ordinal(n):
@@ -180,8 +260,40 @@ def make_ordinal(n):
     return str(n) + suffix
 
 
-def is_tweet_too_long(tweet: str):
-    return len(tweet) > 280
+def is_tweet_too_long(tweet: str) -> bool:
+    """
+    Given a tweet, return True if it is over Twitter's limit once `format_tweet` has
+    appended the hashtag, counting characters the way Twitter weighs them.
+    """
+    return weighted_length(format_tweet(tweet)) > max_tweet_length
+
+
+def send_tweet(tweet: str, team_id: int = None) -> Optional[int]:
+    """
+    Given a tweet, format it and add it to the outbound tweet queue, which posts it
+    to the account using Twitter API v2 Client. A tweet already queued is not queued again.
+    Args:
+        tweet: Tweet to post
+        team_id: team the tweet is about, recorded in the queue's ledger.
+
+    Returns:
+        int: ID of the queued tweet, None if the same tweet was already queued.
+    """
+    metrics = get_metrics()
+    with metrics.timer("tweet_enqueue"):
+        tweet_id = get_tweet_queue().enqueue_unique(
+            format_tweet(tweet), team_id=team_id
+        )
+    if tweet_id is None:
+        metrics.inc("tweet_duplicates_total")
+    return tweet_id
+
+
+def is_matchday(fixture) -> bool:
+    """
+    Given a Fixture object, return whether it is being played today.
+    """
+    return fixture.date.date() == now(fixture.date.tzinfo).date()
 
 
 def delete_tweet(tweet_id):
@@ -0,0 +1,288 @@
+"""
+A shared on-disk HTTP response cache used for fbref and football-data.org requests as part
+of the `twitter_bot` package.
+
+Responses are kept in a SQLite file so every process (and every Dagster step) reuses the
+same pages. Within a source's TTL a response is served without touching the network;
+afterwards it is revalidated with a conditional GET (ETag/Last-Modified) and only
+downloaded again if it changed. The least recently used responses are evicted once the
+cache grows past its size limit.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+from configs.http import cache_dir, cache_max_bytes, cache_ttls, request_timeout
+from clock import unix_time
+from metrics import get_metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+class CachedResponse:
+    """
+    The parts of a `requests.Response` the bot uses, as returned from the cache.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        content: bytes,
+        content_type: Optional[str] = None,
+        from_cache: bool = False,
+    ):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.content_type = content_type
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """
+    Size-bounded, TTL-per-source cache of GET responses stored in SQLite.
+    Args:
+        path: location of the SQLite file.
+        max_bytes: total body size kept before least recently used responses are evicted.
+        ttls: seconds a response from each source is served without revalidation.
+            The "default" entry is used for sources not listed.
+        session: requests.Session used for network requests.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = cache_max_bytes,
+        ttls: Optional[Dict[str, float]] = None,
+        session: Optional[requests.Session] = None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttls = dict(cache_ttls if ttls is None else ttls)
+        self.session = session or requests.Session()
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False
+        )
+        self._conn.executescript(_SCHEMA)
+
+    def ttl(self, source: str) -> float:
+        return self.ttls.get(source, self.ttls.get("default", 0))
+
+    def get(
+        self,
+        url: str,
+        source: str = "default",
+        headers: Optional[dict] = None,
+        session: Optional[requests.Session] = None,
+        max_age: Optional[float] = None,
+    ) -> CachedResponse:
+        """
+        Given a url, return its response from the cache if it is fresh, otherwise
+        revalidate or download it.
+        Args:
+            url: url to GET.
+            source: name of the source, selects the TTL.
+            headers: extra request headers (i.e. API tokens), not part of the cache key.
+            session: session to make the request with instead of the cache's own.
+            max_age: seconds a cached response is served for instead of the source's
+                TTL, 0 to always revalidate, i.e. the status of a match being played.
+
+        Returns:
+            CachedResponse of the url.
+        """
+        metrics = get_metrics()
+        now = unix_time()
+        row = self._lookup(url)
+        ttl = self.ttl(source) if max_age is None else max_age
+        if row is not None and now - row["fetched_at"] < ttl:
+            self._count("hits")
+            metrics.inc("cache_requests_total", source=source, result="hit")
+            self._touch(url, now)
+            return self._to_response(url, row, from_cache=True)
+
+        request_headers = dict(headers or {})
+        if row is not None:
+            if row["etag"]:
+                request_headers["If-None-Match"] = row["etag"]
+            if row["last_modified"]:
+                request_headers["If-Modified-Since"] = row["last_modified"]
+
+        session = session or self.session
+        with metrics.timer("http_request", source=source):
+            r = session.get(url, headers=request_headers, timeout=request_timeout)
+        if r.status_code == 304 and row is not None:
+            self._count("revalidated")
+            metrics.inc("cache_requests_total", source=source, result="revalidated")
+            self._revalidate(url, r, now)
+            return self._to_response(url, row, from_cache=True)
+
+        r.raise_for_status()
+        self._count("misses")
+        metrics.inc("cache_requests_total", source=source, result="miss")
+        metrics.inc("http_downloaded_bytes_total", len(r.content), source=source)
+        self._store(url, source, r, now)
+        return CachedResponse(
+            url, r.status_code, r.content, r.headers.get("Content-Type")
+        )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _lookup(self, url: str) -> Optional[dict]:
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT status, content_type, etag, last_modified, body, fetched_at "
+                "FROM responses WHERE url = ?",
+                (url,),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return None
+        keys = ["status", "content_type", "etag", "last_modified", "body", "fetched_at"]
+        return dict(zip(keys, row))
+
+    def _touch(self, url: str, now: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url)
+            )
+            self._conn.commit()
+
+    def _revalidate(self, url: str, r: requests.Response, now: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                "WHERE url = ?",
+                (now, now, r.headers.get("ETag"), r.headers.get("Last-Modified"), url),
+            )
+            self._conn.commit()
+
+    def _store(self, url: str, source: str, r: requests.Response, now: float):
+        body = r.content
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, source, status, content_type, "
+                "etag, last_modified, body, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    source,
+                    r.status_code,
+                    r.headers.get("Content-Type"),
+                    r.headers.get("ETag"),
+                    r.headers.get("Last-Modified"),
+                    sqlite3.Binary(body),
+                    len(body),
+                    now,
+                    now,
+                ),
+            )
+            self._conn.commit()
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used responses until the cache fits in max_bytes."""
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evict = []
+            for url, size in self._conn.execute(
+                "SELECT url, size FROM responses ORDER BY accessed_at"
+            ):
+                if total <= self.max_bytes:
+                    break
+                evict.append((url,))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE url = ?", evict)
+            self._conn.commit()
+            self.stats["evictions"] += len(evict)
+
+    @staticmethod
+    def _to_response(url: str, row: dict, from_cache: bool) -> CachedResponse:
+        return CachedResponse(
+            url, row["status"], bytes(row["body"]), row["content_type"], from_cache
+        )
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """
+    Return the process-wide ResponseCache, creating it in `configs.http.cache_dir` on first use.
+    """
+    global _default_cache  # pylint: disable=global-statement
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(cache_dir / "responses.sqlite")
+        return _default_cache
+
+
+def cached_get(
+    url: str,
+    source: str = "default",
+    headers: Optional[dict] = None,
+    session: Optional[requests.Session] = None,
+    max_age: Optional[float] = None,
+) -> CachedResponse:
+    """
+    GET a url through the shared response cache.
+    Args:
+        url: url to GET.
+        source: name of the source, selects the TTL (i.e. 'fbref', 'football-data').
+        headers: extra request headers.
+        session: session to make the request with instead of the cache's own.
+        max_age: seconds a cached response is served for instead of the source's TTL.
+
+    Returns:
+        CachedResponse of the url.
+    """
+    return get_cache().get(
+        url, source=source, headers=headers, session=session, max_age=max_age
+    )
@@ -0,0 +1,120 @@
+"""
+A dagster IO manager handing op outputs between processes as JSON, as part of the
+`twitter_bot` package.
+
+Under the multiprocess executor every output is written to disk by one step and read back
+by the next. Fixtures are written as the compact arrays of `Fixture.to_json`, and other
+JSON values, i.e. lists of teams or dicts keyed by competition ID, as they are, so
+handoffs cost a small JSON file rather than a pickle of each object. Outputs JSON can not
+hold, i.e. the `standings.Tables` shared by every team, are still pickled.
+
+Outputs are kept in a directory per run, so a failed run can be re-executed from the step
+that failed. The directories of runs older than `KEEP_RUNS_FOR` are deleted when the
+next run writes its first output.
+"""
+import json
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+from dagster import Field, InputContext, IOManager, OutputContext, io_manager
+
+from configs.paths import io_manager_dir
+from models import Fixture
+
+# seconds the outputs of a run are kept, to re-execute it from a failed step
+KEEP_RUNS_FOR = 2 * 24 * 60 * 60
+_FIXTURE = "__fixture__"
+_ITEMS = "__items__"
+
+
+def encode(value):
+    """
+    Given an op output, return it as JSON values, tagging fixtures and dicts with keys
+    JSON would turn into strings.
+    Raises:
+        TypeError: if the value can not be held by JSON.
+    """
+    if isinstance(value, Fixture):
+        return {_FIXTURE: value.to_json()}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: encode(item) for key, item in value.items()}
+        return {_ITEMS: [[encode(key), encode(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def decode(value):
+    """Given JSON values from `encode`, return the op output."""
+    if isinstance(value, dict):
+        if _FIXTURE in value:
+            return Fixture.from_json(value[_FIXTURE])
+        if _ITEMS in value:
+            return {decode(key): decode(item) for key, item in value[_ITEMS]}
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+class JsonIOManager(IOManager):
+    """
+    Stores each op output under base_dir as JSON, or as a pickle when JSON can not hold it.
+    Args:
+        base_dir: directory the outputs of every run are kept in.
+        keep_runs_for: seconds the outputs of a run are kept after it last wrote one.
+    """
+
+    def __init__(self, base_dir: Path, keep_runs_for: float = KEEP_RUNS_FOR):
+        self.base_dir = Path(base_dir)
+        self.keep_runs_for = keep_runs_for
+
+    def prune(self) -> int:
+        """
+        Delete the outputs of the runs that have not written one for keep_runs_for seconds.
+        Returns:
+            int: number of runs deleted.
+        """
+        if not self.base_dir.exists():
+            return 0
+        # file times are wall clock, whatever clock the run is on
+        cutoff = time.time() - self.keep_runs_for
+        pruned = 0
+        for run_dir in self.base_dir.iterdir():
+            if run_dir.is_dir() and run_dir.stat().st_mtime < cutoff:
+                # another step may be pruning the same run at the same time
+                shutil.rmtree(run_dir, ignore_errors=True)
+                pruned += 1
+        return pruned
+
+    def _path(self, context, suffix: str) -> Path:
+        path = self.base_dir.joinpath(*context.get_identifier())
+        return path.with_name(path.name + suffix)
+
+    def handle_output(self, context: OutputContext, obj):
+        path = self._path(context, ".json")
+        if not self.base_dir.joinpath(context.get_identifier()[0]).exists():
+            self.prune()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            text = json.dumps(encode(obj), separators=(",", ":"))
+        except TypeError:
+            self._path(context, ".pickle").write_bytes(pickle.dumps(obj))
+            return
+        path.write_text(text, encoding="utf-8")
+
+    def load_input(self, context: InputContext):
+        path = self._path(context.upstream_output, ".json")
+        if path.exists():
+            return decode(json.loads(path.read_text(encoding="utf-8")))
+        return pickle.loads(self._path(context.upstream_output, ".pickle").read_bytes())
+
+
+@io_manager(config_schema={"base_dir": Field(str, is_required=False)})
+def json_io_manager(init_context) -> JsonIOManager:
+    return JsonIOManager(init_context.resource_config.get("base_dir", io_manager_dir))
@@ -0,0 +1,203 @@
+"""
+Stats derived from a whole league's standings at once, as part of the `twitter_bot` package.
+
+`league_stats` turns an overall standings table from `standings.Tables` into one typed
+frame, indexed by squad, with points and goals per game, goal ratio, form packed into an
+integer and its points, the gap to the play-off and relegation lines and the movement in
+rank since the previous day's snapshot. Every column is computed for the whole league with
+NumPy operations, so tweet builders read a row rather than deriving stats team by team.
+
+Form is packed two bits a result, in the order fbref lists them with the latest in the
+lowest bits: 0 for no result, 1 for a loss, 2 for a draw and 3 for a win. 'W W D L W' is
+0b11_11_10_01_11.
+"""
+import datetime
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from clock import now
+from configs.league_stats import (
+    playoff_places,
+    relegation_places,
+    default_playoff_places,
+    default_relegation_places,
+)
+from standings_history import get_standings_history
+
+FORM_LENGTH = 5
+RESULTS = " LDW"
+_RESULT_CODES = np.zeros(256, dtype=np.uint16)
+_RESULT_POINTS = np.zeros(256, dtype=np.int8)
+for _code, _result in enumerate(RESULTS[1:], start=1):
+    _RESULT_CODES[ord(_result)] = _code
+    _RESULT_POINTS[ord(_result)] = {"W": 3, "D": 1, "L": 0}[_result]
+_SHIFTS = np.arange(2 * (FORM_LENGTH - 1), -1, -2, dtype=np.uint16)
+RESULT_EMOJI = {"W": "\U0001F7E2", "D": "\U0001F7E1", "L": "\U0001F534"}
+
+# fbref column and name of each standings column kept as it is
+COLUMNS = {
+    "Rk": "rank",
+    "MP": "played",
+    "W": "wins",
+    "D": "draws",
+    "L": "losses",
+    "GF": "goals_for",
+    "GA": "goals_against",
+    "GD": "goal_difference",
+    "Pts": "points",
+}
+DTYPES = {
+    **{name: "int16" for name in COLUMNS.values()},
+    "points_per_game": "float32",
+    "goals_for_per_game": "float32",
+    "goals_against_per_game": "float32",
+    "goal_ratio": "float32",
+    "form": "object",
+    "form_code": "uint16",
+    "form_points": "int8",
+    "playoff_gap": "int16",
+    "relegation_gap": "int16",
+    "rank_change": "Int16",
+    "top_scorer": "object",
+}
+
+
+def decode_form(code: int) -> str:
+    """Given a packed form code, return the results it holds, i.e. 'W W D L W'."""
+    return " ".join(
+        RESULTS[(code >> int(shift)) & 3]
+        for shift in _SHIFTS
+        if (code >> int(shift)) & 3
+    )
+
+
+# emoji of every packed form, looked up by code
+FORM_EMOJI = np.array(
+    [
+        " ".join(RESULT_EMOJI[result] for result in decode_form(code).split())
+        for code in range(1 << 2 * FORM_LENGTH)
+    ],
+    dtype=object,
+)
+
+
+def encode_form(form: pd.Series) -> pd.DataFrame:
+    """
+    Given fbref 'Last 5' strings, i.e. 'W W D L W', pack each into a form code and sum its
+    points, keeping the latest FORM_LENGTH results.
+    Returns:
+        pd.DataFrame with form_code and form_points, indexed as form.
+    """
+    results = form.fillna("").str.replace(" ", "", regex=False).str[-FORM_LENGTH:]
+    padded = "".join(results.str.pad(FORM_LENGTH, side="left"))
+    chars = np.frombuffer(padded.encode("ascii", "replace"), dtype=np.uint8).reshape(
+        -1, FORM_LENGTH
+    )
+    return pd.DataFrame(
+        {
+            "form_code": (_RESULT_CODES[chars] << _SHIFTS).sum(axis=1, dtype=np.uint16),
+            "form_points": _RESULT_POINTS[chars].sum(axis=1, dtype=np.int8),
+        },
+        index=form.index,
+    )
+
+
+def form_emoji(form_codes) -> np.ndarray:
+    """Given packed form codes, return each form as coloured circles."""
+    return FORM_EMOJI[np.asarray(form_codes, dtype=np.intp)]
+
+
+def line_gap(points: np.ndarray, places: int) -> np.ndarray:
+    """
+    Given points in rank order, return each team's gap to the line below rank `places`:
+    the points a team above it is clear of the first team below, and the points (zero or
+    fewer) a team below it is behind the last team above.
+    """
+    if not 0 < places < len(points):
+        return np.zeros(len(points), dtype=np.int16)
+    above = np.arange(len(points)) < places
+    return np.where(above, points - points[places], points - points[places - 1]).astype(
+        np.int16
+    )
+
+
+def previous_ranks(
+    competition_id: int, before: Optional[datetime.date] = None
+) -> Optional[pd.Series]:
+    """
+    Return the ranks of a competition's last snapshot taken before the date, today by
+    default, from the standings history.
+    Returns:
+        pd.Series of rank by squad, None if there is no earlier snapshot.
+    """
+    before = before or now().date()
+    try:
+        df = get_standings_history().query(
+            competition_id,
+            ["squad", "rank"],
+            until=before - datetime.timedelta(days=1),
+        )
+    except (OSError, pa.ArrowException) as error:
+        logging.getLogger(__name__).warning(f"Could not read standings: {error}")
+        return None
+    if df.empty:
+        return None
+    df = df[df["fetched_at"] == df["fetched_at"].max()]
+    return df.set_index("squad")["rank"]
+
+
+def league_stats(
+    table: pd.DataFrame,
+    competition_id: Optional[int] = None,
+    ranks_before: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """
+    Given an overall standings table, derive the stats of every team in the league.
+    Args:
+        table: overall standings table from `standings.parse_standings_table`.
+        competition_id: api.football-data.org ID of the competition, selecting its
+            play-off and relegation places from `configs.league_stats`.
+        ranks_before: rank by squad of an earlier snapshot, i.e. from `previous_ranks`,
+            to measure rank movement against.
+
+    Returns:
+        pd.DataFrame indexed by squad in rank order, with the columns of DTYPES.
+    """
+    table = table.sort_values("Rk", kind="stable")
+    stats = pd.DataFrame(
+        {name: table[column].to_numpy() for column, name in COLUMNS.items()},
+        index=pd.Index(table["Squad"].to_numpy(), name="squad"),
+    )
+    played = stats["played"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_game = np.where(played > 0, 1 / played, np.nan)
+        goals_against = stats["goals_against"].to_numpy(dtype=np.float64)
+        stats["points_per_game"] = stats["points"].to_numpy() * per_game
+        stats["goals_for_per_game"] = stats["goals_for"].to_numpy() * per_game
+        stats["goals_against_per_game"] = goals_against * per_game
+        stats["goal_ratio"] = np.where(
+            goals_against > 0, stats["goals_for"].to_numpy() / goals_against, np.nan
+        )
+    stats["form"] = table["Last 5"].fillna("").to_numpy()
+    form = encode_form(table["Last 5"])
+    stats["form_code"] = form["form_code"].to_numpy()
+    stats["form_points"] = form["form_points"].to_numpy()
+    points = stats["points"].to_numpy(dtype=np.int64)
+    stats["playoff_gap"] = line_gap(
+        points, playoff_places.get(competition_id, default_playoff_places)
+    )
+    stats["relegation_gap"] = line_gap(
+        points,
+        len(points) - relegation_places.get(competition_id, default_relegation_places),
+    )
+    if ranks_before is None:
+        stats["rank_change"] = pd.NA
+    else:
+        before = ranks_before.reindex(stats.index).to_numpy(dtype=np.float64)
+        stats["rank_change"] = before - stats["rank"].to_numpy()
+    stats["top_scorer"] = table["Top Team Scorer"].to_numpy()
+    return stats.astype(DTYPES)
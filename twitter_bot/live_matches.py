@@ -0,0 +1,323 @@
+"""
+Live match mode as part of the `twitter_bot` package, posting the result of each tracked
+fixture as soon as it is finished rather than at the next scheduled run.
+
+Each fixture is watched by its own asyncio task from shortly before kickoff. Polls are
+rare before kickoff and while the match is in play, frequent once full time is near, and
+stop when the match is finished. Watchers of the same competition share one request for
+all of its matches on the day, revalidated with a conditional GET. A finished match is
+synced into the fixture store, and its result and the league stats of each tracked team
+in it, read from the fbref tables as `opp_stats` tweets are, queued as tweets.
+
+`main.live_matches_sensor` launches a run watching the fixtures of each kickoff time from
+the season calendar's matchday slots. Every request is made through `get_client`, whose
+token bucket holds the football-data.org quota for every process. The watchers' own
+bucket of `live_requests_per_minute` only paces the requests of one run further, leaving
+the rest of the quota to the other jobs.
+"""
+import asyncio
+import datetime
+import functools
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests.exceptions
+
+from clock import now, unix_time
+from configs.fbref import league_urls
+from configs.live_matches import (
+    start_lead_minutes,
+    pre_kickoff_interval,
+    in_play_interval,
+    full_time_near_minutes,
+    full_time_interval,
+    max_match_minutes,
+    min_poll_age,
+    live_requests_per_minute,
+)
+from configs.teams import tracked_competitions, tracked_team_ids
+from fixture_store import get_fixture_store
+from football_data import TokenBucket, get_client
+from helpers import read_tracked_teams, send_tweet, sync_competition_matches
+from metrics import get_metrics
+from models import Fixture
+from season_calendar import parse_timestamp
+from standings import Tables
+from tweet_templates import render
+from tweets import opp_stats_tweet, team_stats
+
+FINISHED = {"FINISHED", "AWARDED"}
+# a match in one of these states will not finish today
+CALLED_OFF = {"POSTPONED", "CANCELLED", "SUSPENDED"}
+
+
+def poll_interval(
+    status: str, kickoff: datetime.datetime, at: datetime.datetime
+) -> Optional[float]:
+    """
+    Given a match's status and kickoff, return the seconds until it is polled again.
+    Returns:
+        float: seconds to wait, None once the match is finished or called off.
+    """
+    if status in FINISHED or status in CALLED_OFF:
+        return None
+    elapsed = (at - kickoff).total_seconds()
+    if elapsed >= max_match_minutes * 60:
+        return None
+    if elapsed < 0:
+        # wake at kickoff rather than up to an interval after it
+        return min(pre_kickoff_interval, -elapsed)
+    full_time_near = full_time_near_minutes * 60
+    if elapsed < full_time_near:
+        return min(in_play_interval, full_time_near - elapsed)
+    return full_time_interval
+
+
+def matchday_endpoint(match: dict) -> str:
+    """Endpoint of every match of the match's competition on the day it is played."""
+    day = match["utcDate"][:10]
+    return (
+        f"competitions/{match['competition']['id']}/matches"
+        f"?dateFrom={day}&dateTo={day}"
+    )
+
+
+async def fetch_revalidated(endpoint: str) -> dict:
+    """
+    GET a football-data.org endpoint through the shared client, revalidating any cached
+    response with a conditional request, without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with get_metrics().timer("football_data_call", endpoint="live/competitions/:id"):
+        response = await loop.run_in_executor(
+            None, functools.partial(get_client().get, endpoint, max_age=0)
+        )
+    return response.json()
+
+
+class MatchFeed:
+    """
+    Latest state of the matches being watched. Each competition's matches of a day are
+    fetched with one request, shared by every watcher of them for `max_age` seconds.
+    Args:
+        fetch: coroutine function returning the decoded JSON of an endpoint.
+        budget: token bucket every request of the feed takes a token from, before the
+            shared client's own, its clock in unix time.
+        sleep: coroutine function waiting a number of seconds.
+        clock: function returning the current unix time.
+        max_age: seconds a response is shared for.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[dict]] = fetch_revalidated,
+        budget: TokenBucket = None,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+        clock: Callable[[], float] = unix_time,
+        max_age: float = min_poll_age,
+    ):
+        self.fetch = fetch
+        self.budget = budget or TokenBucket(live_requests_per_minute, clock=clock)
+        self.sleep = sleep
+        self.clock = clock
+        self.max_age = max_age
+        self.requests = 0
+        self._responses: Dict[str, Tuple[float, Dict[int, dict]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _take_token(self):
+        while True:
+            wait = self.budget.take()
+            if not wait:
+                return
+            await self.sleep(wait)
+
+    async def latest(self, match: dict) -> dict:
+        """Return the latest state of a match, polling its competition if needed."""
+        endpoint = matchday_endpoint(match)
+        lock = self._locks.setdefault(endpoint, asyncio.Lock())
+        async with lock:
+            fetched = self._responses.get(endpoint)
+            if fetched is None or self.clock() - fetched[0] >= self.max_age:
+                await self._take_token()
+                body = await self.fetch(endpoint)
+                self.requests += 1
+                fetched = self._responses[endpoint] = (
+                    self.clock(),
+                    {m["id"]: m for m in body.get("matches", [])},
+                )
+        return fetched[1].get(match["id"], match)
+
+
+def post_full_time(match: dict, team_ids: Iterable[int] = None) -> List[int]:
+    """
+    Given a finished match, sync it into the fixture store, so the team's next fixture is
+    the one announced, and queue a tweet of the result, then one of the league stats of
+    each tracked team in the match, each recorded against its team.
+    Args:
+        match: match dictionary from api.football-data.org.
+        team_ids: IDs of the tracked teams, those of `configs.teams` by default.
+
+    Returns:
+        list of the IDs of the tweets queued, empty if the API has no score.
+    """
+    get_fixture_store().sync_matches([match])
+    score = (match.get("score") or {}).get("fullTime") or {}
+    if score.get("home") is None or score.get("away") is None:
+        return []
+    if team_ids is None:
+        teams = read_tracked_teams(tracked_competitions, tracked_team_ids)
+        team_ids = [team["team_id"] for team in teams]
+    team_ids = set(team_ids)
+    fix = Fixture.from_match(match)
+    tracked = [
+        team_id
+        for team_id in (fix.home_team_id, fix.away_team_id)
+        if team_id in team_ids
+    ]
+    queued = [
+        send_tweet(
+            render(
+                "full_time",
+                {
+                    "competition": fix.competition.name,
+                    "home": fix.home_team.display_name,
+                    "away": fix.away_team.display_name,
+                    "home_goals": score["home"],
+                    "away_goals": score["away"],
+                },
+            ),
+            tracked[0] if tracked else None,
+        )
+    ]
+    if tracked and fix.competition.id in league_urls:
+        try:
+            tables = Tables(league_urls[fix.competition.id])
+            for team_id in tracked:
+                queued.append(
+                    send_tweet(
+                        opp_stats_tweet(team_stats(fix, team_id, tables)), team_id
+                    )
+                )
+        except (requests.exceptions.RequestException, ValueError) as error:
+            # the result is queued, the stats are left to the next matchday preview
+            print(f"No league stats posted for match {fix.id}: {error}")
+    return [tweet_id for tweet_id in queued if tweet_id is not None]
+
+
+class LivePoller:
+    """
+    Watches fixtures until they are finished, calling on_finished with each finished match.
+    Args:
+        feed: MatchFeed the watchers share.
+        on_finished: function given a finished match, run in a worker thread.
+        sleep: coroutine function waiting a number of seconds.
+        clock: function returning the current time as an aware datetime.
+    """
+
+    def __init__(
+        self,
+        feed: MatchFeed = None,
+        on_finished: Callable[[dict], object] = post_full_time,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+        clock: Callable[[], datetime.datetime] = now,
+    ):
+        self.feed = feed or MatchFeed(sleep=sleep)
+        self.on_finished = on_finished
+        self.sleep = sleep
+        self.clock = clock
+
+    async def watch(self, match: dict) -> dict:
+        """
+        Watch a match from `start_lead_minutes` before kickoff until it is finished,
+        called off or has been going for `max_match_minutes`.
+        Returns:
+            dict of the match as last polled.
+        """
+        start = parse_timestamp(match["utcDate"]) - datetime.timedelta(
+            minutes=start_lead_minutes
+        )
+        wait = (start - self.clock()).total_seconds()
+        if wait > 0:
+            await self.sleep(wait)
+        while True:
+            match = await self.feed.latest(match)
+            # the kickoff is read again each poll, as a match can be moved on the day
+            interval = poll_interval(
+                match["status"], parse_timestamp(match["utcDate"]), self.clock()
+            )
+            if interval is None:
+                break
+            await self.sleep(interval)
+        get_metrics().inc("live_matches_total", status=match["status"])
+        if match["status"] in FINISHED:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.on_finished, match)
+        return match
+
+    async def run(self, matches: Iterable[dict]) -> List[dict]:
+        """Watch every match at the same time, returning each as last polled."""
+        return list(await asyncio.gather(*(self.watch(match) for match in matches)))
+
+
+def todays_matches(team_ids: Iterable[int], day: datetime.date = None) -> List[dict]:
+    """
+    Return the fixtures of team_ids kicking off on day, today in UTC by default, from the
+    fixture store. Fixtures already finished are left out.
+    """
+    day = day or now().date()
+    start = datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+    matches = get_fixture_store().fixtures_between(
+        start, start + datetime.timedelta(days=1), list(team_ids)
+    )
+    return [match for match in matches if match.get("status") not in FINISHED]
+
+
+def watch_kickoff(
+    kickoff: datetime.datetime,
+    competition_ids: List[int] = tracked_competitions,
+    team_ids: List[int] = tracked_team_ids,
+) -> List[dict]:
+    """
+    Watch the fixtures of the tracked teams kicking off at kickoff until every one is
+    finished, from the fixture store the season calendar is built from.
+    Returns:
+        list of the matches as last polled.
+    """
+    teams = read_tracked_teams(competition_ids, team_ids)
+    matches = get_fixture_store().fixtures_between(
+        kickoff,
+        kickoff + datetime.timedelta(seconds=1),
+        [team["team_id"] for team in teams],
+    )
+    matches = [match for match in matches if match.get("status") not in FINISHED]
+    on_finished = functools.partial(
+        post_full_time, team_ids=[team["team_id"] for team in teams]
+    )
+    return asyncio.run(LivePoller(on_finished=on_finished).run(matches))
+
+
+def watch_today(
+    competition_ids: List[int] = tracked_competitions,
+    team_ids: List[int] = tracked_team_ids,
+) -> List[dict]:
+    """
+    Watch today's fixtures of the tracked teams until every one is finished.
+    Returns:
+        list of the matches as last polled.
+    """
+    teams = read_tracked_teams(competition_ids, team_ids)
+    for comp_id in sorted({team["competition_id"] for team in teams}):
+        sync_competition_matches(comp_id)
+    team_ids = [team["team_id"] for team in teams]
+    on_finished = functools.partial(post_full_time, team_ids=team_ids)
+    return asyncio.run(
+        LivePoller(on_finished=on_finished).run(todays_matches(team_ids))
+    )
+
+
+if __name__ == "__main__":
+    for _match in watch_today():
+        print(
+            f"{_match['homeTeam']['name']} v {_match['awayTeam']['name']}: "
+            f"{_match['status']}"
+        )
@@ -2,10 +2,11 @@
 A module containing dagster ops and jobs used to schedule football tweets as part
 of the `twitter_bot` package.
 """
-from datetime import datetime
-from pathlib import Path
+import datetime
+import functools
+import inspect
+from typing import Optional
 
-import tweepy.errors
 from dagster import (
     op,
     repository,
@@ -16,25 +17,88 @@ from dagster import (
     asset,
     schedule,
     RunRequest,
+    DynamicOut,
+    DynamicOutput,
+    Field,
+    multiprocess_executor,
+    sensor,
+    SkipReason,
+    job,
 )
 
 from helpers import (
-    twitter_auth,
     get_next_fixture,
-    get_opposition_team,
-    format_tweet,
-    make_date_readable,
-    home_or_away,
-    write_latest_fixture_date,
-    make_ordinal,
-    is_tweet_too_long,
-    get_home_team_venue,
+    claim_fixture_announcement,
+    sync_competition_matches,
+    read_tracked_teams,
+    is_matchday,
+    send_tweet,
 )
+from fixture_store import get_fixture_store, utc_timestamp
 from standings import Tables
-from configs.fbref import championship_url, cron_schedule
+from charts import league_charts
+from tweets import next_fixture_date_tweet, opp_stats, opp_stats_tweet
+from configs.fbref import cron_schedule, league_urls
+from configs.football_data import team_catalog_cron_schedule
+from tweet_queue import get_tweet_queue, QueueDrainer
+from season_calendar import build_timetable, due_slots, parse_timestamp
+from live_matches import watch_kickoff
+from configs.season_calendar import sensor_interval, sync_interval
+from configs.live_matches import start_lead_minutes
+from configs.twitter import drain_sensor_interval
+from configs.teams import (
+    tracked_competitions,
+    tracked_team_ids,
+    max_concurrent_teams,
+)
+from metrics import measure_op
+from clock import now, unix_time
+from assets.create_assets import reference_data_assets, team_catalog_job
+from json_io_manager import json_io_manager
+
+
+def instrumented(fn):
+    """
+    Decorator for the compute function of an op or asset, placed under `@op`, that
+    records its wall time and attaches it, with the HTTP requests, bytes downloaded,
+    cache hits and rows parsed while it ran, to its outputs as metadata.
+    """
+    if inspect.isgeneratorfunction(fn):
+
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            with measure_op(fn.__name__) as metadata:
+                outputs = list(fn(*args, **kwargs))
+            for output in outputs:
+                if isinstance(output, DynamicOutput):
+                    yield DynamicOutput(
+                        output.value,
+                        output.mapping_key,
+                        output.output_name,
+                        metadata=metadata,
+                    )
+                else:
+                    yield Output(output.value, output.output_name, metadata=metadata)
+
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with measure_op(fn.__name__) as metadata:
+            value = fn(*args, **kwargs)
+        return Output(value, metadata=metadata)
+
+    # dagster only accepts an Output from a function annotated to return one
+    signature = inspect.signature(fn)
+    if signature.return_annotation is not inspect.Signature.empty:
+        wrapper.__signature__ = signature.replace(
+            return_annotation=Output[signature.return_annotation]
+        )
+    return wrapper
 
 
 @op(config_schema={"team_id": int})
+@instrumented
 def get_next_fixture_obj(context):
     print("Getting the next fixture object")
     fix = get_next_fixture(context.op_config["team_id"])
@@ -43,11 +107,12 @@ def get_next_fixture_obj(context):
 
 
 @asset
+@instrumented
 def get_latest_fixture_date():
-    path = Path().cwd() / "latest_fixture.txt"
-    with open(path, mode="r", encoding="utf-8") as file:
-        date = file.read()
-    return date
+    """
+    The UTC kickoff of the latest fixture announced for each team, from the fixture store.
+    """
+    return get_fixture_store().announced()
 
 
 @op(
@@ -56,19 +121,19 @@ def get_latest_fixture_date():
         "is_it_matchday_branch": Out(is_required=False),
     }
 )
-def is_fixture_date_updated(fix):
-    same_as_previous = fix.date.strftime(format="%d-%m-%y") == get_latest_fixture_date()
-    print(
-        f"Dates {fix.date.strftime(format='%d-%m-%y')} and {get_latest_fixture_date()} are the same: {same_as_previous}"
-    )
-    if same_as_previous:
-        yield Output(fix, "is_it_matchday_branch")
-    else:
-        write_latest_fixture_date(fix.date)
+@instrumented
+def is_fixture_date_updated(context, fix):
+    team_id = context.run_config["ops"]["get_next_fixture_obj"]["config"]["team_id"]
+    # announced by this run, not by an earlier or overlapping one
+    if claim_fixture_announcement(fix, team_id):
         yield Output(fix, "create_next_fixture_date_tweet_branch")
+    else:
+        print(f"Fixture on {utc_timestamp(fix.date)} already announced")
+        yield Output(fix, "is_it_matchday_branch")
 
 
 @op
+@instrumented
 def create_next_fixture_date_tweet(context, fix):
     """
     Dagster op that forms the first part of the job twitter_bot_graph.
@@ -82,20 +147,7 @@ def create_next_fixture_date_tweet(context, fix):
         A formatted, Twitter ready tweet
     """
     team_id = context.run_config["ops"]["get_next_fixture_obj"]["config"]["team_id"]
-    opp = get_opposition_team(fix, team_id)
-    h_a = home_or_away(fix, team_id)
-    location = get_home_team_venue(fix)
-    date_time = make_date_readable(fix.date)
-
-    pinpoint, calendar, clock = "\U0001F4CD", "\U0001F4C5", "\U000023F0"
-
-    tweet = (
-        f"The next match is {h_a} against {opp['name']}\n\n"
-        f"{pinpoint} {location}\n"
-        f"{calendar} {date_time[0]}\n"
-        f"{clock} {date_time[1]}"
-    )
-    return tweet
+    return next_fixture_date_tweet(fix, team_id)
 
 
 @op(
@@ -104,10 +156,11 @@ def create_next_fixture_date_tweet(context, fix):
         "do_nothing_branch": Out(is_required=False),
     }
 )
+@instrumented
 def is_it_matchday(fix):
     my_logger = get_dagster_logger()
     my_logger.info(f"The fixture object is: {fix}")
-    if True:  # fix.date.date() == datetime.today().date():
+    if is_matchday(fix):
         yield Output(fix, "league_match_branch")
     else:
         yield Output(fix, "do_nothing_branch")
@@ -119,70 +172,90 @@ def is_it_matchday(fix):
         "do_nothing_branch": Out(is_required=False),
     }
 )
+@instrumented
 def is_it_a_league_match(fix):
-    if fix.competition["type"] == "LEAGUE":
+    if fix.competition.type == "LEAGUE":
         yield Output(fix, "create_opp_stats_branch")
     else:
         yield Output(fix, "do_nothing_branch")
 
 
 @op
+@instrumented
 def create_opp_stats(context, fix):
     team_id = context.run_config["ops"]["get_next_fixture_obj"]["config"]["team_id"]
-    opp_name = get_opposition_team(fix, team_id)
-    my_tbl = Tables(
-        championship_url
-    )  # TODO remove hardcode. make a configuration when selecting league
-    stats = my_tbl.collect_stats(opp_name["name"])
-    stats["opposition"] = opp_name["shortName"]
-    stats["position"] = make_ordinal(stats["position"])
-    stats["competition"] = fix.competition["name"]
-    return stats
+    my_tbl = Tables(league_urls[fix.competition.id])
+    return opp_stats(fix, team_id, my_tbl)
 
 
 @op
+@instrumented
 def create_opp_stats_tweet(stats):
-    football = "\U000026BD"
-    tweet = (
-        f"{stats['opposition']} currently sit {stats['position']} in the {stats['competition']}.\n"
-        f"Having scored {stats['goals_for']} and conceded {stats['goals_against']} goals {football}\n\n"
-        f"Form: {stats['form_emoji']}\n"
-        f"Top Scorer(s): {stats['top_scorer']}\n"
-        f"W: {stats['wins']}, D: {stats['draws']},  L: {stats['loss']}\n"
-    )
-    while is_tweet_too_long(tweet):
-        tweet = "\n".join(tweet.split("\n")[:-1])
-    return tweet
+    return opp_stats_tweet(stats)
 
 
 @op
+@instrumented
 def do_nothing(fix):
     print("Today is neither match day or the day after a match day!")
     return None
 
 
 @op
-def post_tweet(tweet: str) -> None:
+@instrumented
+def post_tweet(context, tweet: str) -> Optional[int]:
     """
     Dagster op that forms the second part of the job twitter_bot_graph.
-    Given a tweet, posts to account using Twitter API v2 Client.
+    Given a tweet, adds it to the outbound tweet queue to be posted by
+    drain_tweet_queue_job.
     Args:
+        context: context contains dagster configuration for team_id
         tweet: Tweet to post
+
+    Returns:
+        ID of the queued tweet, None if the same tweet was already queued.
     """
-    client = twitter_auth()
-    tweet = format_tweet(tweet)
-    try:
-        client.create_tweet(text=tweet)
-    except tweepy.errors.Forbidden:
-        print("Not allowed to create a tweet with duplicate content")
-        pass
+    team_id = context.run_config["ops"]["get_next_fixture_obj"]["config"]["team_id"]
+    return send_tweet(tweet, team_id)
+
+
+@op
+@instrumented
+def drain_tweet_queue() -> dict:
+    """
+    Post the queued tweets of every account.
+    Returns:
+        dict of account to the number of tweets posted.
+    """
+    queue = get_tweet_queue()
+    queue.recover()
+    sent = QueueDrainer(queue).drain()
+    get_dagster_logger().info(f"Posted {sent}, queue: {queue.counts()}")
+    return sent
+
+
+@job
+def drain_tweet_queue_job():
+    drain_tweet_queue()
+
+
+@sensor(job=drain_tweet_queue_job, minimum_interval_seconds=drain_sensor_interval)
+def tweet_queue_sensor(_context):
+    """
+    Launch drain_tweet_queue_job whenever queued tweets are ready to be posted.
+    """
+    ready = get_tweet_queue().ready_count()
+    if not ready:
+        yield SkipReason("No queued tweets ready to post")
+        return
+    yield RunRequest(run_key=f"drain-{int(unix_time() // drain_sensor_interval)}")
 
 
 @graph
 def twitter_bot_graph():
     """
     Dagster graph to create_next_fixture_date_tweet and then post_tweet.
-    Graph scheduled to run 10 AM UTC daily.
+    Runs are launched by season_calendar_sensor at the slots of the team's season calendar.
     """
     next_fixture = get_next_fixture_obj()
     (
@@ -200,17 +273,276 @@ def twitter_bot_graph():
     do_nothing(do_nothing_branch)
 
 
+# fixtures are handed between steps as JSON rather than pickled
+twitter_bot_job = twitter_bot_graph.to_job(
+    resource_defs={"io_manager": json_io_manager}
+)
+
+
+def tracked_due_slots() -> tuple:
+    """
+    Sync the tracked competitions' fixtures, if older than `sync_interval`, and return
+    the season calendar of the tracked teams with the slots of it due now.
+    """
+    teams = read_tracked_teams(tracked_competitions, tracked_team_ids)
+    for comp_id in sorted({team["competition_id"] for team in teams}):
+        sync_competition_matches(comp_id, max_age=sync_interval)
+    timetable = build_timetable(
+        get_fixture_store(), [team["team_id"] for team in teams]
+    )
+    return timetable, due_slots(timetable, now())
+
+
+@sensor(job=twitter_bot_job, minimum_interval_seconds=sensor_interval)
+def season_calendar_sensor(_context):
+    """
+    Launch twitter_bot_graph for a tracked team only when a slot of its season calendar
+    is due: a fixture announcement, a matchday preview or a post-match slot.
+    The competitions' fixtures are re-synced every `sync_interval` so moved fixtures
+    move their slots.
+    """
+    timetable, slots = tracked_due_slots()
+    if not slots:
+        yield SkipReason(f"No slots due of {len(timetable)} in the season calendar")
+        return
+    for slot in slots:
+        yield RunRequest(
+            run_key=slot.key,
+            run_config={
+                "ops": {"get_next_fixture_obj": {"config": {"team_id": slot.team_id}}}
+            },
+            tags={"slot": slot.kind, "team_id": str(slot.team_id)},
+        )
+
+
+@op(config_schema={"kickoff": str})
+@instrumented
+def watch_live_matches(context) -> list:
+    """
+    Watch the tracked fixtures kicking off at the configured UTC timestamp until each is
+    finished, queueing its result at full time.
+    Returns:
+        list of dictionaries with the id and last status of each match watched.
+    """
+    matches = watch_kickoff(parse_timestamp(context.op_config["kickoff"]))
+    return [{"id": match["id"], "status": match["status"]} for match in matches]
+
+
+@job
+def live_matches_job():
+    watch_live_matches()
+
+
+@sensor(job=live_matches_job, minimum_interval_seconds=sensor_interval)
+def live_matches_sensor(_context):
+    """
+    Launch live_matches_job `start_lead_minutes` before the kickoff of a tracked team's
+    fixture, from the matchday preview slots of the season calendar. Fixtures kicking off
+    at the same time are watched by one run.
+    """
+    _, slots = tracked_due_slots()
+    start = now() + datetime.timedelta(minutes=start_lead_minutes)
+    kickoffs = sorted(
+        {
+            slot.kickoff
+            for slot in slots
+            if slot.kind == "preview" and slot.kickoff <= start
+        }
+    )
+    if not kickoffs:
+        yield SkipReason("No fixtures of the tracked teams about to kick off")
+        return
+    for kickoff in kickoffs:
+        yield RunRequest(
+            run_key=f"live-{utc_timestamp(kickoff)}",
+            run_config={
+                "ops": {
+                    "watch_live_matches": {
+                        "config": {"kickoff": utc_timestamp(kickoff)}
+                    }
+                }
+            },
+            tags={"slot": "live"},
+        )
+
+
+@op(
+    config_schema={
+        "competition_ids": Field([int], default_value=tracked_competitions),
+        "team_ids": Field([int], default_value=tracked_team_ids),
+    }
+)
+@instrumented
+def load_tracked_teams(context) -> list:
+    """
+    Read the teams to post for from `data/team_ids_{competition_id}.csv` for each
+    configured competition, optionally restricted to the configured team_ids.
+    Returns:
+        list of dictionaries with team_id, team_name and competition_id.
+    """
+    teams = read_tracked_teams(
+        context.op_config["competition_ids"], context.op_config["team_ids"]
+    )
+    get_dagster_logger().info(f"Tracking {len(teams)} teams")
+    return teams
+
+
+@op
+@instrumented
+def fetch_competition_matches(teams: list) -> dict:
+    """
+    Sync the season's matches once for every competition a tracked team plays in
+    into the fixture store.
+    Returns:
+        dict of competition_id to the counts of fixtures added, updated and rescheduled.
+    """
+    comp_ids = sorted({team["competition_id"] for team in teams})
+    return {comp_id: sync_competition_matches(comp_id) for comp_id in comp_ids}
+
+
+@op
+@instrumented
+def fetch_league_tables(teams: list) -> dict:
+    """
+    Fetch the fbref standings once for every league a tracked team plays in.
+    Returns:
+        dict of competition_id to Tables, for competitions with a configured fbref url.
+    """
+    comp_ids = sorted({team["competition_id"] for team in teams})
+    return {
+        comp_id: Tables(league_urls[comp_id])
+        for comp_id in comp_ids
+        if comp_id in league_urls
+    }
+
+
+@op(out=DynamicOut())
+@instrumented
+def fan_out_teams(teams: list):
+    for team in teams:
+        yield DynamicOutput(team, mapping_key=f"team_{team['team_id']}")
+
+
+@op
+@instrumented
+def run_team(team: dict, synced: dict, tables: dict) -> dict:
+    """
+    Run the steps of twitter_bot_graph for a single team using the synced competition
+    matches and shared league tables, so no fixture list or table is downloaded per team.
+    Returns:
+        dict of the team_id and the kinds of tweet posted.
+    """
+    team_id = team["team_id"]
+    posted = []
+    fix = get_next_fixture(team_id, team["competition_id"])
+    if fix is None:
+        return {"team_id": team_id, "posted": posted}
+
+    if claim_fixture_announcement(fix, team_id):
+        if send_tweet(next_fixture_date_tweet(fix, team_id), team_id) is not None:
+            posted.append("next_fixture_date")
+    elif is_matchday(fix) and fix.competition.type == "LEAGUE":
+        league_tables = tables.get(fix.competition.id)
+        if league_tables is not None:
+            tweet = opp_stats_tweet(opp_stats(fix, team_id, league_tables))
+            if send_tweet(tweet, team_id) is not None:
+                posted.append("opp_stats")
+    get_dagster_logger().info(f"Team {team_id} posted: {posted}")
+    return {"team_id": team_id, "posted": posted}
+
+
+@op
+@instrumented
+def render_league_charts(teams: list, tables: dict) -> dict:
+    """
+    Render the standings and form charts of every tracked team, once per league.
+    Charts of unchanged standings are served from the chart cache.
+    Returns:
+        dict of team_id to a dict of chart kind to the path of its PNG.
+    """
+    charts = {}
+    for comp_id, league_tables in tables.items():
+        squads = {
+            team["team_id"]: league_tables.find_team(team["team_name"])
+            for team in teams
+            if team["competition_id"] == comp_id
+        }
+        paths = league_charts(
+            league_tables, [squad for squad in squads.values() if squad is not None]
+        )
+        for team_id, squad in squads.items():
+            if squad is not None:
+                charts[team_id] = {
+                    kind: str(path) for kind, path in paths[squad].items()
+                }
+    return charts
+
+
+@op
+@instrumented
+def summarise_teams(results: list) -> dict:
+    return {result["team_id"]: result["posted"] for result in results}
+
+
+@graph
+def multi_team_graph():
+    """
+    Dagster graph running twitter_bot_graph's steps for every tracked team.
+    Competition matches and league tables are fetched once and shared by every team,
+    teams are then processed concurrently. Charts of the tracked teams are rendered from
+    the league tables alongside.
+    """
+    teams = load_tracked_teams()
+    synced = fetch_competition_matches(teams)
+    tables = fetch_league_tables(teams)
+    render_league_charts(teams, tables)
+    results = fan_out_teams(teams).map(lambda team: run_team(team, synced, tables))
+    summarise_teams(results.collect())
+
+
+multi_team_job = multi_team_graph.to_job(
+    executor_def=multiprocess_executor.configured(
+        {"max_concurrent": max_concurrent_teams}
+    ),
+    resource_defs={"io_manager": json_io_manager},
+)
+
+
 @schedule(
-    job=twitter_bot_graph,
+    job=multi_team_job,
     execution_timezone="Europe/London",
     cron_schedule=cron_schedule,
 )
-def twitter_bot_schedule():
+def multi_team_schedule(_context):
+    """
+    Run multi_team_job for the tracked teams with a slot of their season calendar due at
+    the scheduled time, skipping the run when no team has.
+    """
+    timetable, slots = tracked_due_slots()
+    if not slots:
+        return SkipReason(f"No slots due of {len(timetable)} in the season calendar")
+    team_ids = sorted({slot.team_id for slot in slots})
     return RunRequest(
-        run_config={"ops": {"get_next_fixture_obj": {"config": {"team_id": 328}}}}
+        run_config={"ops": {"load_tracked_teams": {"config": {"team_ids": team_ids}}}},
+        tags={"slots": ",".join(sorted({slot.kind for slot in slots}))},
     )
 
 
+@schedule(
+    job=team_catalog_job,
+    execution_timezone="Europe/London",
+    cron_schedule=team_catalog_cron_schedule,
+)
+def team_catalog_schedule(_context):
+    """Refresh the team catalog of every tracked competition each week."""
+    week = now().strftime("%G-W%V")
+    for comp_id in tracked_competitions:
+        yield RunRequest(
+            run_key=f"team-catalog-{comp_id}-{week}",
+            tags={"dagster/partition": str(comp_id)},
+        )
+
+
 @repository
 def next_fixture_repo():
     """
@@ -219,4 +551,17 @@ def next_fixture_repo():
     Returns:
         list of job object and ScheduleDefinition
     """
-    return [twitter_bot_schedule, twitter_bot_graph, get_latest_fixture_date]
+    return [
+        season_calendar_sensor,
+        twitter_bot_job,
+        live_matches_sensor,
+        live_matches_job,
+        tweet_queue_sensor,
+        drain_tweet_queue_job,
+        get_latest_fixture_date,
+        multi_team_schedule,
+        multi_team_job,
+        team_catalog_job,
+        team_catalog_schedule,
+        *reference_data_assets,
+    ]
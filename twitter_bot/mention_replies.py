@@ -0,0 +1,305 @@
+"""
+A long-running service replying to mentions of the account as part of the `twitter_bot`
+package, i.e. '@twitterclarets when do West Brom play next?'.
+
+Mentions are polled with a `since_id` cursor kept in `configs.paths.state_dir`, so each is
+answered once across restarts. The team a mention names is found with a `TeamNameIndex`
+over every tracked team, and its reply is read from an in-memory table of next fixtures
+that a background thread refreshes from the fixture store. Nothing is fetched while
+replying, so a burst of mentions on matchday is answered by one batch of replies, queued
+in a single transaction and posted through the same client the mentions were read with.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+import tweepy
+
+from clock import unix_time
+from configs.paths import state_dir
+from configs.teams import tracked_competitions, tracked_team_ids
+from configs.twitter import (
+    default_account,
+    backoff_base,
+    mention_poll_interval,
+    mentions_page_size,
+    fixture_refresh_interval,
+)
+from fixture_store import get_fixture_store
+from helpers import (
+    get_opposition_team,
+    home_or_away,
+    make_date_readable,
+    read_tracked_teams,
+    sync_competition_matches,
+)
+from metrics import get_metrics
+from models import Fixture
+from team_names import TeamNameIndex, load_team_aliases, normalise_team_name
+from tweet_queue import QueueDrainer, get_tweet_queue, rate_limit_delay
+from tweet_templates import render
+
+_log = logging.getLogger(__name__)
+
+
+def fixture_reply_values(match: dict, team_id: int) -> dict:
+    """
+    Given a match dictionary from the fixture store and team_id, return the values of a
+    `next_fixture_reply` about it, less the username.
+    """
+    fix = Fixture.from_match(match)
+    team = fix.home_team if fix.home_team_id == team_id else fix.away_team
+    opp = get_opposition_team(fix, team_id)
+    date_time = make_date_readable(fix.date)
+    return {
+        "team": team.display_name,
+        "opposition": opp.display_name,
+        "h_a": home_or_away(fix, team_id),
+        "date": date_time[0],
+        "time": date_time[1],
+        "competition": fix.competition.name,
+    }
+
+
+def tracked_team_aliases(team_names: Iterable[str]) -> Dict[str, str]:
+    """
+    Given football-data.org team names, return their fbref squad names from
+    `data/team_aliases.csv` as normalised aliases of them, i.e. 'west brom'.
+    """
+    by_key = {normalise_team_name(name): name for name in team_names}
+    return {
+        normalise_team_name(alias): by_key[key]
+        for key, alias in load_team_aliases().items()
+        if key in by_key
+    }
+
+
+class FixtureTable:
+    """
+    In-memory table of the next fixture of each tracked team, looked up by any text naming
+    the team. The table and its index are swapped in whole on each refresh, so lookups
+    never wait on a refresh.
+    Args:
+        teams: tracked teams, dictionaries with team_id, team_name and competition_id.
+        refresh_interval: seconds between refreshes by the background thread.
+    """
+
+    def __init__(
+        self, teams: List[dict], refresh_interval: float = fixture_refresh_interval
+    ):
+        self.teams = list(teams)
+        self.refresh_interval = refresh_interval
+        self._aliases = tracked_team_aliases(team["team_name"] for team in self.teams)
+        self._table: Tuple[TeamNameIndex, Dict[str, dict]] = (
+            TeamNameIndex([team["team_name"] for team in self.teams], self._aliases),
+            {},
+        )
+        self.refreshed_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> int:
+        """
+        Sync the tracked competitions' matches and rebuild the table from the fixture
+        store, adding each team's short name, i.e. 'QPR', to the index.
+        Returns:
+            int: number of teams with a next fixture.
+        """
+        for comp_id in sorted({team["competition_id"] for team in self.teams}):
+            sync_competition_matches(comp_id)
+        store = get_fixture_store()
+        fixtures, aliases = {}, dict(self._aliases)
+        for team in self.teams:
+            match = store.next_fixture(team["team_id"], team["competition_id"])
+            if match is None:
+                continue
+            values = fixture_reply_values(match, team["team_id"])
+            fixtures[team["team_name"]] = values
+            aliases.setdefault(normalise_team_name(values["team"]), team["team_name"])
+        index = TeamNameIndex([team["team_name"] for team in self.teams], aliases)
+        self._table = (index, fixtures)
+        self.refreshed_at = unix_time()
+        return len(fixtures)
+
+    def lookup(self, text: str) -> Optional[dict]:
+        """
+        Given text, i.e. a mention, return the next fixture of the team it names.
+        Returns:
+            dict of `next_fixture_reply` values, None if no single tracked team is
+            named or the team has no known fixture.
+        """
+        index, fixtures = self._table
+        team_name = index.search(text)
+        return None if team_name is None else fixtures.get(team_name)
+
+    def _refresh_forever(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except (requests.RequestException, OSError, ValueError) as error:
+                # keep answering from the last table until football-data.org is back
+                _log.warning(f"Could not refresh fixtures: {error}")
+
+    def start(self) -> "FixtureTable":
+        """Refresh the table now, then every refresh_interval seconds in the background."""
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class MentionReplier:
+    """
+    Replies to mentions of an account that name a tracked team with its next fixture.
+    Args:
+        table: FixtureTable the replies are read from.
+        drainer: QueueDrainer whose client for the account reads mentions and posts replies.
+        account: account whose mentions are answered.
+        cursor_path: file keeping the ID of the newest mention seen.
+    """
+
+    def __init__(
+        self,
+        table: FixtureTable,
+        drainer: QueueDrainer = None,
+        account: str = default_account,
+        cursor_path: Path = None,
+    ):
+        self.table = table
+        self.drainer = drainer or QueueDrainer(get_tweet_queue())
+        self.account = account
+        self.cursor_path = Path(cursor_path or state_dir / f"mentions_{account}.cursor")
+        self._user_id: Optional[int] = None
+
+    @property
+    def client(self) -> tweepy.Client:
+        return self.drainer.client(self.account)
+
+    @property
+    def user_id(self) -> int:
+        if self._user_id is None:
+            self._user_id = self.client.get_me(user_auth=True).data.id
+        return self._user_id
+
+    @property
+    def since_id(self) -> Optional[str]:
+        try:
+            return self.cursor_path.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _save_cursor(self, since_id: str):
+        self.cursor_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cursor_path.with_suffix(".tmp")
+        tmp.write_text(str(since_id), encoding="utf-8")
+        tmp.replace(self.cursor_path)
+
+    def fetch_mentions(self, since_id: Optional[str]) -> Tuple[list, dict, dict]:
+        """
+        Fetch every mention newer than since_id, a page at a time.
+        Returns:
+            the mentions, a dict of author ID to username and the first page's meta.
+        """
+        mentions, usernames, first_meta, token = [], {}, None, None
+        while True:
+            response = self.client.get_users_mentions(
+                self.user_id,
+                user_auth=True,
+                since_id=since_id,
+                max_results=mentions_page_size,
+                pagination_token=token,
+                expansions=["author_id"],
+                user_fields=["username"],
+            )
+            first_meta = first_meta or response.meta or {}
+            mentions += response.data or []
+            for user in (response.includes or {}).get("users", []):
+                usernames[user.id] = user.username
+            token = (response.meta or {}).get("next_token")
+            # without a cursor only the newest page is needed, to start one
+            if token is None or since_id is None:
+                return mentions, usernames, first_meta
+
+    def replies(self, mentions: list, usernames: dict) -> List[Tuple[str, str]]:
+        """
+        Given mentions and their authors' usernames, return (text, reply_to) of a reply to
+        each mention naming a tracked team, oldest mention first.
+        """
+        metrics = get_metrics()
+        replies = []
+        for mention in sorted(mentions, key=lambda m: int(m.id)):
+            if mention.author_id == self.user_id:
+                continue
+            values = self.table.lookup(mention.text)
+            username = usernames.get(mention.author_id)
+            if values is None or username is None:
+                metrics.inc("mentions_total", result="unanswered")
+                continue
+            reply = render("next_fixture_reply", dict(values, username=username))
+            replies.append((reply, str(mention.id)))
+            metrics.inc("mentions_total", result="answered")
+        return replies
+
+    def run_once(self) -> int:
+        """
+        Answer the mentions made since the last poll. The first poll of an account only
+        records where its mentions are up to, rather than answering old ones.
+        Returns:
+            int: number of replies posted.
+        """
+        since_id = self.since_id
+        with get_metrics().timer("mention_replies", account=self.account):
+            mentions, usernames, meta = self.fetch_mentions(since_id)
+            if since_id is None:
+                if meta.get("newest_id"):
+                    self._save_cursor(meta["newest_id"])
+                return 0
+            if not mentions:
+                return 0
+            queue = self.drainer.queue
+            queue.enqueue_many(self.replies(mentions, usernames), self.account)
+            # the replies are queued, so none are lost if posting is interrupted
+            self._save_cursor(max((mention.id for mention in mentions), key=int))
+            return self.drainer.drain_account(self.account, max_wait=0)
+
+    def run(
+        self,
+        stop: threading.Event = None,
+        poll_interval: float = mention_poll_interval,
+        clock: Callable[[], float] = unix_time,
+    ):
+        """Answer mentions every poll_interval seconds until stop is set."""
+        stop = stop or threading.Event()
+        self.table.start()
+        try:
+            while not stop.is_set():
+                wait = poll_interval
+                try:
+                    self.run_once()
+                except tweepy.errors.TooManyRequests as error:
+                    wait = rate_limit_delay(error, clock())
+                except (
+                    tweepy.errors.TwitterServerError,
+                    requests.ConnectionError,
+                ) as error:
+                    _log.warning(f"Could not read mentions: {error}")
+                    wait = max(poll_interval, backoff_base)
+                stop.wait(wait)
+        finally:
+            self.table.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    get_tweet_queue().recover()
+    _table = FixtureTable(read_tracked_teams(tracked_competitions, tracked_team_ids))
+    MentionReplier(_table).run()
@@ -0,0 +1,279 @@
+"""
+Run metrics as part of the `twitter_bot` package: wall time of ops and outbound calls,
+bytes downloaded, rows parsed and response cache hits.
+
+Each process records into an in-memory `Metrics` registry. `flush_metrics` adds what was
+recorded since the last flush to a SQLite file shared by every process (each Dagster step
+may run in its own process) and rewrites the Prometheus textfile read by node-exporter
+from it, so counters keep counting across runs and containers.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from configs.metrics import prefix, textfile
+from configs.paths import state_dir
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+COUNTER, GAUGE, SUMMARY = "counter", "gauge", "summary"
+
+# (name, labels) identifying a series, labels as a sorted tuple of pairs
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: dict) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters, gauges and timings recorded by a process.
+    `totals` holds everything recorded, `pending` what has not been flushed yet.
+    """
+
+    def __init__(self):
+        self.kinds: Dict[str, str] = {}
+        self.totals: Dict[Key, float] = defaultdict(float)
+        self.pending: Dict[Key, float] = defaultdict(float)
+        self.gauges: Dict[Key, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add value to the counter `name`."""
+        key = _key(name, labels)
+        with self._lock:
+            self.kinds.setdefault(name, COUNTER)
+            self.totals[key] += value
+            self.pending[key] += value
+
+    def set(self, name: str, value: float, **labels):
+        """Set the gauge `name` to value."""
+        key = _key(name, labels)
+        with self._lock:
+            self.kinds.setdefault(name, GAUGE)
+            self.gauges[key] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record a duration, exported as the `<name>_seconds` summary."""
+        base = f"{name}_seconds"
+        with self._lock:
+            self.kinds.setdefault(base, SUMMARY)
+            for suffix, value in (("sum", seconds), ("count", 1)):
+                key = _key(f"{base}_{suffix}", labels)
+                self.totals[key] += value
+                self.pending[key] += value
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Time the body of a with statement, see `observe`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def total(self, name: str, **labels) -> float:
+        """
+        Return the process total of a counter or timing series, summed over every
+        series of that name whose labels include `labels`.
+        """
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        with self._lock:
+            return sum(
+                value
+                for (series, series_labels), value in self.totals.items()
+                if series == name and wanted <= set(series_labels)
+            )
+
+    def take_pending(self):
+        """Return and reset what was recorded since the last call."""
+        with self._lock:
+            pending, self.pending = dict(self.pending), defaultdict(float)
+            return pending, dict(self.gauges), dict(self.kinds)
+
+
+class MetricsStore:
+    """
+    SQLite store of the metrics of every process.
+    Args:
+        path: location of the SQLite file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, counters: dict, gauges: dict, kinds: dict):
+        """Add counter increments and overwrite gauges."""
+        now = time.time()
+
+        def kind(name):
+            base = name.rsplit("_", 1)[0]
+            return kinds.get(name) or kinds.get(base, COUNTER)
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO series (name, labels, kind, value, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (name, labels) DO UPDATE SET "
+                "value = value + excluded.value, updated_at = excluded.updated_at",
+                [
+                    (name, json.dumps(labels), kind(name), value, now)
+                    for (name, labels), value in counters.items()
+                ],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO series (name, labels, kind, value, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (name, json.dumps(labels), GAUGE, value, now)
+                    for (name, labels), value in gauges.items()
+                ],
+            )
+
+    def series(self):
+        """Return every series as (name, labels, kind, value), ordered by name."""
+        with self._lock:
+            return [
+                (name, tuple(map(tuple, json.loads(labels))), kind, value)
+                for name, labels, kind, value in self._conn.execute(
+                    "SELECT name, labels, kind, value FROM series ORDER BY name, labels"
+                )
+            ]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def to_textfile(series) -> str:
+    """
+    Given (name, labels, kind, value) series, return them in the Prometheus text
+    exposition format.
+    """
+    lines, typed = [], set()
+    for name, labels, kind, value in series:
+        base = name.rsplit("_", 1)[0] if kind == SUMMARY else name
+        if base not in typed:
+            typed.add(base)
+            lines.append(f"# TYPE {prefix}_{base} {kind}")
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        if label_text:
+            label_text = f"{{{label_text}}}"
+        lines.append(f"{prefix}_{name}{label_text} {value:.17g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(series, path: Path = textfile):
+    """Write series to path for the node-exporter textfile collector, atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(to_textfile(series), encoding="utf-8")
+    tmp.replace(path)
+
+
+_default_metrics = Metrics()
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide Metrics registry."""
+    return _default_metrics
+
+
+def get_metrics_store() -> MetricsStore:
+    """
+    Return the process-wide MetricsStore, creating it in `configs.paths.state_dir` on
+    first use.
+    """
+    global _default_store  # pylint: disable=global-statement
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = MetricsStore(state_dir / "metrics.sqlite")
+        return _default_store
+
+
+def flush_metrics(path: Optional[Path] = None):
+    """
+    Add what this process recorded since the last flush to the shared store and rewrite
+    the Prometheus textfile, `configs.metrics.textfile` by default. Failing to export
+    metrics is logged rather than raised.
+    """
+    try:
+        store = get_metrics_store()
+        store.add(*get_metrics().take_pending())
+        write_textfile(store.series(), path or textfile)
+    except (OSError, sqlite3.Error) as error:
+        logging.getLogger(__name__).warning(f"Could not export metrics: {error}")
+
+
+# metadata attached to an op's outputs, as the series (and labels) each is the total of
+OP_METADATA = {
+    "http_requests": ("http_request_seconds_count", {}),
+    "http_seconds": ("http_request_seconds_sum", {}),
+    "bytes_downloaded": ("http_downloaded_bytes_total", {}),
+    "cache_hits": ("cache_requests_total", {"result": "hit"}),
+    "cache_misses": ("cache_requests_total", {"result": "miss"}),
+    "cache_revalidated": ("cache_requests_total", {"result": "revalidated"}),
+    "football_data_seconds": ("football_data_call_seconds_sum", {}),
+    "rows_parsed": ("standings_rows_parsed_total", {}),
+    "tweets_queued": ("tweet_enqueue_seconds_count", {}),
+}
+
+
+def _op_totals(metrics: Metrics) -> Dict[str, float]:
+    return {
+        key: metrics.total(name, **labels)
+        for key, (name, labels) in OP_METADATA.items()
+    }
+
+
+@contextmanager
+def measure_op(name: str) -> Iterator[dict]:
+    """
+    Time the op `name` run in the body of a with statement and flush the metrics after.
+    Yields a dict that is filled, on leaving the block, with the op's wall time and
+    its non-zero `OP_METADATA` totals.
+    """
+    metrics = get_metrics()
+    before = _op_totals(metrics)
+    metadata = {}
+    start = time.perf_counter()
+    try:
+        yield metadata
+    except Exception:
+        metrics.inc("op_failures_total", op=name)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe("op", seconds, op=name)
+        metadata["wall_time_seconds"] = round(seconds, 4)
+        for key, total in _op_totals(metrics).items():
+            change = total - before[key]
+            if change:
+                metadata[key] = int(change) if change.is_integer() else round(change, 4)
+        flush_metrics()
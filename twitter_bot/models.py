@@ -0,0 +1,134 @@
+"""
+Compact, immutable models of the fixtures passed between the ops of the `twitter_bot`
+package.
+
+A `Fixture` is built once from a football-data.org match dictionary, with its kickoff
+converted to UK time as it is loaded, and holds its teams and competition as models too.
+Being named tuples they have no per-instance `__dict__`, can not be changed once built,
+and round trip through a small JSON form, see `Fixture.to_json`.
+"""
+import datetime
+from typing import NamedTuple, Optional
+
+import pytz
+
+UK = pytz.timezone("Europe/London")
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class Team(NamedTuple):
+    """A team as football-data.org names it, i.e. short_name 'Burnley', tla 'BUR'."""
+
+    id: int
+    name: str
+    short_name: Optional[str] = None
+    tla: Optional[str] = None
+
+    @classmethod
+    def from_api(cls, team: dict) -> "Team":
+        return cls(team["id"], team["name"], team.get("shortName"), team.get("tla"))
+
+    @property
+    def display_name(self) -> str:
+        """Short name of the team, its full name if it has none."""
+        return self.short_name or self.name
+
+
+class Competition(NamedTuple):
+    """A competition, type is 'LEAGUE' or 'CUP'."""
+
+    id: int
+    name: str
+    code: Optional[str] = None
+    type: Optional[str] = None
+
+    @classmethod
+    def from_api(cls, competition: dict) -> "Competition":
+        return cls(
+            competition["id"],
+            competition["name"],
+            competition.get("code"),
+            competition.get("type"),
+        )
+
+
+class Fixture(NamedTuple):
+    """
+    A fixture between two teams.
+    Args:
+        id: match ID value according to api.football-data.org.
+        date: kickoff, an aware datetime in UK time.
+        status: i.e. 'SCHEDULED', 'TIMED' or 'FINISHED'.
+        matchday: round of the competition the fixture is in.
+        competition: Competition the fixture is played in.
+        home_team: Team playing at home.
+        away_team: Team playing away.
+    """
+
+    id: int
+    date: datetime.datetime
+    status: str
+    matchday: Optional[int]
+    competition: Competition
+    home_team: Team
+    away_team: Team
+
+    @classmethod
+    def from_match(cls, match: dict) -> "Fixture":
+        """Given a match dictionary from api.football-data.org, return its Fixture."""
+        kickoff = datetime.datetime.strptime(match["utcDate"], TIMESTAMP_FORMAT)
+        return cls(
+            match["id"],
+            UK.fromutc(kickoff),
+            match.get("status"),
+            match.get("matchday"),
+            Competition.from_api(match["competition"]),
+            Team.from_api(match["homeTeam"]),
+            Team.from_api(match["awayTeam"]),
+        )
+
+    @property
+    def home_team_id(self) -> int:
+        return self.home_team.id
+
+    @property
+    def away_team_id(self) -> int:
+        return self.away_team.id
+
+    @property
+    def home_team_name(self) -> str:
+        return self.home_team.name
+
+    @property
+    def away_team_name(self) -> str:
+        return self.away_team.name
+
+    def to_json(self) -> list:
+        """
+        Return the fixture as a compact, JSON serialisable array, its kickoff as a UTC
+        timestamp and its teams and competition as nested arrays.
+        """
+        kickoff = self.date.astimezone(datetime.timezone.utc)
+        return [
+            self.id,
+            kickoff.strftime(TIMESTAMP_FORMAT),
+            self.status,
+            self.matchday,
+            list(self.competition),
+            list(self.home_team),
+            list(self.away_team),
+        ]
+
+    @classmethod
+    def from_json(cls, value: list) -> "Fixture":
+        """Given the array from `to_json`, return the Fixture."""
+        fixture_id, kickoff, status, matchday, competition, home, away = value
+        return cls(
+            fixture_id,
+            UK.fromutc(datetime.datetime.strptime(kickoff, TIMESTAMP_FORMAT)),
+            status,
+            matchday,
+            Competition(*competition),
+            Team(*home),
+            Team(*away),
+        )
@@ -1,13 +1,39 @@
-# deletes all tweets from account
-import traceback
+"""
+Deletes every tweet from an account.
+
+The timeline is first exported to a compact JSONL archive, one tweet per line, then the
+IDs are streamed from the archive to a bounded pool of workers that delete them. Workers
+pause together when Twitter answers with a rate limit, until the reset time it sends.
+Every deleted ID is appended to a checkpoint file, so an interrupted export or deletion
+carries on where it stopped when the script is run again. Tweets posted since the archive
+was exported are added to it before deleting.
+
+    python delete_all.py --dry-run        # export the timeline only
+    python delete_all.py --workers 8      # export, then delete
+"""
+import argparse
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, Optional, Set
 
 import tweepy
 
-from configs import keys
+ARCHIVE = Path("timeline.jsonl")
+CHECKPOINT = Path("deleted_ids.txt")
+WORKERS = 4
+MAX_ATTEMPTS = 5
+# seconds to wait after a 429 that does not say when the limit resets
+DEFAULT_PAUSE = 60
 
 
 def oauth_login():
     """Authenticate with twitter using OAuth"""
+    from configs import keys  # pylint: disable=import-outside-toplevel
+
     consumer_key = keys.CONSUMER_API_KEY
     consumer_secret = keys.CONSUMER_API_KEY_SECRET
 
@@ -22,23 +48,263 @@ def oauth_login():
     return tweepy.API(auth)
 
 
-def batch_delete(api):
-    print(
-        "You are about to delete all tweets from the account @%s."
-        % api.verify_credentials().screen_name
-    )
-    print("Does this sound ok? There is no undo! Type yes to carry out this action.")
-    do_delete = input("> ")
-    if do_delete.lower() == "yes":
-        for status in tweepy.Cursor(api.user_timeline).items():
+def _last_id(path: Path) -> Optional[int]:
+    last = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)["id"]
+    return last
+
+
+def _first_id(path: Path) -> Optional[int]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                return json.loads(line)["id"]
+    return None
+
+
+def _write_status(f, status):
+    record = {
+        "id": status.id,
+        "created_at": status._json.get("created_at"),
+        "text": status._json.get("full_text", status._json.get("text")),
+    }
+    f.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False))
+    f.write("\n")
+
+
+def export_timeline(api, archive: Path = ARCHIVE) -> int:
+    """
+    Write every tweet of the account's timeline to archive as JSONL, newest first.
+    The archive is written to a .part file renamed once the timeline is complete, and an
+    interrupted export continues from the oldest tweet it reached.
+    Args:
+        api: authenticated tweepy.API.
+        archive: path of the JSONL archive.
+
+    Returns:
+        int: number of tweets exported by this call.
+    """
+    partial = archive.with_name(archive.name + ".part")
+    kwargs = {"count": 200, "trim_user": True, "tweet_mode": "extended"}
+    if partial.exists():
+        last_id = _last_id(partial)
+        if last_id is not None:
+            kwargs["max_id"] = last_id - 1
+    exported = 0
+    with open(partial, "a", encoding="utf-8") as f:
+        for status in tweepy.Cursor(api.user_timeline, **kwargs).items():
+            _write_status(f, status)
+            exported += 1
+    partial.replace(archive)
+    return exported
+
+
+def update_timeline(api, archive: Path = ARCHIVE) -> int:
+    """
+    Add the tweets posted since an archive was exported to its start, keeping it newest
+    first. The archive is replaced only once the new tweets are written.
+    Args:
+        api: authenticated tweepy.API.
+        archive: path of the JSONL archive.
+
+    Returns:
+        int: number of tweets added.
+    """
+    updated = archive.with_name(archive.name + ".new")
+    kwargs = {"count": 200, "trim_user": True, "tweet_mode": "extended"}
+    newest = _first_id(archive)
+    if newest is not None:
+        kwargs["since_id"] = newest
+    added = 0
+    with open(updated, "w", encoding="utf-8") as f:
+        for status in tweepy.Cursor(api.user_timeline, **kwargs).items():
+            _write_status(f, status)
+            added += 1
+        with open(archive, encoding="utf-8") as exported:
+            shutil.copyfileobj(exported, f)
+    updated.replace(archive)
+    return added
+
+
+def archived_ids(archive: Path = ARCHIVE) -> Iterator[int]:
+    """Stream the tweet IDs in an archive without loading it into memory."""
+    with open(archive, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)["id"]
+
+
+class Checkpoint:
+    """Append-only file of the IDs already deleted."""
+
+    def __init__(self, path: Path = CHECKPOINT):
+        self.path = Path(path)
+        self.done: Set[int] = set()
+        if self.path.exists():
+            self.done = {int(line) for line in self.path.read_text().split()}
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def add(self, status_id: int):
+        with self._lock:
+            self.done.add(status_id)
+            self._file.write(f"{status_id}\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class RateGate:
+    """Shared pause, so every worker waits once one of them hits the rate limit."""
+
+    def __init__(self, clock=time.time, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                wait = self.resume_at - self.clock()
+            if wait <= 0:
+                return
+            self.sleep(wait)
+
+    def pause_until(self, resume_at: float):
+        with self._lock:
+            self.resume_at = max(self.resume_at, resume_at)
+
+
+def delete_status(api, status_id: int, gate: RateGate) -> bool:
+    """
+    Delete a tweet, waiting out rate limits and retrying server errors up to
+    MAX_ATTEMPTS times. Waits for a rate limit to reset are not counted as attempts.
+    Returns:
+        bool: True if the tweet is gone, including tweets that were already deleted.
+    """
+    attempts = 0
+    while attempts < MAX_ATTEMPTS:
+        gate.wait()
+        try:
+            api.destroy_status(status_id)
+            return True
+        except tweepy.errors.NotFound:
+            return True
+        except tweepy.errors.TooManyRequests as error:
             try:
-                api.destroy_status(status.id)
-                print("Deleted:", status.id)
-            except Exception:
-                traceback.print_exc()
-                print("Failed to delete:", status.id)
+                reset = float(error.response.headers["x-rate-limit-reset"])
+            except (AttributeError, KeyError, TypeError, ValueError):
+                reset = gate.clock() + DEFAULT_PAUSE
+            gate.pause_until(reset + 1)
+            continue
+        except tweepy.errors.TwitterServerError:
+            pass
+        except tweepy.errors.HTTPException:
+            # i.e. Forbidden, trying again would not help
+            return False
+        except tweepy.errors.TweepyException:
+            # connection errors are raised by tweepy.API as TweepyException
+            pass
+        attempts += 1
+        gate.sleep(1)
+    return False
+
+
+def delete_statuses(
+    api,
+    status_ids: Iterator[int],
+    checkpoint: Checkpoint,
+    workers: int = WORKERS,
+    gate: Optional[RateGate] = None,
+) -> dict:
+    """
+    Delete tweets through a pool of `workers` threads, skipping those in the checkpoint.
+    At most twice as many IDs as workers are read ahead of the deletions.
+    Returns:
+        dict with the number of tweets deleted, skipped and failed.
+    Raises:
+        the first error of a worker, i.e. OSError writing the checkpoint.
+    """
+    gate = gate or RateGate()
+    counts = {"deleted": 0, "skipped": 0, "failed": 0}
+
+    def work(status_id) -> str:
+        if not delete_status(api, status_id, gate):
+            print("Failed to delete:", status_id)
+            return "failed"
+        checkpoint.add(status_id)
+        return "deleted"
+
+    def count(futures):
+        for future in futures:
+            counts[future.result()] += 1
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for status_id in status_ids:
+            if status_id in checkpoint.done:
+                counts["skipped"] += 1
+                continue
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                count(done)
+            pending.add(pool.submit(work, status_id))
+        count(wait(pending).done)
+    return counts
+
+
+def batch_delete(
+    api,
+    archive: Path = ARCHIVE,
+    checkpoint_path: Path = CHECKPOINT,
+    workers: int = WORKERS,
+    dry_run: bool = False,
+    confirm: bool = True,
+):
+    screen_name = api.verify_credentials().screen_name
+    if archive.exists():
+        added = update_timeline(api, archive)
+        print(f"Added {added} tweets posted since the export to {archive}")
+    else:
+        print(f"Exported {export_timeline(api, archive)} tweets to {archive}")
+    if dry_run:
+        return
+    if confirm:
+        print("You are about to delete all tweets from the account @%s." % screen_name)
+        print(
+            "Does this sound ok? There is no undo! Type yes to carry out this action."
+        )
+        if input("> ").lower() != "yes":
+            return
+    checkpoint = Checkpoint(checkpoint_path)
+    try:
+        print(delete_statuses(api, archived_ids(archive), checkpoint, workers))
+    finally:
+        checkpoint.close()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--archive", type=Path, default=ARCHIVE)
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="export the timeline without deleting"
+    )
+    parser.add_argument("--yes", action="store_true", help="skip the confirmation")
+    args = parser.parse_args()
+
     api = oauth_login()
-    batch_delete(api)
+    batch_delete(
+        api,
+        archive=args.archive,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        dry_run=args.dry_run,
+        confirm=not args.yes,
+    )
@@ -0,0 +1,118 @@
+"""
+A season calendar of when each tracked team has something to post, built from the fixture
+store, as part of the `twitter_bot` package.
+
+Each fixture gets three kinds of slot:
+    - announcement: the fixture is announced, for the first fixture known for a team and
+      whenever a fixture is rescheduled.
+    - preview: on matchday, before kickoff, the opposition's stats are posted.
+    - post_match: after full time, when the next fixture becomes the one to announce.
+
+Runs are launched only at these slots rather than polling every day. As the timetable is
+built from the store, a moved fixture moves its slots on the next build.
+"""
+import datetime
+from typing import Iterable, List, NamedTuple
+
+from configs.season_calendar import (
+    preview_lead_minutes,
+    full_time_minutes,
+    announcement_lead_days,
+    catch_up_minutes,
+)
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class Slot(NamedTuple):
+    kind: str
+    team_id: int
+    fixture_id: int
+    kickoff: datetime.datetime
+    due: datetime.datetime
+    expires: datetime.datetime
+
+    @property
+    def key(self) -> str:
+        """Unique key of the slot, changes when the fixture is moved."""
+        return (
+            f"{self.kind}-{self.team_id}-{self.fixture_id}-"
+            f"{self.kickoff.strftime(TIMESTAMP_FORMAT)}"
+        )
+
+
+def parse_timestamp(timestamp: str) -> datetime.datetime:
+    return datetime.datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(
+        tzinfo=datetime.timezone.utc
+    )
+
+
+def fixture_slots(
+    team_id: int,
+    fixture_id: int,
+    kickoff: datetime.datetime,
+    announce_at: datetime.datetime = None,
+) -> List[Slot]:
+    """
+    Return the slots of a single fixture, with an announcement slot if announce_at is given.
+    Announcements and previews can run until kickoff, post-match slots until they
+    have been missed for longer than `catch_up_minutes`.
+    """
+    full_time = kickoff + datetime.timedelta(minutes=full_time_minutes)
+    slots = [
+        Slot(
+            "preview",
+            team_id,
+            fixture_id,
+            kickoff,
+            kickoff - datetime.timedelta(minutes=preview_lead_minutes),
+            kickoff,
+        ),
+        Slot(
+            "post_match",
+            team_id,
+            fixture_id,
+            kickoff,
+            full_time,
+            full_time + datetime.timedelta(minutes=catch_up_minutes),
+        ),
+    ]
+    if announce_at is not None:
+        slots.insert(
+            0, Slot("announcement", team_id, fixture_id, kickoff, announce_at, kickoff)
+        )
+    return slots
+
+
+def team_timetable(store, team_id: int) -> List[Slot]:
+    """
+    Given a FixtureStore and team_id, return every slot of the team's season in due order.
+    """
+    changes = {
+        change["fixture_id"]: parse_timestamp(change["detected_at"])
+        for change in store.fixture_changes(team_id=team_id)
+    }
+    slots = []
+    for i, fixture in enumerate(store.team_fixtures(team_id)):
+        kickoff = parse_timestamp(fixture["kickoff"])
+        announce_at = changes.get(fixture["fixture_id"])
+        if i == 0:
+            announce_at = kickoff - datetime.timedelta(days=announcement_lead_days)
+        slots += fixture_slots(team_id, fixture["fixture_id"], kickoff, announce_at)
+    return sorted(slots, key=lambda slot: slot.due)
+
+
+def build_timetable(store, team_ids: Iterable[int]) -> List[Slot]:
+    """
+    Given a FixtureStore and the tracked team_ids, return the slots of every team in due order.
+    """
+    slots = [slot for team_id in team_ids for slot in team_timetable(store, team_id)]
+    return sorted(slots, key=lambda slot: slot.due)
+
+
+def due_slots(slots: Iterable[Slot], now: datetime.datetime) -> List[Slot]:
+    """
+    Return the slots that are due and have not expired at `now`.
+    Slots are identified by `Slot.key`, so a slot returned again is not run twice.
+    """
+    return [slot for slot in slots if slot.due <= now < slot.expires]
@@ -1,10 +1,41 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-from configs.fbref import championship_url
+from configs.fbref import base_url, championship_url, league_urls
+import html as html_entities
 import re
+import threading
+from itertools import zip_longest
 from pathlib import Path
 from functools import partialmethod
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from http_cache import cached_get
+from league_stats import RESULT_EMOJI, form_emoji, league_stats, previous_ranks
+from metrics import get_metrics
+from standings_history import record_snapshot
+from team_names import TeamNameIndex, load_team_aliases
+
+try:
+    import lxml  # noqa: F401 pylint: disable=unused-import
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+OVERALL_TABLE_ID = re.compile("(results).*(overall)")  # results2022-2023101_overall
+# tables of a competition page by name, fbref puts the season in most table IDs
+PAGE_TABLES = {
+    "overall": OVERALL_TABLE_ID,
+    "home_away": re.compile("(results).*(home_away)"),  # results2022-2023101_home_away
+    "squad_standard": re.compile("stats_squads_standard_for"),
+}
+# columns fbref can leave blank, kept nullable even when every value is present
+NULLABLE_COLUMNS = {"Attendance"}
+TABLE_START = re.compile(r"<table\b[^>]*?\bid=\"([^\"]+)\"")
+TABLE_END = "</table>"
+SQUAD_LINK = re.compile(r'<a href="(/en/squads/[^"]+)">([^<]+)</a>')
+FORM_EMOJI_TABLE = str.maketrans(RESULT_EMOJI)
 
 
 def write_df_to_csv(df: pd.DataFrame, name: str):
@@ -12,29 +43,286 @@ def write_df_to_csv(df: pd.DataFrame, name: str):
     df.to_csv(path, header=True, index=False)
 
 
+def index_tables(html: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Given the html of an fbref page, return where each table starts and ends by its id,
+    without building a tree. fbref sends every table after the first inside an html
+    comment, which a tree builder would skip, so the text itself is scanned.
+    Args:
+        html: str: html of an fbref page.
+
+    Returns:
+        dict of table id to the (start, end) offsets of the table in html.
+    """
+    spans = {}
+    for match in TABLE_START.finditer(html):
+        end = html.find(TABLE_END, match.end())
+        if end != -1:
+            spans.setdefault(match.group(1), (match.start(), end + len(TABLE_END)))
+    return spans
+
+
+def column_names(table) -> List[str]:
+    """
+    Given a table element, return the names of its columns. Columns under an over header
+    are prefixed with it, i.e. 'Home MP' and 'Away MP' of the home/away table.
+    """
+    head = table.find("thead") or table
+    groups = []
+    over_header = head.find("tr", class_="over_header")
+    if over_header is not None:
+        for th in over_header.find_all("th"):
+            groups += [th.text.strip()] * int(th.get("colspan", 1))
+    names = [th.text for th in head.find_all("th", {"scope": "col"})]
+    return [
+        f"{group} {name}" if group else name
+        for group, name in zip_longest(groups[: len(names)], names, fillvalue="")
+    ]
+
+
+def parse_table(html: str) -> pd.DataFrame:
+    """
+    Given the html of a single fbref table, parse it into a DataFrame with typed columns.
+    All rows are collected before the DataFrame is built once.
+    Args:
+        html: str: html of the table, i.e. from `FbrefPage.table_html`.
+
+    Returns:
+        pd.DataFrame: the table, one row per row of its body.
+    """
+    table = BeautifulSoup(html, HTML_PARSER).find("table")
+    if table is None:
+        raise ValueError("No table found in html.")
+    body = table.find("tbody") or table
+    rows = [
+        [row.th.text if row.th else str(n)] + [i.text for i in row.find_all("td")]
+        for n, row in enumerate(body.find_all("tr", recursive=False), start=1)
+        if row.find("td")
+    ]
+    return coerce_table_dtypes(pd.DataFrame(rows, columns=column_names(table)))
+
+
+def coerce_table_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Given a table of strings, convert each column whose values are all numbers.
+    Thousands separators are removed and fbref's minus sign read, so 'Attendance' and 'GD'
+    become ints. Columns with a decimal point become floats, int columns with missing
+    values, or in `NULLABLE_COLUMNS`, the nullable Int64, and the remaining columns
+    stripped strings.
+    Args:
+        df: pd.DataFrame: table as scraped.
+
+    Returns:
+        pd.DataFrame: the same table with typed columns.
+    """
+    for col in df.columns:
+        values = df[col].str.strip()
+        present = values.ne("")
+        numbers = pd.to_numeric(
+            values.str.replace(",", "", regex=False)
+            .str.replace("\u2212", "-", regex=False)
+            .where(present),
+            errors="coerce",
+        )
+        if not present.any() or numbers.notna().sum() != present.sum():
+            df[col] = values
+        elif values.str.contains(".", regex=False).any():
+            df[col] = numbers.astype("float64")
+        else:
+            nullable = col in NULLABLE_COLUMNS or not present.all()
+            df[col] = numbers.astype("Int64" if nullable else "int64")
+    return df
+
+
+class FbrefPage:
+    """
+    An fbref page downloaded once, with its tables, including those sent inside html
+    comments, located by id up front and each parsed into a typed DataFrame only when
+    first used. Home/away or squad stats then cost no extra request.
+    Args:
+        html: html of the page.
+        url: where the page was downloaded from.
+    """
+
+    def __init__(self, html: str, url: str = None):
+        self.html = html
+        self.url = url
+        self.spans = index_tables(html)
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # locks can not be pickled, i.e. when passed between processes by dagster
+        return {k: v for k, v in self.__dict__.items() if k != "_lock"}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fetch(cls, url: str) -> "FbrefPage":
+        """Download a page through the shared response cache."""
+        return cls(cached_get(url, source="fbref").text, url)
+
+    @property
+    def table_ids(self) -> List[str]:
+        return list(self.spans)
+
+    def find_table_id(self, table: Union[str, re.Pattern]) -> Optional[str]:
+        """
+        Given a table's name in `PAGE_TABLES`, a pattern or an id, return the id of the
+        first table of the page it matches, None if there is none.
+        """
+        pattern = PAGE_TABLES.get(table, table)
+        if isinstance(pattern, str):
+            return pattern if pattern in self.spans else None
+        return next((i for i in self.spans if pattern.search(i)), None)
+
+    def table_html(self, table: Union[str, re.Pattern]) -> str:
+        table_id = self.find_table_id(table)
+        if table_id is None:
+            raise ValueError(f"No {table} table found in {self.url or 'page'}.")
+        start, end = self.spans[table_id]
+        return self.html[start:end]
+
+    def table(self, table: Union[str, re.Pattern]) -> pd.DataFrame:
+        """
+        Given a table's name in `PAGE_TABLES`, a pattern or an id, return it as a typed
+        DataFrame, parsing it the first time it is asked for.
+        Raises:
+            ValueError: if the page has no such table.
+        """
+        table_html = self.table_html(table)
+        table_id = self.find_table_id(table)
+        with self._lock:
+            if table_id not in self._tables:
+                name = table if isinstance(table, str) else table_id
+                metrics = get_metrics()
+                with metrics.timer("standings_parse", table=name):
+                    df = parse_table(table_html)
+                metrics.inc("standings_rows_parsed_total", len(df), table=name)
+                self._tables[table_id] = df
+            return self._tables[table_id]
+
+    def squad_urls(self, table: Union[str, re.Pattern] = "overall") -> Dict[str, str]:
+        """
+        Given a table of the page, return the fbref page of each squad it links to.
+        Returns:
+            dict of squad name to url, i.e. 'Burnley' to '.../en/squads/943e8050/...'.
+        """
+        return {
+            html_entities.unescape(name): urljoin(self.url or base_url, href)
+            for href, name in SQUAD_LINK.findall(self.table_html(table))
+        }
+
+    def parsed(self) -> List[str]:
+        """Return the ids of the tables parsed so far."""
+        with self._lock:
+            return list(self._tables)
+
+
+def parse_standings_table(html: str) -> pd.DataFrame:
+    """
+    Given the html of an fbref competition page, parse the overall standings table
+    into a DataFrame with typed columns. Only the standings table is parsed.
+    Args:
+        html: str: html of an fbref competition page.
+
+    Returns:
+        pd.DataFrame: overall standings table, one row per team.
+    """
+    try:
+        return FbrefPage(html).table("overall")
+    except ValueError as error:
+        raise ValueError("No overall standings table found in page.") from error
+
+
 class Tables:
-    def __init__(self, url):
+    """
+    Standings of an fbref competition page, snapshotted into the standings history.
+    Args:
+        url: fbref competition page.
+        competition_id: api.football-data.org ID of the competition, looked up from
+            `configs.fbref.league_urls` if not given. Tables of competitions without an
+            ID are not snapshotted.
+    """
+
+    def __init__(self, url, competition_id: int = None):
         self.url = url
+        if competition_id is None:
+            competition_id = {v: k for k, v in league_urls.items()}.get(url)
+        self.competition_id = competition_id
+        self.page = FbrefPage(cached_get(self.url, source="fbref").text, self.url)
         self.overall_standings_table = self.get_overall_standings_table()
+        if competition_id is not None:
+            record_snapshot(self.overall_standings_table, competition_id)
+        self.team_index = TeamNameIndex(
+            self.overall_standings_table["Squad"], load_team_aliases()
+        )
+        self._rows_by_squad = self.overall_standings_table.set_index(
+            "Squad", drop=False
+        )
+        self._league_stats: Optional[pd.DataFrame] = None
+        self._league_stats_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if k != "_league_stats_lock"}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._league_stats_lock = threading.Lock()
 
     def get_overall_standings_table(self):
-        r = requests.get(self.url)
-        soup = BeautifulSoup(r.text, "html.parser")
-        table = soup.find(
-            "table", {"id": re.compile("(results).*(overall)")}
-        )  # results2022-2023101_overall
-        headers = []
-        for i in table.find_all("th", {"scope": "col"}):
-            headers.append(i.text)
-
-        df = pd.DataFrame(columns=headers)
-
-        for row in table.find_all("tr")[1:]:
-            length = len(df)
-            row_text = [str(length + 1)] + [i.text for i in row.find_all("td")]
-            df.loc[len(df)] = row_text
-        df["Squad"] = df["Squad"].str.strip()
-        return df
+        return self.page.table("overall")
+
+    @property
+    def league_stats(self) -> pd.DataFrame:
+        """
+        Stats derived from the overall standings of the whole league, computed on first
+        use, with rank movement since the last snapshot before today.
+        """
+        with self._league_stats_lock:
+            if self._league_stats is None:
+                ranks_before = None
+                if self.competition_id is not None:
+                    ranks_before = previous_ranks(self.competition_id)
+                self._league_stats = league_stats(
+                    self.overall_standings_table, self.competition_id, ranks_before
+                )
+            return self._league_stats
+
+    @property
+    def home_away_table(self) -> pd.DataFrame:
+        """Home and away split of the standings, parsed from the page on first use."""
+        return self.page.table("home_away")
+
+    @property
+    def squad_stats_table(self) -> pd.DataFrame:
+        """Squad standard stats, parsed from the page on first use."""
+        return self.page.table("squad_standard")
+
+    def get_team_home_away(self, team_name: str, side: str) -> dict:
+        """
+        Given a team_name and side, 'Home' or 'Away', return the team's record there.
+        Returns:
+            dict with played, wins, draws, loss, goals_for, goals_against and points.
+        """
+        squad = self.find_team(team_name)
+        table = self.home_away_table
+        rows = table.loc[table["Squad"] == squad]
+        if squad is None or rows.empty:
+            raise ValueError(f"{team_name} not found in {self.url}")
+        row = rows.iloc[0]
+        columns = {
+            "played": "MP",
+            "wins": "W",
+            "draws": "D",
+            "loss": "L",
+            "goals_for": "GF",
+            "goals_against": "GA",
+            "points": "Pts",
+        }
+        return {key: row[f"{side} {column}"] for key, column in columns.items()}
 
     def find_team(self, team_name):
         """
@@ -43,22 +331,21 @@ class Tables:
         Returns:
             str: Name of team in table
         """
-        search_name = ""
-        for sub_name in team_name.split():
-            search_name += " " + sub_name
-            search_name = search_name.lstrip()
-            contains = self.overall_standings_table["Squad"].str.contains(search_name)
-            matches = contains.sum()
-            if matches == 1:
-                return self.overall_standings_table[contains]["Squad"].item()
-            if matches > 1:
-                continue
-        return None
+        return self.team_index.resolve(team_name)
+
+    def get_team_row(self, team_name: str) -> pd.Series:
+        """
+        Given a team_name, return its row of the overall_standings_table.
+        Raises:
+            ValueError: if the team can not be found in the table.
+        """
+        squad = self.find_team(team_name)
+        if squad is None:
+            raise ValueError(f"{team_name} not found in {self.url}")
+        return self._rows_by_squad.loc[squad]
 
     def _get_team_stat(self, team_name: str, stat: str):
-        team_name = self.find_team(team_name)
-        tbl = self.overall_standings_table
-        return tbl.loc[tbl["Squad"] == f"{team_name}"][f"{stat}"].item()
+        return self.get_team_row(team_name)[stat]
 
     get_team_form = partialmethod(_get_team_stat, stat="Last 5")
     get_team_position = partialmethod(_get_team_stat, stat="Rk")
@@ -74,25 +361,32 @@ class Tables:
 
     @staticmethod
     def form_to_emoji(form: str):
-        win = "\U0001F7E2"
-        draw = "\U0001F7E1"
-        loss = "\U0001F534"
-        form = form.replace("W", win).replace("D", draw).replace("L", loss)
-        return form
+        return form.translate(FORM_EMOJI_TABLE)
 
     def runner_get_form_emoji(self, team_name):
         return self.form_to_emoji(self.get_team_form(team_name))
 
     def collect_stats(self, team_name: str):
+        squad = self.find_team(team_name)
+        if squad is None:
+            raise ValueError(f"{team_name} not found in {self.url}")
+        row = self.league_stats.loc[squad]
+        rank_change = row["rank_change"]
         return {
-            "position": self.get_team_position(team_name),
-            "wins": self.get_team_wins(team_name),
-            "draws": self.get_team_draws(team_name),
-            "loss": self.get_team_loss(team_name),
-            "goals_for": self.get_team_goals_for(team_name),
-            "goals_against": self.get_team_goals_against(team_name),
-            "form_emoji": self.runner_get_form_emoji(team_name),
-            "top_scorer": self.get_team_top_scorer(team_name),
+            "position": int(row["rank"]),
+            "wins": int(row["wins"]),
+            "draws": int(row["draws"]),
+            "loss": int(row["losses"]),
+            "goals_for": int(row["goals_for"]),
+            "goals_against": int(row["goals_against"]),
+            "points": int(row["points"]),
+            "points_per_game": float(row["points_per_game"]),
+            "form_points": int(row["form_points"]),
+            "form_emoji": form_emoji([row["form_code"]])[0],
+            "playoff_gap": int(row["playoff_gap"]),
+            "relegation_gap": int(row["relegation_gap"]),
+            "rank_change": None if pd.isna(rank_change) else int(rank_change),
+            "top_scorer": row["top_scorer"],
         }
 
 
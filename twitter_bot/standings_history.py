@@ -0,0 +1,252 @@
+"""
+An append-only, columnar history of league standings as part of the `twitter_bot` package.
+
+Every standings table fetched by `standings.Tables` is written as a Parquet snapshot,
+partitioned by competition and date::
+
+    <history_dir>/competition_id=2016/snapshot_date=2022-10-29/<fetched_at>.parquet
+
+Reads go through a memory-mapped Arrow dataset that only touches the partitions and
+columns a query asks for, so a team's trajectory over a season can be read without
+scraping again or loading whole tables.
+"""
+import datetime
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from clock import now
+from configs.paths import history_dir
+
+# fbref column, history column and Arrow type of each standings column kept
+COLUMNS = [
+    ("Rk", "rank", pa.int16()),
+    ("Squad", "squad", pa.string()),
+    ("MP", "played", pa.int16()),
+    ("W", "wins", pa.int16()),
+    ("D", "draws", pa.int16()),
+    ("L", "losses", pa.int16()),
+    ("GF", "goals_for", pa.int16()),
+    ("GA", "goals_against", pa.int16()),
+    ("GD", "goal_difference", pa.int16()),
+    ("Pts", "points", pa.int16()),
+    ("Pts/MP", "points_per_match", pa.float32()),
+    ("Last 5", "form", pa.string()),
+    ("Attendance", "attendance", pa.int32()),
+    ("Top Team Scorer", "top_scorer", pa.string()),
+]
+
+SCHEMA = pa.schema(
+    [(name, arrow_type) for _, name, arrow_type in COLUMNS]
+    + [("fetched_at", pa.timestamp("s", tz="UTC"))]
+)
+PARTITIONING = ds.partitioning(
+    pa.schema([("competition_id", pa.int32()), ("snapshot_date", pa.date32())]),
+    flavor="hive",
+)
+_HASH_KEY = b"twitter_bot.content_hash"
+
+
+def to_history_table(df: pd.DataFrame, fetched_at: datetime.datetime) -> pa.Table:
+    """
+    Given a standings table from `standings.parse_standings_table`, return it as an Arrow
+    table with the history schema. Columns the page did not have are left null.
+    """
+    arrays = []
+    for source, name, arrow_type in COLUMNS:
+        if source in df:
+            values = df[source]
+            if pd.api.types.is_integer_dtype(values.dtype):
+                values = values.astype("Int64")
+            arrays.append(pa.array(values, type=arrow_type, from_pandas=True))
+        else:
+            arrays.append(pa.nulls(len(df), type=arrow_type))
+    arrays.append(pa.array([fetched_at] * len(df), type=pa.timestamp("s", tz="UTC")))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def content_hash(table: pa.Table) -> str:
+    """Hash of a snapshot's standings, ignoring when it was fetched."""
+    digest = hashlib.sha256()
+    for batch in table.drop(["fetched_at"]).to_batches():
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        digest.update(sink.getvalue())
+    return digest.hexdigest()
+
+
+class StandingsHistory:
+    """
+    Parquet store of standings snapshots.
+    Args:
+        root: directory of the store.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._filesystem = fs.LocalFileSystem(use_mmap=True)
+        self._lock = threading.Lock()
+
+    def _partition(self, competition_id: int, date: datetime.date) -> Path:
+        return (
+            self.root
+            / f"competition_id={competition_id}"
+            / f"snapshot_date={date.isoformat()}"
+        )
+
+    def _last_hash(self, competition_id: int) -> Optional[bytes]:
+        partitions = sorted(self.root.glob(f"competition_id={competition_id}/*"))
+        files = sorted(partitions[-1].glob("*.parquet")) if partitions else []
+        if not files:
+            return None
+        metadata = pq.read_schema(files[-1]).metadata or {}
+        return metadata.get(_HASH_KEY)
+
+    def snapshot(
+        self,
+        df: pd.DataFrame,
+        competition_id: int,
+        fetched_at: Optional[datetime.datetime] = None,
+    ) -> Optional[Path]:
+        """
+        Append a standings table to the history, unless it is unchanged since the
+        competition's last snapshot.
+        Args:
+            df: standings table from `standings.parse_standings_table`.
+            competition_id: competition ID value according to api.football-data.org.
+            fetched_at: when the table was fetched, defaults to now.
+
+        Returns:
+            Path of the file written, None if the standings had not changed.
+        """
+        fetched_at = fetched_at or now()
+        table = to_history_table(df, fetched_at)
+        digest = content_hash(table).encode()
+        with self._lock:
+            if self._last_hash(competition_id) == digest:
+                return None
+            partition = self._partition(competition_id, fetched_at.date())
+            partition.mkdir(parents=True, exist_ok=True)
+            path = partition / f"{fetched_at.strftime('%Y%m%dT%H%M%S')}.parquet"
+            table = table.replace_schema_metadata({_HASH_KEY: digest})
+            tmp = path.with_suffix(".parquet.tmp")
+            pq.write_table(table, tmp, compression="zstd")
+            tmp.replace(path)
+        return path
+
+    def dataset(self) -> ds.Dataset:
+        """Return the whole history as a memory-mapped Arrow dataset."""
+        return ds.dataset(
+            str(self.root),
+            schema=pa.unify_schemas([SCHEMA, PARTITIONING.schema]),
+            format="parquet",
+            partitioning=PARTITIONING,
+            filesystem=self._filesystem,
+        )
+
+    def query(
+        self,
+        competition_id: int,
+        columns: Iterable[str],
+        squad: Optional[str] = None,
+        since: Optional[datetime.date] = None,
+        until: Optional[datetime.date] = None,
+    ) -> pd.DataFrame:
+        """
+        Read only the given columns of a competition's snapshots, pruning partitions by
+        date and rows by squad before anything is loaded.
+        Returns:
+            pd.DataFrame with snapshot_date, fetched_at and the columns asked for.
+        """
+        condition = ds.field("competition_id") == competition_id
+        if squad is not None:
+            condition &= ds.field("squad") == squad
+        if since is not None:
+            condition &= ds.field("snapshot_date") >= since
+        if until is not None:
+            condition &= ds.field("snapshot_date") <= until
+        if not any(self.root.glob(f"competition_id={competition_id}/*/*.parquet")):
+            return pd.DataFrame(columns=["snapshot_date", "fetched_at", *columns])
+        table = self.dataset().to_table(
+            columns=["snapshot_date", "fetched_at", *columns], filter=condition
+        )
+        return table.to_pandas().sort_values("fetched_at", ignore_index=True)
+
+    def team_trajectory(
+        self,
+        competition_id: int,
+        squad: str,
+        columns: Iterable[str] = ("rank", "points", "form"),
+        since: Optional[datetime.date] = None,
+        until: Optional[datetime.date] = None,
+    ) -> pd.DataFrame:
+        """
+        Given a competition and the squad name as it appears on fbref, return the squad's
+        standings over time, the last snapshot of each day.
+        Args:
+            competition_id: competition ID value according to api.football-data.org.
+            squad: fbref squad name, i.e. from `Tables.find_team`.
+            columns: history columns to read, i.e. rank, points or form.
+            since: first snapshot date to include.
+            until: last snapshot date to include.
+
+        Returns:
+            pd.DataFrame indexed by snapshot_date.
+        """
+        df = self.query(competition_id, list(columns), squad, since, until)
+        return (
+            df.drop_duplicates("snapshot_date", keep="last")
+            .set_index("snapshot_date")
+            .drop(columns="fetched_at")
+        )
+
+    def table_on(self, competition_id: int, date: datetime.date) -> pd.DataFrame:
+        """Return a competition's standings as last snapshotted on date, in rank order."""
+        df = self.query(
+            competition_id,
+            [name for _, name, _ in COLUMNS],
+            since=date,
+            until=date,
+        )
+        if df.empty:
+            return df
+        df = df[df["fetched_at"] == df["fetched_at"].max()]
+        return df.sort_values("rank", ignore_index=True)
+
+
+_default_history = None
+_default_history_lock = threading.Lock()
+
+
+def get_standings_history() -> StandingsHistory:
+    """
+    Return the process-wide StandingsHistory, creating it in `configs.paths.history_dir`
+    on first use.
+    """
+    global _default_history  # pylint: disable=global-statement
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = StandingsHistory(history_dir)
+        return _default_history
+
+
+def record_snapshot(df: pd.DataFrame, competition_id: int) -> Optional[Path]:
+    """
+    Append a fetched standings table to the shared history. A history that can not be
+    written is logged rather than failing the fetch.
+    """
+    try:
+        return get_standings_history().snapshot(df, competition_id)
+    except (OSError, pa.ArrowException) as error:
+        logging.getLogger(__name__).warning(f"Could not record standings: {error}")
+        return None
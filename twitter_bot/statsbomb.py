@@ -0,0 +1,229 @@
+"""
+Match stats from StatsBomb event data as part of the `twitter_bot` package.
+
+Event files in the StatsBomb open data format, a JSON array of events per match, are read
+from a local directory with an incremental decoder that holds one chunk and one event at
+a time rather than a whole match. Each team's shots, shots on target, goals, xG, passes and
+time in possession are added up as the events stream past into a compact `MatchSummary`.
+A season's files are summarised by a pool of processes, one per core.
+
+From `twitter_bot/`::
+
+    python statsbomb.py data/statsbomb/events
+"""
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import pandas as pd
+
+from configs.statsbomb import (
+    events_dir,
+    matches_dir,
+    summaries_path,
+    read_chunk_size,
+    ingest_workers,
+    min_pool_files,
+)
+from metrics import get_metrics
+
+# shot outcomes that were on target
+ON_TARGET = {"Goal", "Saved", "Saved To Post"}
+_WHITESPACE = " \t\r\n"
+
+
+class TeamMatchStats(NamedTuple):
+    """A team's totals in a match, possession as a percentage of the time in possession."""
+
+    team_id: int
+    team: str
+    goals: int
+    shots: int
+    shots_on_target: int
+    xg: float
+    passes: int
+    passes_completed: int
+    possession: float
+
+
+class MatchSummary(NamedTuple):
+    """
+    Totals of each team in a match, in the order the teams first appear in its events.
+    Which team was at home is given by the matches files, see `load_home_teams`.
+    """
+
+    match_id: int
+    events: int
+    teams: Tuple[TeamMatchStats, ...]
+
+
+def iter_events(path: Path, chunk_size: int = read_chunk_size) -> Iterator[dict]:
+    """
+    Given a StatsBomb event file, yield its events one at a time, reading chunk_size
+    characters at a time.
+    Raises:
+        ValueError: if the file is not a JSON array of objects.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, mode="r", encoding="utf-8") as events_file:
+        buffer, pos, started = "", 0, False
+        while True:
+            chunk = events_file.read(chunk_size)
+            buffer, pos = buffer[pos:] + chunk, 0
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos == len(buffer):
+                    break
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{path} is not a JSON array")
+                    started, pos = True, pos + 1
+                elif buffer[pos] == ",":
+                    pos += 1
+                elif buffer[pos] == "]":
+                    return
+                else:
+                    try:
+                        event, pos = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError as error:
+                        if not chunk:
+                            raise ValueError(f"Malformed event in {path}") from error
+                        # the event runs on past the buffer, so read the next chunk
+                        break
+                    yield event
+            if not chunk:
+                raise ValueError(f"{path} ended before its array was closed")
+
+
+class _Totals:
+    __slots__ = ("team", "goals", "shots", "on_target", "xg", "passes", "completed")
+
+    def __init__(self, team: str):
+        self.team = team
+        self.goals = self.shots = self.on_target = self.passes = self.completed = 0
+        self.xg = 0.0
+
+
+def summarise_match(path) -> MatchSummary:
+    """
+    Given the event file of a match, named by its match ID, add up each team's totals
+    as its events are read.
+    """
+    path = Path(path)
+    totals: Dict[int, _Totals] = {}
+    in_possession: Dict[int, float] = {}
+    events = 0
+    for event in iter_events(path):
+        events += 1
+        team = event.get("team")
+        if team is None:
+            continue
+        team_totals = totals.get(team["id"])
+        if team_totals is None:
+            team_totals = totals[team["id"]] = _Totals(team["name"])
+        kind = event["type"]["name"]
+        if kind == "Shot":
+            shot = event.get("shot", {})
+            outcome = shot.get("outcome", {}).get("name")
+            team_totals.shots += 1
+            team_totals.on_target += outcome in ON_TARGET
+            team_totals.goals += outcome == "Goal"
+            team_totals.xg += shot.get("statsbomb_xg") or 0.0
+        elif kind == "Pass":
+            team_totals.passes += 1
+            # StatsBomb only gives an outcome to passes that were not completed
+            team_totals.completed += "outcome" not in event.get("pass", {})
+        elif kind == "Own Goal For":
+            team_totals.goals += 1
+        possession_team = event.get("possession_team")
+        if possession_team is not None:
+            in_possession[possession_team["id"]] = in_possession.get(
+                possession_team["id"], 0.0
+            ) + (event.get("duration") or 0.0)
+    total_time = sum(in_possession.values()) or 1.0
+    return MatchSummary(
+        int(path.stem),
+        events,
+        tuple(
+            TeamMatchStats(
+                team_id,
+                t.team,
+                t.goals,
+                t.shots,
+                t.on_target,
+                round(t.xg, 2),
+                t.passes,
+                t.completed,
+                round(100 * in_possession.get(team_id, 0.0) / total_time, 1),
+            )
+            for team_id, t in totals.items()
+        ),
+    )
+
+
+def load_home_teams(directory: Path = None) -> Dict[int, int]:
+    """
+    Given a directory of StatsBomb matches files, `configs.statsbomb.matches_dir` by
+    default, return the home team ID of each match ID, empty if there are none.
+    """
+    home_teams = {}
+    for path in sorted((directory or matches_dir).glob("**/*.json")):
+        with open(path, mode="r", encoding="utf-8") as matches_file:
+            for match in json.load(matches_file):
+                home_teams[int(match["match_id"])] = int(
+                    match["home_team"]["home_team_id"]
+                )
+    return home_teams
+
+
+def ingest_events(
+    directory: Path = None, workers: int = ingest_workers
+) -> List[MatchSummary]:
+    """
+    Summarise every event file in directory, `configs.statsbomb.events_dir` by default,
+    by a pool of `workers` processes.
+    Returns:
+        list of MatchSummary, in match ID order.
+    """
+    paths = sorted((directory or events_dir).glob("*.json"))
+    metrics = get_metrics()
+    with metrics.timer("statsbomb_ingest"):
+        if len(paths) < min_pool_files or workers <= 1:
+            summaries = [summarise_match(path) for path in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(paths) // (workers * 4))
+                summaries = list(
+                    pool.map(summarise_match, map(str, paths), chunksize=chunksize)
+                )
+    metrics.inc("statsbomb_matches_total", len(summaries))
+    metrics.inc("statsbomb_events_total", sum(s.events for s in summaries))
+    return sorted(summaries, key=lambda summary: summary.match_id)
+
+
+def summaries_frame(summaries: List[MatchSummary]) -> pd.DataFrame:
+    """Given match summaries, return one row per team per match."""
+    return pd.DataFrame(
+        [
+            {"match_id": summary.match_id, **team._asdict()}
+            for summary in summaries
+            for team in summary.teams
+        ],
+        columns=["match_id", *TeamMatchStats._fields],
+    )
+
+
+def write_summaries(summaries: List[MatchSummary], path: Path = None) -> Path:
+    """Write match summaries as a csv, `configs.statsbomb.summaries_path` by default."""
+    path = Path(path or summaries_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    summaries_frame(summaries).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    _summaries = ingest_events(Path(sys.argv[1]) if len(sys.argv) > 1 else None)
+    print(f"Summarised {len(_summaries)} matches to {write_summaries(_summaries)}")
@@ -0,0 +1,135 @@
+"""
+A catalog of team metadata as part of the `twitter_bot` package: the venue, names and
+fbref squad of every team in the competitions catalogued.
+
+The catalog is written to `team_catalog_{competition_id}.csv` in
+`configs.paths.catalog_dir` by the `write_team_catalog` asset each week, from the team
+lists the reference data assets fetch. It is read into a map by team ID, and read again
+when a catalog file changes, so a tweet needs no API call for a team's venue or short
+name.
+"""
+import csv
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from configs.paths import catalog_dir
+from models import Team
+
+ALIAS_SEPARATOR = "|"
+
+
+class CatalogTeam(NamedTuple):
+    """A team of the catalog, a row of its csv."""
+
+    team_id: int
+    team_name: str
+    short_name: str
+    tla: str
+    venue: str
+    competition_id: int
+    fbref_squad: str
+    aliases: Tuple[str, ...]
+    fbref_url: str
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> "CatalogTeam":
+        return cls(
+            int(row["team_id"]),
+            row["team_name"],
+            row["short_name"],
+            row["tla"],
+            row["venue"],
+            int(row["competition_id"]),
+            row["fbref_squad"],
+            tuple(alias for alias in row["aliases"].split(ALIAS_SEPARATOR) if alias),
+            row["fbref_url"],
+        )
+
+    def to_row(self) -> Dict[str, object]:
+        return dict(self._asdict(), aliases=ALIAS_SEPARATOR.join(self.aliases))
+
+
+CATALOG_FIELDS = list(CatalogTeam._fields)
+
+
+def catalog_path(competition_id: int, directory: Path = None) -> Path:
+    return (directory or catalog_dir) / f"team_catalog_{competition_id}.csv"
+
+
+class TeamCatalog:
+    """
+    Map of team ID to CatalogTeam.
+    Args:
+        teams: teams of the catalog.
+    """
+
+    def __init__(self, teams: Iterable[CatalogTeam] = ()):
+        self._teams = {team.team_id: team for team in teams}
+
+    @classmethod
+    def load(cls, directory: Path = None) -> "TeamCatalog":
+        """
+        Read every `team_catalog_*.csv` in directory, `configs.paths.catalog_dir` by
+        default.
+        """
+        teams = []
+        for path in sorted((directory or catalog_dir).glob("team_catalog_*.csv")):
+            with open(path, mode="r", encoding="utf-8") as csv_file:
+                teams += [CatalogTeam.from_row(row) for row in csv.DictReader(csv_file)]
+        return cls(teams)
+
+    def __len__(self) -> int:
+        return len(self._teams)
+
+    def get(self, team_id: int) -> Optional[CatalogTeam]:
+        return self._teams.get(team_id)
+
+    def venue(self, team_id: int) -> Optional[str]:
+        """Return a team's venue, None if the team or its venue is not catalogued."""
+        team = self._teams.get(team_id)
+        return None if team is None else team.venue or None
+
+    def complete(self, team: Team) -> Team:
+        """Given a Team of a fixture, fill in the short name and tla it arrived without."""
+        known = self._teams.get(team.id)
+        if known is None:
+            return team
+        return team._replace(
+            short_name=team.short_name or known.short_name or None,
+            tla=team.tla or known.tla or None,
+        )
+
+
+def catalog_files(directory: Path = None) -> Tuple[Tuple[str, int], ...]:
+    """
+    Return the name and modification time of every `team_catalog_*.csv` in directory,
+    `configs.paths.catalog_dir` by default, which change whenever a catalog is rewritten.
+    """
+    files = []
+    for path in sorted((directory or catalog_dir).glob("team_catalog_*.csv")):
+        try:
+            files.append((path.name, path.stat().st_mtime_ns))
+        except FileNotFoundError:
+            # replaced between the glob and the stat, the next call sees the new file
+            continue
+    return tuple(files)
+
+
+_default_catalog = None
+_default_catalog_files = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_team_catalog() -> TeamCatalog:
+    """
+    Return the process-wide TeamCatalog, read from `configs.paths.catalog_dir` and read
+    again whenever a catalog file is written, added or removed, so long-lived processes
+    pick up the weekly refresh.
+    """
+    global _default_catalog, _default_catalog_files  # pylint: disable=global-statement
+    with _default_catalog_lock:
+        files = catalog_files()
+        if _default_catalog is None or files != _default_catalog_files:
+            _default_catalog, _default_catalog_files = TeamCatalog.load(), files
+        return _default_catalog
@@ -0,0 +1,139 @@
+"""
+Team name resolution for matching football-data.org team names (i.e. 'Preston North End FC')
+to the squad names used in fbref tables (i.e. 'Preston') as part of the `twitter_bot` package.
+"""
+import csv
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from configs.paths import data_dir
+
+DROP_TOKENS = {"fc", "afc"}
+EXPAND_TOKENS = {"utd": "united", "&": "and"}
+_NON_WORD = re.compile(r"[^\w&]+")
+_HANDLE = re.compile(r"@\w+")
+
+
+def normalise_team_name(name: str) -> str:
+    """
+    Given a team name, return a normalised form used as an index key.
+    Accents and punctuation are removed, 'FC'/'AFC' dropped and abbreviations expanded::
+
+        normalise_team_name('Sheffield United FC') => 'sheffield united'
+        normalise_team_name('Sheffield Utd')       => 'sheffield united'
+        normalise_team_name('Atlético Madrid')     => 'atletico madrid'
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower()
+    tokens = [EXPAND_TOKENS.get(t, t) for t in _NON_WORD.sub(" ", name).split()]
+    return " ".join(t for t in tokens if t not in DROP_TOKENS)
+
+
+@lru_cache(maxsize=None)
+def load_team_aliases(path: Optional[str] = None) -> Dict[str, str]:
+    """
+    Load known aliases from `data/team_aliases.csv`, seeded from the football-data.org
+    team names in `data/team_ids_2016.csv`.
+    Args:
+        path: location of the aliases csv, defaults to `configs.paths.data_dir`.
+
+    Returns:
+        dict of normalised football-data.org team name to fbref squad name.
+    """
+    path = path or data_dir / "team_aliases.csv"
+    try:
+        with open(path, mode="r", encoding="utf-8") as csv_file:
+            return {
+                normalise_team_name(row["team_name"]): row["alias"]
+                for row in csv.DictReader(csv_file)
+            }
+    except FileNotFoundError:
+        return {}
+
+
+class TeamNameIndex:
+    """
+    Index over the team names of a single table, built once and queried per team.
+    Args:
+        names: team names as they appear in the table.
+        aliases: normalised alternative name to table name, i.e. from `load_team_aliases`.
+    """
+
+    def __init__(self, names: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        self.names = list(names)
+        self._exact = {normalise_team_name(name): name for name in self.names}
+        self._aliases = {
+            alias: name for alias, name in (aliases or {}).items() if name in self.names
+        }
+        # every run of consecutive words in a name, i.e. 'west', 'west brom', 'brom'
+        self._phrases: Dict[str, set] = {}
+        for key, name in self._exact.items():
+            tokens = key.split()
+            for i in range(len(tokens)):
+                for j in range(i + 1, len(tokens) + 1):
+                    self._phrases.setdefault(" ".join(tokens[i:j]), set()).add(name)
+        self._max_words = max(
+            (len(key.split()) for key in [*self._exact, *self._aliases]), default=0
+        )
+        self._resolved: Dict[str, Optional[str]] = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def resolve(self, team_name: str) -> Optional[str]:
+        """
+        Given a team_name, looks to match up with a name within the index.
+        An exact normalised match or known alias is used first, then the shortest leading
+        part of the name that only one team contains.
+        i.e. if supplying 'Preston North End FC', returns 'Preston'
+        Returns:
+            str: Name of team in table, None if no single team matches.
+        """
+        if team_name in self._resolved:
+            return self._resolved[team_name]
+        key = normalise_team_name(team_name)
+        match = self._exact.get(key) or self._aliases.get(key)
+        if match is None:
+            tokens = key.split()
+            for i in range(1, len(tokens) + 1):
+                candidates = self._phrases.get(" ".join(tokens[:i]), ())
+                if len(candidates) == 1:
+                    match = next(iter(candidates))
+                    break
+        self._resolved[team_name] = match
+        return match
+
+    def _match_phrase(self, phrase: str) -> Optional[str]:
+        match = self._exact.get(phrase) or self._aliases.get(phrase)
+        if match is None:
+            # the leading words of a single name, i.e. 'preston' or 'west brom'
+            candidates = self._phrases.get(phrase, ())
+            if len(candidates) == 1:
+                name = next(iter(candidates))
+                if normalise_team_name(name).startswith(phrase):
+                    match = name
+        return match
+
+    def search(self, text: str) -> Optional[str]:
+        """
+        Given free text, i.e. a tweet, return the team within the index it mentions.
+        Runs of words are tried longest first against names, aliases and the leading
+        words of names, so 'when do West Brom play next?' finds 'West Bromwich Albion FC'
+        and the words of a longer name are not matched again on their own.
+        @handles are ignored.
+        Returns:
+            str: Name of the team in the index, None if no team or several are mentioned.
+        """
+        tokens = normalise_team_name(_HANDLE.sub(" ", text)).split()
+        found, matched = set(), [False] * len(tokens)
+        for length in range(min(self._max_words, len(tokens)), 0, -1):
+            for i in range(len(tokens) - length + 1):
+                if any(matched[i : i + length]):
+                    continue
+                match = self._match_phrase(" ".join(tokens[i : i + length]))
+                if match is not None:
+                    found.add(match)
+                    matched[i : i + length] = [True] * length
+        return found.pop() if len(found) == 1 else None
@@ -0,0 +1,547 @@
+"""
+A durable outbound tweet queue as part of the `twitter_bot` package.
+
+Ops enqueue tweets into a local SQLite queue and return straight away. A drainer then posts
+them with one long-lived client per account, draining accounts concurrently. Rate limited
+tweets wait until the reset time Twitter sends, server errors are retried with exponential
+backoff, and tweets Twitter refuses (i.e. duplicates) are marked as rejected. When an
+account's keys are refused its tweets stay queued and the drain fails, rather than every
+tweet being thrown away. A tweet whose request failed after it may have reached Twitter is
+marked unknown rather than posted again, until `TweetQueue.requeue` returns it to the
+queue, as it does failed tweets.
+
+A ledger of the content hash of every tweet queued is kept per account, written in the
+same transaction as the tweet, so concurrent runs queueing the same tweet post it once
+and a duplicate is caught locally rather than by Twitter. As Twitter only refuses a tweet
+matching a recent one, the ledger only holds tweets queued within `duplicate_window`, and
+the same text, i.e. a result repeated a season later, can be queued again after it.
+"""
+import functools
+import hashlib
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from clock import unix_time
+from configs.paths import state_dir
+from metrics import get_metrics
+
+if TYPE_CHECKING:
+    # imported when a tweet is posted, so queueing one does not load tweepy
+    import tweepy
+
+from configs.twitter import (
+    default_account,
+    max_attempts,
+    backoff_base,
+    backoff_max,
+    max_drain_wait,
+    post_timeout,
+    duplicate_window,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    tweet_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    claimed_at REAL,
+    sent_at REAL,
+    remote_id TEXT,
+    error TEXT,
+    reply_to TEXT
+);
+CREATE INDEX IF NOT EXISTS tweets_pending
+    ON tweets (status, account, not_before);
+CREATE TABLE IF NOT EXISTS posted (
+    account TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    team_id INTEGER,
+    tweet_id INTEGER NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (account, content_hash)
+);
+CREATE INDEX IF NOT EXISTS posted_tweet ON posted (tweet_id);
+CREATE INDEX IF NOT EXISTS posted_recorded ON posted (recorded_at);
+"""
+
+PENDING, SENDING, SENT, REJECTED, FAILED, UNKNOWN = (
+    "pending",
+    "sending",
+    "sent",
+    "rejected",
+    "failed",
+    "unknown",
+)
+
+
+def content_hash(text: str) -> str:
+    """Hash of a tweet's text as recorded in the ledger of tweets queued."""
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class TweetQueue:
+    """
+    SQLite queue of tweets waiting to be posted, safe to share between processes.
+    Args:
+        path: location of the SQLite file.
+        clock: function returning the current unix time.
+    """
+
+    def __init__(self, path: Path, clock: Callable[[], float] = unix_time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tweets)")}
+        if "reply_to" not in columns:
+            # queues created before replies were queued
+            self._conn.execute("ALTER TABLE tweets ADD COLUMN reply_to TEXT")
+
+    def enqueue(
+        self, text: str, account: str = default_account, reply_to: str = None
+    ) -> int:
+        """
+        Add a tweet to the queue.
+        Args:
+            text: text of the tweet.
+            account: account the tweet is posted by.
+            reply_to: ID of the tweet this one replies to.
+
+        Returns:
+            int: ID of the queued tweet.
+        """
+        now = self.clock()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO tweets (account, text, not_before, enqueued_at, reply_to) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (account, text, now, now, reply_to),
+            )
+            return cur.lastrowid
+
+    def enqueue_many(
+        self, tweets: Iterable[tuple], account: str = default_account
+    ) -> List[int]:
+        """
+        Add many tweets to the queue in a single transaction, i.e. a burst of replies.
+        Args:
+            tweets: (text, reply_to) of each tweet, reply_to None for a new tweet.
+            account: account the tweets are posted by.
+
+        Returns:
+            list of the IDs of the queued tweets, in order.
+        """
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [
+                    self._conn.execute(
+                        "INSERT INTO tweets "
+                        "(account, text, not_before, enqueued_at, reply_to) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (account, text, now, now, reply_to),
+                    ).lastrowid
+                    for text, reply_to in tweets
+                ]
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def enqueue_unique(
+        self, text: str, account: str = default_account, team_id: int = None
+    ) -> Optional[int]:
+        """
+        Add a tweet to the queue unless the same text was queued for the account within
+        `duplicate_window` seconds, checking and recording it in the ledger in one
+        transaction.
+        Args:
+            text: text of the tweet.
+            account: account the tweet is posted by.
+            team_id: team the tweet is about, kept in the ledger.
+
+        Returns:
+            int: ID of the queued tweet, None if it is a duplicate.
+        """
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # tweets queued before the window are no longer duplicates
+                self._conn.execute(
+                    "DELETE FROM posted WHERE recorded_at <= ?",
+                    (now - duplicate_window,),
+                )
+                tweet_id = self._conn.execute(
+                    "INSERT INTO tweets (account, text, not_before, enqueued_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (account, text, now, now),
+                ).lastrowid
+                recorded = self._conn.execute(
+                    "INSERT OR IGNORE INTO posted "
+                    "(account, content_hash, team_id, tweet_id, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (account, content_hash(text), team_id, tweet_id, now),
+                ).rowcount
+                self._conn.execute("COMMIT" if recorded else "ROLLBACK")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        return tweet_id if recorded else None
+
+    def claim(self, account: str) -> Optional[dict]:
+        """
+        Take the oldest tweet of an account that is ready to post, marking it as sending.
+        Returns:
+            dict with tweet_id, text, attempts and reply_to, None if no tweet is ready.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tweet_id, text, attempts, reply_to FROM tweets "
+                    "WHERE status = ? AND account = ? AND not_before <= ? "
+                    "ORDER BY tweet_id LIMIT 1",
+                    (PENDING, account, self.clock()),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE tweets SET status = ?, attempts = attempts + 1, "
+                        "claimed_at = ? WHERE tweet_id = ?",
+                        (SENDING, self.clock(), row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {
+            "tweet_id": row[0],
+            "text": row[1],
+            "attempts": row[2] + 1,
+            "reply_to": row[3],
+        }
+
+    def _finish(self, tweet_id: int, status: str, **columns):
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE tweets SET status = ?, {assignments} WHERE tweet_id = ?",
+                (status, *columns.values(), tweet_id),
+            )
+
+    def mark_sent(self, tweet_id: int, remote_id: Optional[str]):
+        self._finish(tweet_id, SENT, sent_at=self.clock(), remote_id=remote_id)
+
+    def retry_later(self, tweet_id: int, delay: float, error: str):
+        self._finish(tweet_id, PENDING, not_before=self.clock() + delay, error=error)
+
+    def mark_rejected(self, tweet_id: int, error: str):
+        self._finish(tweet_id, REJECTED, error=error)
+
+    def mark_failed(self, tweet_id: int, error: str):
+        self._finish(tweet_id, FAILED, error=error)
+        with self._lock:
+            # never posted, so the same text may be queued again
+            self._conn.execute("DELETE FROM posted WHERE tweet_id = ?", (tweet_id,))
+
+    def mark_unknown(self, tweet_id: int, error: str):
+        self._finish(tweet_id, UNKNOWN, error=error)
+
+    def recover(self, stale_after: float = 5 * 60) -> int:
+        """
+        Mark tweets left as sending for longer than stale_after seconds, by a drainer
+        that stopped mid-post, as unknown. Twitter may have posted them, so they are not
+        posted again unless requeued.
+        Returns:
+            int: number of tweets recovered.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE tweets SET status = ?, error = ? "
+                "WHERE status = ? AND claimed_at < ?",
+                (
+                    UNKNOWN,
+                    "drainer stopped while posting",
+                    SENDING,
+                    self.clock() - stale_after,
+                ),
+            ).rowcount
+
+    def requeue(self, tweet_id: int) -> bool:
+        """
+        Return a failed tweet to the queue, or one marked unknown once it is known not to
+        have been posted.
+        Returns:
+            bool: whether the tweet was failed or unknown and is queued again.
+        """
+        with self._lock:
+            return bool(
+                self._conn.execute(
+                    "UPDATE tweets SET status = ?, not_before = ?, attempts = 0 "
+                    "WHERE tweet_id = ? AND status IN (?, ?)",
+                    (PENDING, self.clock(), tweet_id, FAILED, UNKNOWN),
+                ).rowcount
+            )
+
+    def pending_accounts(self) -> List[str]:
+        with self._lock:
+            return [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT DISTINCT account FROM tweets WHERE status = ?", (PENDING,)
+                )
+            ]
+
+    def ready_count(self) -> int:
+        """Return the number of pending tweets that can be posted now."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tweets WHERE status = ? AND not_before <= ?",
+                (PENDING, self.clock()),
+            ).fetchone()[0]
+
+    def next_ready_at(self, account: str) -> Optional[float]:
+        """Return when the next pending tweet of an account can be posted."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT MIN(not_before) FROM tweets WHERE status = ? AND account = ?",
+                (PENDING, account),
+            ).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(
+                self._conn.execute(
+                    "SELECT status, COUNT(*) FROM tweets GROUP BY status"
+                )
+            )
+
+    def get(self, tweet_id: int) -> dict:
+        keys = [
+            "tweet_id",
+            "account",
+            "text",
+            "status",
+            "attempts",
+            "remote_id",
+            "error",
+            "reply_to",
+        ]
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(keys)} FROM tweets WHERE tweet_id = ?", (tweet_id,)
+            ).fetchone()
+        return dict(zip(keys, row))
+
+
+def apply_timeout(session: requests.Session, timeout=post_timeout) -> requests.Session:
+    """
+    Give every request of a session a timeout, unless one is passed, keeping the headers
+    and adapters it was built with.
+    """
+    request = session.request
+
+    @functools.wraps(request)
+    def request_with_timeout(method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", timeout)
+        return request(method, url, *args, **kwargs)
+
+    session.request = request_with_timeout
+    return session
+
+
+def default_client_factory(account: str) -> "tweepy.Client":
+    """
+    Return a client for the account, the keys in configs.keys are the default account.
+    Its requests time out after `configs.twitter.post_timeout`, so a hung connection does
+    not hold up the drainer.
+    """
+    from helpers import twitter_auth  # pylint: disable=import-outside-toplevel
+
+    if account != default_account:
+        raise KeyError(f"No Twitter keys configured for account {account}")
+    client = twitter_auth()
+    apply_timeout(client.session)
+    return client
+
+
+def never_sent(error: requests.RequestException) -> bool:
+    """Return whether a request failed before it could reach Twitter."""
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(
+        reason, NewConnectionError
+    )
+
+
+def rate_limit_delay(error: "tweepy.errors.TooManyRequests", now: float) -> float:
+    """Return the seconds until the rate limit in a 429 response resets."""
+    try:
+        reset = float(error.response.headers["x-rate-limit-reset"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return backoff_base
+    return max(reset - now, 0) + 1
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for a tweet that has been attempted `attempts` times."""
+    delay = min(backoff_max, backoff_base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class QueueDrainer:
+    """
+    Posts the tweets in a TweetQueue, using one long-lived client per account.
+    Args:
+        queue: the queue to drain.
+        client_factory: function returning a tweepy.Client for an account name.
+        sleep: function to wait a number of seconds.
+    """
+
+    def __init__(
+        self,
+        queue: TweetQueue,
+        client_factory: Callable[[str], "tweepy.Client"] = default_client_factory,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.queue = queue
+        self.client_factory = client_factory
+        self.sleep = sleep
+        self._clients: Dict[str, "tweepy.Client"] = {}
+        self._clients_lock = threading.Lock()
+
+    def client(self, account: str) -> "tweepy.Client":
+        with self._clients_lock:
+            if account not in self._clients:
+                self._clients[account] = self.client_factory(account)
+            return self._clients[account]
+
+    def post(self, account: str, tweet: dict) -> str:
+        """
+        Post a claimed tweet and record the outcome in the queue.
+        Returns:
+            str: the status the tweet was left in.
+        """
+        metrics = get_metrics()
+        with metrics.timer("tweet_post", account=account):
+            status = self._post(account, tweet)
+        metrics.inc("tweets_total", account=account, status=status)
+        return status
+
+    def _post(self, account: str, tweet: dict) -> str:
+        import tweepy  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        tweet_id = tweet["tweet_id"]
+        try:
+            kwargs = {}
+            if tweet.get("reply_to"):
+                kwargs["in_reply_to_tweet_id"] = tweet["reply_to"]
+            response = self.client(account).create_tweet(text=tweet["text"], **kwargs)
+        except tweepy.errors.TooManyRequests as error:
+            delay = rate_limit_delay(error, self.queue.clock())
+            self.queue.retry_later(tweet_id, delay, str(error))
+            return PENDING
+        except requests.RequestException as error:
+            if not never_sent(error):
+                # i.e. a read timeout, Twitter may have posted the tweet
+                self.queue.mark_unknown(tweet_id, str(error))
+                return UNKNOWN
+            return self._retry(tweet, error)
+        except tweepy.errors.TwitterServerError as error:
+            return self._retry(tweet, error)
+        except tweepy.errors.Unauthorized as error:
+            # every tweet of the account would be refused, so keep them queued and fail
+            # the drain until the keys are fixed
+            self.queue.retry_later(tweet_id, 0, str(error))
+            raise
+        except tweepy.errors.Forbidden as error:
+            # i.e. duplicate content, posting again would not help
+            self.queue.mark_rejected(tweet_id, str(error))
+            return REJECTED
+        except tweepy.errors.HTTPException as error:
+            # i.e. a bad request, failed so it can be requeued once the cause is fixed
+            self.queue.mark_failed(tweet_id, str(error))
+            return FAILED
+        data = getattr(response, "data", None) or {}
+        self.queue.mark_sent(tweet_id, data.get("id"))
+        return SENT
+
+    def _retry(self, tweet: dict, error: Exception) -> str:
+        """Back a tweet off after an error, marking it failed after max_attempts."""
+        tweet_id = tweet["tweet_id"]
+        if tweet["attempts"] >= max_attempts:
+            self.queue.mark_failed(tweet_id, str(error))
+            return FAILED
+        self.queue.retry_later(tweet_id, backoff_delay(tweet["attempts"]), str(error))
+        return PENDING
+
+    def drain_account(self, account: str, max_wait: float = max_drain_wait) -> int:
+        """
+        Post an account's tweets until none are left, waiting up to max_wait seconds
+        for tweets that are backing off.
+        Returns:
+            int: number of tweets posted.
+        """
+        sent = 0
+        while True:
+            tweet = self.queue.claim(account)
+            if tweet is not None:
+                sent += self.post(account, tweet) == SENT
+                continue
+            ready_at = self.queue.next_ready_at(account)
+            if ready_at is None:
+                return sent
+            wait = ready_at - self.queue.clock()
+            if wait > max_wait:
+                return sent
+            self.sleep(max(wait, 0))
+
+    def drain(
+        self, accounts: Optional[Iterable[str]] = None, max_wait: float = max_drain_wait
+    ) -> Dict[str, int]:
+        """
+        Drain the queue of every account with pending tweets, accounts in parallel.
+        Returns:
+            dict of account to the number of tweets posted.
+        """
+        accounts = list(accounts or self.queue.pending_accounts())
+        if not accounts:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(accounts)) as pool:
+            results = pool.map(lambda a: self.drain_account(a, max_wait), accounts)
+            return dict(zip(accounts, results))
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_tweet_queue() -> TweetQueue:
+    """
+    Return the process-wide TweetQueue, creating it in `configs.paths.state_dir` on first use.
+    """
+    global _default_queue  # pylint: disable=global-statement
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = TweetQueue(state_dir / "tweets.sqlite")
+        return _default_queue
@@ -0,0 +1,290 @@
+"""
+Precompiled tweet templates as part of the `twitter_bot` package.
+
+Each template is a list of lines compiled once into literal text and fields, with the
+Twitter weighted length of the literal text worked out up front. Rendering fills in the
+fields, weighs only the values, and picks which optional lines to keep in a single pass
+against the space left once the hashtag `format_tweet` appends is taken into account.
+"""
+import string
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple
+
+from configs.twitter import hashtag, max_tweet_length
+
+# code points Twitter weighs as one character, every other code point weighs two
+_LIGHT_RANGES = (
+    (0x0000, 0x10FF),
+    (0x2000, 0x200D),
+    (0x2010, 0x201F),
+    (0x2032, 0x2037),
+)
+_EMOJI_RANGES = (
+    (0x2190, 0x21FF),
+    (0x2300, 0x23FF),
+    (0x2600, 0x27BF),
+    (0x2B00, 0x2BFF),
+    (0x1F000, 0x1FAFF),
+)
+_ZWJ, _KEYCAP = 0x200D, 0x20E3
+_REGIONAL_INDICATORS = (0x1F1E6, 0x1F1FF)
+
+
+def _in_ranges(code_point: int, ranges) -> bool:
+    return any(start <= code_point <= end for start, end in ranges)
+
+
+def _is_modifier(code_point: int) -> bool:
+    """Variation selectors, skin tones and tag characters that extend an emoji."""
+    return (
+        0xFE00 <= code_point <= 0xFE0F
+        or 0x1F3FB <= code_point <= 0x1F3FF
+        or 0xE0020 <= code_point <= 0xE007F
+    )
+
+
+def weighted_length(text: str) -> int:
+    """
+    Return the length of text as Twitter counts it towards the 280 character limit.
+    Latin and most punctuation weigh one, CJK and other characters two, and an emoji
+    weighs two however many code points (skin tones, ZWJ sequences, flags) make it up.
+    Args:
+        text: str: text to weigh.
+
+    Returns:
+        int: weighted length of the text.
+    """
+    length = 0
+    in_emoji = joining = flag_open = False
+    for char in unicodedata.normalize("NFC", text):
+        code_point = ord(char)
+        if _is_modifier(code_point):
+            continue
+        if in_emoji and code_point == _ZWJ:
+            joining = True
+            continue
+        if joining and _in_ranges(code_point, _EMOJI_RANGES):
+            joining = False
+            continue
+        joining = False
+        if code_point == _KEYCAP:
+            length += 1
+            continue
+        if _REGIONAL_INDICATORS[0] <= code_point <= _REGIONAL_INDICATORS[1]:
+            flag_open = not flag_open
+            if not flag_open:
+                continue
+        else:
+            flag_open = False
+        length += 1 if _in_ranges(code_point, _LIGHT_RANGES) else 2
+        in_emoji = _in_ranges(code_point, _EMOJI_RANGES)
+    return length
+
+
+class Line(NamedTuple):
+    """A line of a template, optional lines are dropped when the tweet is too long."""
+
+    text: str
+    optional: bool = False
+
+
+class _CompiledLine(NamedTuple):
+    parts: tuple
+    weight: int
+    optional: bool
+    gap: bool
+
+
+_formatter = string.Formatter()
+
+
+def _compile_lines(lines: Iterable[Line]) -> List[_CompiledLine]:
+    """
+    Split each line into its literal text and fields, weighing the literal text.
+    Blank lines become a gap before the next line rather than lines of their own.
+    """
+    compiled, gap = [], False
+    for line in lines:
+        if not line.text:
+            gap = True
+            continue
+        parts, weight = [], 0
+        for literal, field, spec, conversion in _formatter.parse(line.text):
+            if literal:
+                parts.append((literal, None, None, None))
+                weight += weighted_length(literal)
+            if field is not None:
+                parts.append((None, field, spec, conversion))
+        compiled.append(_CompiledLine(tuple(parts), weight, line.optional, gap))
+        gap = False
+    return compiled
+
+
+class Template:
+    """
+    A tweet template compiled once and rendered many times.
+    Args:
+        name: name the template is registered under.
+        lines: lines of the template, fields in str.format syntax.
+        suffix: text appended to the tweet after rendering, reserved for when fitting.
+        max_length: weighted length the tweet, with suffix, must fit in.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lines: Iterable[Line],
+        suffix: str = f"\n\n{hashtag}",
+        max_length: int = max_tweet_length,
+    ):
+        self.name = name
+        self.lines = _compile_lines(lines)
+        self.budget = max_length - weighted_length(suffix)
+
+    def _render_line(self, line: _CompiledLine, values: dict):
+        text, weight = [], line.weight
+        for literal, field, spec, conversion in line.parts:
+            if literal is not None:
+                text.append(literal)
+                continue
+            value = _formatter.get_field(field, (), values)[0]
+            value = _formatter.format_field(
+                _formatter.convert_field(value, conversion), spec
+            )
+            text.append(value)
+            weight += weighted_length(value)
+        return "".join(text), weight
+
+    def render(self, values: dict) -> str:
+        """
+        Render the template with values, keeping every required line and, in order, each
+        optional line that still fits alongside them.
+        Args:
+            values: dict of the template's fields.
+
+        Returns:
+            str: tweet, ready for `format_tweet`.
+        """
+        rendered = [self._render_line(line, values) for line in self.lines]
+        # reserve room for the required lines, assuming a gap before a dropped optional
+        # line moves onto the required line after it
+        remaining, gap = self.budget, False
+        for i, (line, (_, weight)) in enumerate(zip(self.lines, rendered)):
+            gap = gap or line.gap
+            if not line.optional:
+                remaining -= weight + (1 + gap) * (i > 0)
+                gap = False
+        if remaining < 0:
+            raise ValueError(f"{self.name} tweet is too long: {values}")
+
+        tweet, gap = [], False
+        for i, (line, (text, weight)) in enumerate(zip(self.lines, rendered)):
+            gap = gap or line.gap
+            separator = ("\n\n" if gap else "\n") if tweet else ""
+            if line.optional:
+                if weight + len(separator) > remaining:
+                    continue
+                remaining -= weight + len(separator)
+            else:
+                # give back whatever was reserved but not needed for the separator
+                remaining += (1 + gap) * (i > 0) - len(separator)
+            tweet += [separator, text]
+            gap = False
+        return "".join(tweet)
+
+    def render_many(self, values: Iterable[dict]) -> List[str]:
+        """Render the template once for each dict of values, i.e. a tweet per team."""
+        return [self.render(team_values) for team_values in values]
+
+
+TEMPLATES: Dict[str, Template] = {}
+
+
+def register(template: Template) -> Template:
+    TEMPLATES[template.name] = template
+    return template
+
+
+def render(name: str, values: dict) -> str:
+    """Render the registered template `name` with values."""
+    return TEMPLATES[name].render(values)
+
+
+def render_batch(name: str, values: Iterable[dict]) -> List[str]:
+    """Render the registered template `name` once for each dict of values."""
+    return TEMPLATES[name].render_many(values)
+
+
+register(
+    Template(
+        "next_fixture_date",
+        [
+            Line("The next match is {h_a} against {opposition}"),
+            Line(""),
+            Line("\U0001F4CD {location}"),
+            Line("\U0001F4C5 {date}"),
+            Line("\U000023F0 {time}"),
+        ],
+    )
+)
+
+register(
+    Template(
+        "opp_stats",
+        [
+            Line("{opposition} currently sit {position} in the {competition}."),
+            Line(
+                "Having scored {goals_for} and conceded {goals_against} goals \U000026BD"
+            ),
+            Line(""),
+            Line("Form: {form_emoji}", optional=True),
+            Line("Top Scorer(s): {top_scorer}", optional=True),
+            Line("W: {wins}, D: {draws},  L: {loss}", optional=True),
+        ],
+    )
+)
+
+register(
+    Template(
+        "full_time",
+        [
+            Line("Full time in the {competition}"),
+            Line(""),
+            Line("{home} {home_goals} - {away_goals} {away}"),
+        ],
+    )
+)
+
+register(
+    Template(
+        "match_stats",
+        [
+            Line("{home} {home_goals} - {away_goals} {away}"),
+            Line(""),
+            Line("xG: {home_xg:.2f} - {away_xg:.2f}", optional=True),
+            Line(
+                "Shots (on target): {home_shots} ({home_on_target})"
+                " - {away_shots} ({away_on_target})",
+                optional=True,
+            ),
+            Line(
+                "Possession: {home_possession:.0f}% - {away_possession:.0f}%",
+                optional=True,
+            ),
+            Line("Passes completed: {home_passes} - {away_passes}", optional=True),
+        ],
+    )
+)
+
+register(
+    Template(
+        "next_fixture_reply",
+        [
+            Line(
+                "@{username} {team} play {opposition} {h_a} on {date} at {time}"
+                " in the {competition}."
+            ),
+        ],
+        suffix="",
+    )
+)
@@ -0,0 +1,140 @@
+"""
+A module of functions that build the text of tweets, shared by the single-team and
+multi-team jobs in the `main` module of the `twitter_bot` package.
+"""
+from helpers import (
+    get_opposition_team,
+    home_or_away,
+    get_home_team_venue,
+    make_date_readable,
+    make_ordinal,
+)
+from tweet_templates import render, render_batch
+
+
+def next_fixture_date_tweet(fix, team_id: int) -> str:
+    """
+    Given a Fixture object and team_id, return a tweet announcing the fixture.
+    Args:
+        fix: Fixture object of the next fixture.
+        team_id: ID of the team the tweet is for.
+
+    Returns:
+        A formatted, Twitter ready tweet
+    """
+    opp = get_opposition_team(fix, team_id)
+    h_a = home_or_away(fix, team_id)
+    location = get_home_team_venue(fix)
+    date_time = make_date_readable(fix.date)
+
+    return render(
+        "next_fixture_date",
+        {
+            "h_a": h_a,
+            "opposition": opp.name,
+            "location": location,
+            "date": date_time[0],
+            "time": date_time[1],
+        },
+    )
+
+
+def opp_stats(fix, team_id: int, tables) -> dict:
+    """
+    Given a Fixture object, team_id and the standings Tables of the fixture's league,
+    return the league stats of the opposition team.
+    """
+    opp = get_opposition_team(fix, team_id)
+    stats = tables.collect_stats(opp.name)
+    stats["opposition"] = opp.display_name
+    stats["position"] = make_ordinal(stats["position"])
+    stats["competition"] = fix.competition.name
+    return stats
+
+
+def team_stats(fix, team_id: int, tables) -> dict:
+    """
+    Given a Fixture object, team_id and the standings Tables of the fixture's league,
+    return the league stats of the team itself, as `opp_stats` does for its opposition.
+    """
+    return opp_stats(fix, get_opposition_team(fix, team_id).id, tables)
+
+
+def opp_stats_tweet(stats: dict) -> str:
+    """
+    Given the stats from `opp_stats`, return a tweet previewing the opposition, keeping
+    the optional lines that fit once the hashtag is added.
+    """
+    return render("opp_stats", stats)
+
+
+def opp_stats_tweets(stats: list) -> list:
+    """
+    Given the stats from `opp_stats` of many teams, i.e. a whole league, return a tweet
+    previewing each of them.
+    """
+    return render_batch("opp_stats", stats)
+
+
+def match_stats(summary, home_team_id: int = None) -> dict:
+    """
+    Given a MatchSummary from `statsbomb.summarise_match`, return the values of its
+    match_stats tweet, the home team first.
+    Args:
+        summary: MatchSummary of the match.
+        home_team_id: ID of the home team, from `statsbomb.load_home_teams`. When not
+            given, the team first in the events is taken as at home, as in StatsBomb files.
+    Raises:
+        ValueError: if the summary does not have two teams, or home_team_id is not one
+            of them.
+    """
+    if len(summary.teams) != 2:
+        raise ValueError(
+            f"Match {summary.match_id} has {len(summary.teams)} teams in its events"
+        )
+    home, away = summary.teams
+    if home_team_id is not None:
+        if home_team_id not in (home.team_id, away.team_id):
+            raise ValueError(
+                f"Home team {home_team_id} did not play in match {summary.match_id}"
+            )
+        if away.team_id == home_team_id:
+            home, away = away, home
+    values = {}
+    for side, team in (("home", home), ("away", away)):
+        values.update(
+            {
+                side: team.team,
+                f"{side}_goals": team.goals,
+                f"{side}_xg": team.xg,
+                f"{side}_shots": team.shots,
+                f"{side}_on_target": team.shots_on_target,
+                f"{side}_possession": team.possession,
+                f"{side}_passes": team.passes_completed,
+            }
+        )
+    return values
+
+
+def match_stats_tweets(summaries: list, home_teams: dict = None) -> list:
+    """
+    Given MatchSummary objects, return a tweet of each match's stats, keeping the
+    optional lines that fit once the hashtag is added. Matches whose summary is not of
+    two teams are skipped.
+    Args:
+        summaries: MatchSummary objects of the matches.
+        home_teams: home team ID of each match ID, read from the StatsBomb matches files
+            by default.
+    """
+    if home_teams is None:
+        # statsbomb brings in pandas, which the commands that only tweet fixtures skip
+        from statsbomb import load_home_teams
+
+        home_teams = load_home_teams()
+    matches = []
+    for summary in summaries:
+        try:
+            matches.append(match_stats(summary, home_teams.get(summary.match_id)))
+        except ValueError as error:
+            print(f"Skipping match stats tweet: {error}")
+    return render_batch("match_stats", matches)